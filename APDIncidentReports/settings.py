@@ -83,6 +83,27 @@ WSGI_APPLICATION = 'APDIncidentReports.wsgi.application'
 DATABASES = {'default': dj_database_url.config(conn_max_age=600,
                                                default=os.getenv('DATABASE_URL'))}
 
+# Rendered incidents, see cases/representations.py. locmem is private to each process;
+# use "file" or "redis" (pip install -r requirements/redis.txt) to share it between processes.
+REPRESENTATION_CACHE = os.getenv("REPRESENTATION_CACHE", "locmem")
+REPRESENTATION_CACHE_BACKENDS = {
+    'locmem': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+               'LOCATION': 'incident-representations',
+               'OPTIONS': {'MAX_ENTRIES': 10000}},
+    'file': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+             'LOCATION': os.getenv("REPRESENTATION_CACHE_LOCATION",
+                                   os.path.join(BASE_DIR, "cache", "representations")),
+             'OPTIONS': {'MAX_ENTRIES': 100000}},
+    'redis': {'BACKEND': 'cases.cache_backends.RedisCache',
+              'LOCATION': os.getenv("REPRESENTATION_CACHE_LOCATION", "redis://localhost:6379/1")},
+}
+
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'representations': dict(REPRESENTATION_CACHE_BACKENDS[REPRESENTATION_CACHE],
+                            TIMEOUT=int(os.getenv("REPRESENTATION_CACHE_TIMEOUT", 24 * 60 * 60))),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/1.11/ref/settings/#auth-password-validators
@@ -131,14 +152,45 @@ LOGGING = APD_LOGGING
 MEDIA_ROOT = Path(BASE_DIR, "case_file_uploads")
 MEDIA_URL = "/uploads/"
 
+# Maximum number of incidents accepted by a single POST to /api/incidents/bulk/
+INCIDENT_BULK_CREATE_LIMIT = int(os.getenv("INCIDENT_BULK_CREATE_LIMIT", 1000))
+
+# Where rendered incident reports are cached, and how many bytes of them are kept.
+REPORT_PDF_CACHE_DIR = os.getenv("REPORT_PDF_CACHE_DIR",
+                                 os.path.join(BASE_DIR, "cache", "reports"))
+REPORT_PDF_CACHE_MAX_BYTES = int(os.getenv("REPORT_PDF_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# Maximum number of incidents printed by a single GET to /api/incidents/print/, and the
+# number of processes rendering them.
+BATCH_PRINT_LIMIT = int(os.getenv("BATCH_PRINT_LIMIT", 500))
+BATCH_PRINT_WORKERS = int(os.getenv("BATCH_PRINT_WORKERS", os.cpu_count() or 1))
+
+# Seconds each process goes between checking, with one query, whether another process
+# changed data every process caches: the offense catalog, states and cities, and users
+# (whose verified tokens are revoked). A process sees its own changes straight away.
+SHARED_VERSION_CHECK_INTERVAL = float(os.getenv("SHARED_VERSION_CHECK_INTERVAL", 5))
+
+# Seconds an officer stays in each process' cache when resolving officer references.
+OFFICER_CACHE_TTL = int(os.getenv("OFFICER_CACHE_TTL", 30))
+
+# Seconds each process trusts a verified username/password pair under Basic authentication.
+BASIC_AUTH_CACHE_TTL = int(os.getenv("BASIC_AUTH_CACHE_TTL", 300))
+
+# Seconds each process trusts a verified JSON web token before decoding it and loading its
+# user again. Saving a user revokes cached tokens, see SHARED_VERSION_CHECK_INTERVAL.
+JWT_AUTH_CACHE_TTL = int(os.getenv("JWT_AUTH_CACHE_TTL", 60))
+
+# Incident numbers each process reserves at a time when allocating them itself.
+INCIDENT_NUMBER_BLOCK_SIZE = int(os.getenv("INCIDENT_NUMBER_BLOCK_SIZE", 100))
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_jwt.authentication.JSONWebTokenAuthentication',
+        'cases.authentication.CachedJSONWebTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
+        'cases.authentication.CachedBasicAuthentication',
     ),
 }
 
@@ -0,0 +1,193 @@
+import copy
+import hashlib
+import logging
+import threading
+import time
+
+from typing import Any, Dict, Optional, Tuple
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AbstractBaseUser
+from django.db import transaction
+from django.utils.crypto import constant_time_compare, salted_hmac
+from rest_framework.authentication import BasicAuthentication
+from rest_framework.request import Request
+from rest_framework_jwt.authentication import JSONWebTokenAuthentication
+from rest_framework_jwt.settings import api_settings as jwt_settings
+
+from cases.caches import SharedVersion, TTLCache
+
+logger = logging.getLogger('cases')
+
+
+class VerifiedCredentialCache:
+    """
+    Remembers, for a short while, which username/password pairs were verified, so that
+    scripted clients using HTTP Basic authentication don't pay for a full password hash
+    (hundreds of thousands of PBKDF2 iterations) on every request.
+
+    Credentials are never stored: entries are keyed by an HMAC of them under SECRET_KEY,
+    and hold the user's ID and the password hash they were verified against. An entry is
+    only honoured while the user is active and still has that password hash, so changing
+    the password invalidates it, in every process. Failed attempts are not cached.
+    """
+    KEY_SALT = "cases.authentication.VerifiedCredentialCache"
+
+    def __init__(self, ttl: float, maxsize: int = 1024) -> None:
+        self._entries = TTLCache(ttl=ttl, maxsize=maxsize)
+
+    def _key(self, username: str, password: str) -> str:
+        return salted_hmac(self.KEY_SALT, f"{username}\0{password}").hexdigest()
+
+    def get(self, username: str, password: str) -> Optional[AbstractBaseUser]:
+        """
+        :return: The user the credentials were recently verified for, if they still hold,
+                 loaded with one query. None if they have to be verified.
+        """
+        key = self._key(username, password)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        user_id, password_hash = entry
+        user = get_user_model()._default_manager.filter(pk=user_id).first()
+        if (user is None or not user.is_active
+                or not constant_time_compare(user.password, password_hash)):
+            self._entries.pop(key)
+            return None
+        return user
+
+    def add(self, username: str, password: str, user: AbstractBaseUser) -> None:
+        """Records that the credentials were just verified for the user."""
+        self._entries.set(self._key(username, password), (user.pk, user.password))
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return self._entries.stats()
+
+
+verified_credentials = VerifiedCredentialCache(ttl=settings.BASIC_AUTH_CACHE_TTL)
+
+
+class CachedBasicAuthentication(BasicAuthentication):
+    """BasicAuthentication which skips re-hashing recently verified credentials."""
+
+    def authenticate_credentials(self, userid: str, password: str,
+                                 request=None) -> Tuple[AbstractBaseUser, None]:
+        user = verified_credentials.get(userid, password)
+        if user is not None:
+            return user, None
+        user, auth = super(CachedBasicAuthentication, self).authenticate_credentials(
+            userid, password, request=request
+        )
+        verified_credentials.add(userid, password, user)
+        return user, auth
+
+
+class VerifiedTokenCache:
+    """
+    Remembers the users of recently verified JSON web tokens, so that polling clients are
+    authenticated without decoding their token or loading their user on every request.
+
+    Entries are keyed by a SHA-256 digest of the token (tokens carry no ID of their own),
+    bounded in number, and dropped once the token expires. Each entry is only used while
+    the users' shared version (see SharedVersion) is the one read before its token was
+    decoded and its user loaded. Saving or deleting a user, e.g. deactivating them, bumps
+    that version, which revokes every cached token: in the saving process straight away,
+    in others within settings.SHARED_VERSION_CHECK_INTERVAL. A user saved while one of
+    their tokens is being verified thus never leaves a usable entry behind.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 4096) -> None:
+        self._entries = TTLCache(ttl=ttl, maxsize=maxsize)
+        self._shared_version = SharedVersion("users",
+                                             interval=settings.SHARED_VERSION_CHECK_INTERVAL)
+        # Counted here, as entries of expired or revoked tokens are found but not used.
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _copy(user: AbstractBaseUser) -> AbstractBaseUser:
+        """Each request gets its own user, as views may modify or cache things on it."""
+        user = copy.copy(user)
+        user._state = copy.copy(user._state)
+        user._state.fields_cache = {}
+        return user
+
+    def get(self, token: str) -> Optional[AbstractBaseUser]:
+        """:return: A copy of the token's user, if the token was recently verified."""
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is not None:
+            version, expires, user = entry
+            if ((expires is not None and expires <= time.time())
+                    or version != self._shared_version.get()):
+                self._entries.pop(key)
+                entry = None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return None if entry is None else self._copy(user)
+
+    def version(self) -> str:
+        """:return: The users' version, to be read before a token is verified; see add."""
+        return self._shared_version.get()
+
+    def add(self, token: str, payload: Dict[str, Any], user: AbstractBaseUser,
+            version: str) -> None:
+        """
+        Records that the token, whose claims are the payload, was just verified for user.
+        :param version: The users' version, as read before the token was decoded.
+        """
+        expires = payload.get("exp") if jwt_settings.JWT_VERIFY_EXPIRATION else None
+        self._entries.set(self._key(token), (version, expires, self._copy(user)))
+
+    def revoke(self) -> None:
+        """Makes every token be verified again, once the current transaction commits."""
+        self._shared_version.bump()
+        transaction.on_commit(self._shared_version.expire)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._shared_version.expire()
+        with self._lock:
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._entries.stats(), hits=self.hits, misses=self.misses)
+
+
+verified_tokens = VerifiedTokenCache(ttl=settings.JWT_AUTH_CACHE_TTL)
+
+
+class CachedJSONWebTokenAuthentication(JSONWebTokenAuthentication):
+    """JSONWebTokenAuthentication which skips decoding and loading recently verified users."""
+
+    def authenticate(self, request: Request) -> Optional[Tuple[AbstractBaseUser, str]]:
+        jwt_value = self.get_jwt_value(request)
+        if jwt_value is None:
+            return None
+        token = jwt_value.decode("utf-8") if isinstance(jwt_value, bytes) else jwt_value
+        user = verified_tokens.get(token)
+        if user is not None:
+            return user, jwt_value
+        # Before the user is loaded, so that saving them meanwhile voids the entry.
+        version = verified_tokens.version()
+        self._payload = None
+        user, jwt_value = super(CachedJSONWebTokenAuthentication, self).authenticate(request)
+        verified_tokens.add(token, self._payload, user, version)
+        return user, jwt_value
+
+    def authenticate_credentials(self, payload: Dict[str, Any]) -> AbstractBaseUser:
+        # Authenticators are instantiated per request, so the payload can be kept on self.
+        self._payload = payload
+        return super(CachedJSONWebTokenAuthentication, self).authenticate_credentials(payload)
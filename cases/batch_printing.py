@@ -0,0 +1,202 @@
+import io
+import logging
+import threading
+import zipfile
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+from django.conf import settings
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from pypdf import PdfReader, PdfWriter
+
+from cases.printing import (IncidentReport, IncidentReportPDFGenerator, load_incident_reports,
+                            report_file_name)
+from cases.report_cache import ReportVersion, report_pdfs, report_versions
+
+logger = logging.getLogger('cases')
+
+ZIP = "zip"
+PDF = "pdf"
+# Output format -> content type. ZIP holds one PDF per incident; PDF is a single merged one.
+BATCH_PRINT_FORMATS = OrderedDict([(ZIP, "application/zip"),
+                                   (PDF, "application/pdf")])
+# Number of reports loaded (three queries) and rendered at a time, which bounds memory use.
+BATCH_PRINT_CHUNK_SIZE = 50
+
+# Pools of worker processes by size, started on first use and kept for the life of the
+# process, so that requests don't each pay for forking them.
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def batch_versions(queryset: QuerySet) -> Dict[int, ReportVersion]:
+    """
+    :param queryset: The incidents to print.
+    :return: The version of each incident's report, in the order they are printed: by
+             report date, oldest first.
+    """
+    return report_versions(queryset.order_by("report_datetime", "id"))
+
+
+def _render(job: Tuple[IncidentReport, date]) -> bytes:
+    """Renders one report; at module level so that worker processes can unpickle it."""
+    report, print_date = job
+    return IncidentReportPDFGenerator(report, print_date=print_date).render()
+
+
+def render_pool(workers: int) -> ProcessPoolExecutor:
+    """:return: This process' long-lived pool of the given number of worker processes."""
+    with _pools_lock:
+        if workers not in _pools:
+            _pools[workers] = ProcessPoolExecutor(max_workers=workers)
+        return _pools[workers]
+
+
+def _discard_pool(workers: int, pool: ProcessPoolExecutor) -> None:
+    """Forgets a pool whose worker died, so that the next batch starts a new one."""
+    with _pools_lock:
+        if _pools.get(workers) is pool:
+            del _pools[workers]
+    pool.shutdown(wait=False)
+
+
+def _chunked(items: List, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _load_reports(versions: Dict[int, ReportVersion],
+                  incident_ids: List[int]) -> List[Tuple[int, IncidentReport]]:
+    """Loads the reports of incident_ids in three queries, paired with their incident IDs."""
+    ids_by_number = {versions[incident_id].incident_number: incident_id
+                     for incident_id in incident_ids}
+    return [(ids_by_number[report.incident_number], report)
+            for report in load_incident_reports(incident_ids)]
+
+
+def iter_report_pdfs(versions: Dict[int, ReportVersion], print_date: date,
+                     workers: Optional[int] = None) -> Iterator[Tuple[ReportVersion, bytes]]:
+    """
+    Yields every report's PDF. Cached reports are read from the report cache; the rest are
+    loaded BATCH_PRINT_CHUNK_SIZE at a time, rendered across the long-lived pool of worker
+    processes (reportlab holds the GIL while drawing, so threads would not help) and cached.
+    :param versions: The versions of the reports to print, see batch_versions.
+    :param print_date: The date printed in each page's header.
+    :param workers: Number of worker processes; settings.BATCH_PRINT_WORKERS by default.
+                    With one, reports are rendered in this process.
+    :return: An iterator of (version, PDF) pairs, in the order of versions. Incidents
+             deleted meanwhile are left out.
+    """
+    workers = workers or settings.BATCH_PRINT_WORKERS
+    pool = render_pool(workers) if workers > 1 else None
+    rendered = 0
+    for chunk in _chunked(list(versions), BATCH_PRINT_CHUNK_SIZE):
+        documents = {}
+        for incident_id in chunk:
+            document = report_pdfs.open(incident_id, versions[incident_id].token, print_date)
+            if document is not None:
+                with document:
+                    documents[incident_id] = document.read()
+
+        reports = _load_reports(versions, [incident_id for incident_id in chunk
+                                           if incident_id not in documents])
+        jobs = [(report, print_date) for _, report in reports]
+        try:
+            pdfs = list(pool.map(_render, jobs) if pool is not None else map(_render, jobs))
+        except BrokenProcessPool:
+            _discard_pool(workers, pool)
+            raise
+        for (incident_id, _), pdf in zip(reports, pdfs):
+            report_pdfs.store(incident_id, versions[incident_id].token, print_date, pdf)
+            documents[incident_id] = pdf
+        rendered += len(reports)
+
+        for incident_id in chunk:
+            if incident_id in documents:
+                yield versions[incident_id], documents[incident_id]
+    logger.info(f"Printed {len(versions)} reports, {rendered} of them rendered "
+                f"across {workers} processes")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Unseekable file-like object collecting what is written to it until it is taken."""
+
+    def __init__(self) -> None:
+        super(_ChunkSink, self).__init__()
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        chunks, self._chunks = self._chunks, []
+        return b"".join(chunks)
+
+
+def render_zip(versions: Dict[int, ReportVersion], print_date: date,
+               workers: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Lazily renders a ZIP archive of the reports, one PDF per incident named as print_report
+    names it. PDFs are already compressed, so they are stored as they are.
+    :return: An iterator of byte chunks, one per report, then the archive's directory.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as archive:
+        for version, pdf in iter_report_pdfs(versions, print_date, workers=workers):
+            entry = zipfile.ZipInfo(report_file_name(version.incident_number),
+                                    date_time=version.updated.timetuple()[:6])
+            archive.writestr(entry, pdf)
+            yield sink.take()
+    yield sink.take()
+
+
+def render_pdf(versions: Dict[int, ReportVersion], print_date: date,
+               workers: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Renders the reports into one PDF, each starting on a new page, by concatenating the
+    documents iter_report_pdfs gets from the report cache or the pool. The pages are
+    copied as they are, so the merged document is only written out once complete.
+    :return: An iterator of the document's bytes, in one chunk.
+    """
+    writer = PdfWriter()
+    for _, pdf in iter_report_pdfs(versions, print_date, workers=workers):
+        writer.append(PdfReader(io.BytesIO(pdf)))
+    document = io.BytesIO()
+    writer.write(document)
+    yield document.getvalue()
+
+
+def render(versions: Dict[int, ReportVersion], print_format: str, print_date: date,
+           workers: Optional[int] = None) -> Iterator[bytes]:
+    """
+    :param versions: The versions of the reports to print, see batch_versions.
+    :param print_format: Either ZIP or PDF.
+    :param print_date: The date printed in each page's header.
+    :param workers: Number of worker processes rendering the reports.
+    :return: An iterator of byte chunks.
+    """
+    if print_format == ZIP:
+        return render_zip(versions, print_date, workers=workers)
+    return render_pdf(versions, print_date, workers=workers)
+
+
+def streaming_print_response(versions: Dict[int, ReportVersion], print_format: str,
+                             print_date: date) -> StreamingHttpResponse:
+    """:return: The reports, see render, streamed as they are rendered."""
+    response = StreamingHttpResponse(render(versions, print_format, print_date),
+                                     content_type=BATCH_PRINT_FORMATS[print_format])
+    response["Content-Disposition"] = f'attachment; filename="incidents.{print_format}"'
+    return response
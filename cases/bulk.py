@@ -0,0 +1,194 @@
+import logging
+
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from datetime import datetime
+from django.db import transaction
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from cases.caches import offense_catalog, officer_cache
+from cases.incident_numbers import incident_number_allocator
+from cases.models import Incident, IncidentInvolvedParty, Officer
+from cases.serializers import (BulkIncidentSerializer, BulkIncidentInvolvedPartySerializer,
+                               IncidentInvolvedPartySerializer)
+from cases.constants import INCIDENT_DATETIME_FIELDS, INCIDENT_OFFICER_FIELDS
+from cases.datetimes import local_datetimes
+from cases.utils import bulk_create_addresses
+
+logger = logging.getLogger('cases')
+
+
+class BulkItemResult:
+    """Outcome of a single item of a bulk request."""
+
+    def __init__(self, index: int, instance: Any = None, errors: Optional[Dict] = None) -> None:
+        self.index = index
+        self.instance = instance
+        self.errors = errors
+
+    @property
+    def ok(self) -> bool:
+        return self.errors is None
+
+
+def _collect_ids(values: Iterable[Any]) -> Set[int]:
+    """Gathers anything that looks like a primary key; everything else is left to validation."""
+    ids = set()
+    for value in values:
+        if isinstance(value, int) or (isinstance(value, str) and value.isdigit()):
+            ids.add(int(value))
+    return ids
+
+
+def resolve_incident_references(payloads: List[Dict]) -> Dict[str, Dict[int, Any]]:
+    """
+    Resolves every officer referenced by a batch of incident payloads through the officer
+    cache (at most one query), and their offenses from the offense catalog, keyed by ID,
+    in the form the serializers expect in their context.
+    :param payloads: Raw incident dicts received from the API client.
+    :return: Serializer context containing 'officers' and 'offenses'.
+    """
+    payloads = [payload for payload in payloads if isinstance(payload, dict)]
+    officer_ids = _collect_ids(payload.get(field) for payload in payloads
+                               for field in INCIDENT_OFFICER_FIELDS)
+    offense_ids = _collect_ids(offense for payload in payloads
+                               for offense in payload.get("offenses") or [])
+    return {'officers': officer_cache.in_bulk(officer_ids),
+            'offenses': offense_catalog.in_bulk(offense_ids)}
+
+
+def decode_incident_datetimes(items: Iterable[Any]) -> Dict[Tuple[str, str], datetime]:
+    """
+    Decodes the {date, time} values of every datetime field of a batch of raw incidents in
+    one pass, each distinct value once.
+    :param items: Raw incident dicts received from the API client.
+    :return: The datetimes, keyed by (date, time). Values that do not decode are left out.
+    """
+    pairs = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        for field in INCIDENT_DATETIME_FIELDS:
+            value = item.get(field)
+            if (isinstance(value, dict) and isinstance(value.get("date"), str)
+                    and isinstance(value.get("time"), str)):
+                pairs.append((value["date"], value["time"]))
+    return local_datetimes.decode_many(pairs)
+
+
+def create_incidents(payloads: List[Dict]) -> List[BulkItemResult]:
+    """
+    Validates a batch of incidents together and inserts all of the valid ones inside a
+    single transaction. Officers are resolved with one query, offenses from memory, locations
+    are created set-wise, and incidents and their offenses are written with bulk inserts,
+    so the number of queries does not depend on the size of the batch. Incidents without
+    an incident number are given allocated ones.
+    :param payloads: Raw incident dicts received from the API client.
+    :return: One BulkItemResult per payload, in order.
+    """
+    context = resolve_incident_references(payloads)
+    results = []
+    valid = []
+    for index, payload in enumerate(payloads):
+        serializer = BulkIncidentSerializer(data=payload, context=context)
+        if serializer.is_valid():
+            valid.append((index, dict(serializer.validated_data)))
+            results.append(BulkItemResult(index=index))
+        else:
+            results.append(BulkItemResult(index=index, errors=serializer.errors))
+
+    unnumbered = [data for _, data in valid if not data.get("incident_number")]
+    if unnumbered:
+        for data, number in zip(unnumbered, incident_number_allocator.allocate(len(unnumbered))):
+            data["incident_number"] = number
+
+    _reject_duplicate_incident_numbers(valid, results)
+    valid = [(index, data) for index, data in valid if results[index].ok]
+    if not valid:
+        return results
+
+    with transaction.atomic():
+        addresses = bulk_create_addresses([data.pop("location") for _, data in valid])
+        offenses = [data.pop("offenses") for _, data in valid]
+        for _, data in valid:
+            data.pop("offenses_mode", None)
+        incidents = [Incident(**data, location=address)
+                     for (_, data), address in zip(valid, addresses)]
+        incidents = Incident.objects.bulk_create(incidents)
+
+        through = Incident.offenses.through
+        through.objects.bulk_create(
+            [through(incident_id=incident.id, offense_id=offense_id)
+             for incident, incident_offenses in zip(incidents, offenses)
+             for offense_id in {offense.id for offense in incident_offenses}]
+        )
+
+    for (index, _), incident in zip(valid, incidents):
+        results[index].instance = incident
+    logger.info(f"Bulk created {len(incidents)} of {len(payloads)} incidents")
+    return results
+
+
+def _reject_duplicate_incident_numbers(valid: List, results: List[BulkItemResult]) -> None:
+    """Flags incident numbers that already exist, or appear more than once in the batch."""
+    numbers = Counter(data["incident_number"] for _, data in valid)
+    existing = set(Incident.objects.filter(incident_number__in=numbers.keys())
+                                   .values_list("incident_number", flat=True))
+    for index, data in valid:
+        number = data["incident_number"]
+        if number in existing:
+            message = "An Incident with that incident number already exists"
+        elif numbers[number] > 1:
+            message = "This incident number appears more than once in the request"
+        else:
+            continue
+        results[index].errors = {'incident_number': [message]}
+
+
+def create_incident_involved_parties(request: Request, kwargs: Dict[str, Any]) -> Response:
+    """
+    Creates a list of victims or suspects of one incident. Like DRF's many=True, the batch
+    is all or nothing: if any party is invalid, nothing is written and the response holds
+    one error dict per party. Otherwise the addresses and parties are inserted in bulk
+    within a single transaction.
+    :param request: The request, whose data is a list of party dicts.
+    :param kwargs: URL kwargs, plus the 'party_type' to create.
+    :return: 201 with the created parties, or 400 with the per-party errors.
+    """
+    payloads = [dict(payload) if isinstance(payload, dict) else payload
+                for payload in request.data]
+    for payload in payloads:
+        if isinstance(payload, dict):
+            payload['incident'] = kwargs.get('incidents_pk')
+
+    officer_ids = _collect_ids(payload.get("officer_signed") for payload in payloads
+                               if isinstance(payload, dict))
+    context = {'request': request,
+               'incidents': Incident.objects.in_bulk(_collect_ids([kwargs.get('incidents_pk')])),
+               'officers': Officer.objects.in_bulk(officer_ids)}
+
+    serializer = BulkIncidentInvolvedPartySerializer(data=payloads, many=True, context=context)
+    if not serializer.is_valid():
+        logger.debug(serializer.errors)
+        return Response(status=status.HTTP_400_BAD_REQUEST,
+                        data=serializer.errors)
+
+    validated = [dict(data) for data in serializer.validated_data]
+    address_fields = ("home_address", "employer_address")
+    with transaction.atomic():
+        address_data = [data[field] for data in validated for field in address_fields
+                        if data.get(field)]
+        addresses = iter(bulk_create_addresses(address_data))
+        parties = []
+        for data in validated:
+            for field in address_fields:
+                data[field] = next(addresses) if data.get(field) else None
+            parties.append(IncidentInvolvedParty(**data, party_type=kwargs.get('party_type')))
+        parties = IncidentInvolvedParty.objects.bulk_create(parties)
+
+    logger.info(f"Bulk created {len(parties)} {kwargs.get('party_type')} "
+                f"parties for incident {kwargs.get('incidents_pk')}")
+    return Response(status=status.HTTP_201_CREATED,
+                    data=IncidentInvolvedPartySerializer(parties, many=True, context=context).data)
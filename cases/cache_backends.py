@@ -0,0 +1,75 @@
+import pickle
+
+from typing import Any, Dict, Iterable, List, Optional
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class RedisCache(BaseCache):
+    """
+    A minimal Django cache backend on a Redis server, e.g. a local one during development,
+    given as a redis:// URL in LOCATION. Values are pickled. Requires the redis package.
+    """
+
+    def __init__(self, server: str, params: Dict[str, Any]) -> None:
+        super(RedisCache, self).__init__(params)
+        if redis is None:
+            raise ImproperlyConfigured("The redis cache backend requires the redis package.")
+        self._client = redis.Redis.from_url(server)
+
+    def _expiry(self, timeout: Any) -> Optional[int]:
+        timeout = self.get_backend_timeout(timeout)
+        return None if timeout is None else max(int(timeout), 1)
+
+    def add(self, key: str, value: Any, timeout: Any = DEFAULT_TIMEOUT,
+            version: Optional[int] = None) -> bool:
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return bool(self._client.set(key, pickle.dumps(value), ex=self._expiry(timeout), nx=True))
+
+    def get(self, key: str, default: Any = None, version: Optional[int] = None) -> Any:
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        value = self._client.get(key)
+        return default if value is None else pickle.loads(value)
+
+    def set(self, key: str, value: Any, timeout: Any = DEFAULT_TIMEOUT,
+            version: Optional[int] = None) -> None:
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._client.set(key, pickle.dumps(value), ex=self._expiry(timeout))
+
+    def delete(self, key: str, version: Optional[int] = None) -> None:
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._client.delete(key)
+
+    def get_many(self, keys: Iterable[str], version: Optional[int] = None) -> Dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self._client.mget([self.make_key(key, version=version) for key in keys])
+        return {key: pickle.loads(value) for key, value in zip(keys, values)
+                if value is not None}
+
+    def set_many(self, data: Dict[str, Any], timeout: Any = DEFAULT_TIMEOUT,
+                 version: Optional[int] = None) -> List[str]:
+        expiry = self._expiry(timeout)
+        with self._client.pipeline() as pipeline:
+            for key, value in data.items():
+                pipeline.set(self.make_key(key, version=version), pickle.dumps(value), ex=expiry)
+            pipeline.execute()
+        return []
+
+    def delete_many(self, keys: Iterable[str], version: Optional[int] = None) -> None:
+        keys = [self.make_key(key, version=version) for key in keys]
+        if keys:
+            self._client.delete(*keys)
+
+    def clear(self) -> None:
+        self._client.flushdb()
@@ -0,0 +1,467 @@
+import math
+import logging
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+from uuid import uuid4
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from cases.constants import STATES
+from cases.models import CacheVersion, City, Offense, Officer, State
+
+logger = logging.getLogger('cases')
+
+
+class TTLCache:
+    """
+    A small, thread safe, in-process LRU cache whose entries expire `ttl` seconds after
+    being set. Keeps hit/miss counts so that its effectiveness can be checked.
+    """
+    _missing = object()
+
+    def __init__(self, ttl: float, maxsize: int = 1024) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key, self._missing)
+            if entry is not self._missing:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'size': len(self._entries), 'maxsize': self.maxsize,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SharedVersion:
+    """
+    The version, kept in the cache_version table, of something every process caches. It
+    is replaced by bump() within the transaction that changes what it versions, so the
+    new version becomes visible to other processes exactly when the change does. Each
+    process reads it at most every `interval` seconds, and straight away after expire().
+    """
+
+    def __init__(self, name: str, interval: float) -> None:
+        self.name = name
+        self.interval = interval
+        self._value: Optional[str] = None
+        self._checked = -math.inf
+
+    def get(self) -> str:
+        """:return: The version, as last read from the database."""
+        if self._value is None or time.monotonic() - self._checked >= self.interval:
+            value = (CacheVersion.objects.filter(name=self.name)
+                                         .values_list("value", flat=True).first())
+            self._value = value or ""
+            self._checked = time.monotonic()
+        return self._value
+
+    def expire(self) -> None:
+        """Makes the next get() read the version from the database."""
+        self._checked = -math.inf
+
+    def bump(self) -> None:
+        """Replaces the version, as part of the current transaction."""
+        value = uuid4().hex
+        if not (CacheVersion.objects.filter(name=self.name)
+                                    .update(value=value, updated_timestamp=timezone.now())):
+            CacheVersion.objects.update_or_create(name=self.name, defaults={'value': value})
+        self.expire()
+
+
+class OffenseCatalog:
+    """
+    Process-local copy of the (static, UCR derived) offense table.
+
+    Every process keeps the offenses, and their pre-rendered JSON, in memory, along with
+    the shared version (see SharedVersion) they were loaded at. Saving or deleting an
+    Offense bumps that version, and every process checks it at most every
+    settings.SHARED_VERSION_CHECK_INTERVAL seconds, reloading the catalog once it moved:
+    the writing process straight away, others within the interval. An offense this
+    process does not know yet, e.g. one created by another process moments ago, makes it
+    check straight away rather than report the offense missing.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._shared_version = SharedVersion("offenses",
+                                             interval=settings.SHARED_VERSION_CHECK_INTERVAL)
+        self._version: Optional[str] = None
+        self._offenses: Dict[int, Offense] = {}
+        self._data: List[Dict] = []
+        self._data_by_id: Dict[int, Dict] = {}
+        self._rendered = b""
+
+    def _load(self, check: bool = False) -> str:
+        """
+        :param check: Read the shared version now, rather than trust one read recently.
+        :return: The version of the catalog now loaded.
+        """
+        if check:
+            self._shared_version.expire()
+        version = self._shared_version.get()
+        if version == self._version:
+            return version
+
+        with self._lock:
+            if version != self._version:
+                from cases.serializers import OffenseSerializer
+                from rest_framework.renderers import JSONRenderer
+
+                offenses = list(Offense.objects.order_by("id"))
+                data = OffenseSerializer(offenses, many=True).data
+                self._offenses = {offense.id: offense for offense in offenses}
+                self._data = data
+                self._data_by_id = {item["id"]: item for item in data}
+                self._rendered = JSONRenderer().render(data)
+                self._version = version
+                logger.debug(f"Loaded {len(offenses)} offenses into the catalog")
+        return version
+
+    def _load_knowing(self, offense_ids: Iterable[int]) -> None:
+        """Loads the catalog, checking the shared version now if any offense is unknown."""
+        self._load()
+        if any(offense_id not in self._offenses for offense_id in offense_ids):
+            self._load(check=True)
+
+    @property
+    def version(self) -> str:
+        return self._load()
+
+    def get(self, offense_id: int) -> Offense:
+        """
+        :raises KeyError: If there is no such offense.
+        """
+        self._load_knowing([offense_id])
+        return self._offenses[offense_id]
+
+    def in_bulk(self, offense_ids: Iterable[int]) -> Dict[int, Offense]:
+        """The catalog counterpart to Offense.objects.in_bulk; unknown IDs are left out."""
+        offense_ids = list(offense_ids)
+        self._load_knowing(offense_ids)
+        return {offense_id: self._offenses[offense_id]
+                for offense_id in offense_ids if offense_id in self._offenses}
+
+    def data(self, offense_id: Optional[int] = None):
+        """
+        The serialized catalog, or the serialized offense with the given ID.
+        :raises KeyError: If there is no such offense.
+        """
+        if offense_id is None:
+            self._load()
+            return self._data
+        self._load_knowing([offense_id])
+        return self._data_by_id[offense_id]
+
+    def rendered(self) -> bytes:
+        """The whole catalog, serialized and rendered as JSON."""
+        self._load()
+        return self._rendered
+
+    def invalidate(self) -> None:
+        """
+        Moves every process on to a new version once the current transaction commits;
+        this process reloads on its next access, seeing its own writes.
+        """
+        self._shared_version.bump()
+        # Once committed, check again, in case of a reload from within the transaction.
+        transaction.on_commit(self._shared_version.expire)
+
+    def clear(self) -> None:
+        """Forgets what this process has loaded, e.g. between tests."""
+        with self._lock:
+            self._shared_version.expire()
+            self._version = None
+            self._offenses = {}
+            self._data = []
+            self._data_by_id = {}
+            self._rendered = b""
+
+
+offense_catalog = OffenseCatalog()
+
+
+class OfficerCache:
+    """
+    Resolves officers, by ID, officer number or user, from a short lived in-process cache,
+    fetching whatever is missing with a single query. Officers are evicted from this
+    process' cache when they or their users are saved or deleted; other processes pick
+    changes up within the TTL.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 1024) -> None:
+        self._by_id = TTLCache(ttl=ttl, maxsize=maxsize)
+        self._id_by_number = TTLCache(ttl=ttl, maxsize=maxsize)
+        self._id_by_user = TTLCache(ttl=ttl, maxsize=maxsize)
+
+    def _fetch(self, query: Q) -> List[Officer]:
+        officers = list(Officer.objects.select_related("user").filter(query))
+        for officer in officers:
+            self._by_id.set(officer.id, officer)
+            self._id_by_number.set(officer.officer_number, officer.id)
+        return officers
+
+    def in_bulk(self, officer_ids: Iterable[int]) -> Dict[int, Officer]:
+        """
+        Like Officer.objects.in_bulk, but at most one query, and none for cached officers.
+        Unknown IDs are left out.
+        """
+        found = {}
+        missing = set()
+        for officer_id in set(officer_ids):
+            officer = self._by_id.get(officer_id)
+            if officer is None:
+                missing.add(officer_id)
+            else:
+                found[officer_id] = officer
+        if missing:
+            found.update((officer.id, officer) for officer in self._fetch(Q(id__in=missing)))
+        return found
+
+    def in_bulk_by_number(self, officer_numbers: Iterable[int]) -> Dict[int, Officer]:
+        """As in_bulk, but keyed by officer number."""
+        found = {}
+        missing = set()
+        for number in set(officer_numbers):
+            officer_id = self._id_by_number.get(number)
+            officer = self._by_id.get(officer_id) if officer_id is not None else None
+            if officer is None:
+                missing.add(number)
+            else:
+                found[number] = officer
+        if missing:
+            found.update((officer.officer_number, officer)
+                         for officer in self._fetch(Q(officer_number__in=missing)))
+        return found
+
+    def for_user(self, user_id: int) -> Optional[Officer]:
+        """
+        :return: The user's (first) officer, as user.officer_set.first() would return it,
+                 or None if the user is not an officer.
+        """
+        officer_id = self._id_by_user.get(user_id)
+        officer = self._by_id.get(officer_id) if officer_id is not None else None
+        if officer is None:
+            officer = min(self._fetch(Q(user_id=user_id)), key=lambda found: found.id,
+                          default=None)
+            if officer is not None:
+                self._id_by_user.set(user_id, officer.id)
+        return officer
+
+    def evict(self, officer: Officer) -> None:
+        self._by_id.pop(officer.id)
+        self._id_by_number.pop(officer.officer_number)
+        self._id_by_user.pop(officer.user_id)
+
+    def evict_user(self, user_id: int) -> None:
+        """Evicts the user's officers, whose cached copies embed the user."""
+        self._id_by_user.pop(user_id)
+        for officer_id in Officer.objects.filter(user_id=user_id).values_list("id", flat=True):
+            self._by_id.pop(officer_id)
+
+    def clear(self) -> None:
+        self._by_id.clear()
+        self._id_by_number.clear()
+        self._id_by_user.clear()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {'by_id': self._by_id.stats(), 'by_number': self._id_by_number.stats(),
+                'by_user': self._id_by_user.stats()}
+
+
+officer_cache = OfficerCache(ttl=settings.OFFICER_CACHE_TTL)
+
+
+class GeographyCache:
+    """
+    Interns State and City rows in the process. They are looked up for every address
+    written but practically never change, so once warm, resolving an address' state and
+    city costs no queries; missing ones are created. A row is only remembered once the
+    transaction that read or created it has committed, so a city that is rolled back is
+    never handed out. Renaming or deleting a state or city bumps a shared version (see
+    SharedVersion), and every process forgets what it interned once it sees the new one:
+    the writing process straight away, others within SHARED_VERSION_CHECK_INTERVAL.
+    """
+
+    def __init__(self, max_cities: int = 10000) -> None:
+        self._states = TTLCache(ttl=math.inf, maxsize=1024)
+        self._cities = TTLCache(ttl=math.inf, maxsize=max_cities)
+        self._preloaded = False
+        self._shared_version = SharedVersion("geography",
+                                             interval=settings.SHARED_VERSION_CHECK_INTERVAL)
+        self._version: Optional[str] = None
+
+    @staticmethod
+    def state_name(abbreviation: str) -> str:
+        """The full name of a state, as given in cases.constants.STATES."""
+        return STATES.get(abbreviation, abbreviation)
+
+    def _check_version(self) -> None:
+        """Forgets every interned row if a state or city changed since they were read."""
+        version = self._shared_version.get()
+        if version != self._version:
+            self._states.clear()
+            self._cities.clear()
+            self._preloaded = False
+            self._version = version
+
+    def _remember_states(self, states: Iterable[State], preloaded: bool = False) -> None:
+        states = list(states)
+
+        def remember():
+            for state in states:
+                self._states.set(state.abbreviation, state)
+            if preloaded:
+                self._preloaded = True
+
+        transaction.on_commit(remember)
+
+    def _remember_cities(self, cities: Iterable[City]) -> None:
+        cities = list(cities)
+
+        def remember():
+            for city in cities:
+                self._cities.set((city.name, city.state_id), city)
+
+        transaction.on_commit(remember)
+
+    def states_in_bulk(self, abbreviations: Iterable[str]) -> Dict[str, State]:
+        """
+        :param abbreviations: State abbreviations, e.g. "GA".
+        :return: The State for each abbreviation, keyed by abbreviation. Unknown states are
+                 created, named after cases.constants.STATES.
+        """
+        self._check_version()
+        found = {}
+        missing = set()
+        for abbreviation in set(abbreviations):
+            state = self._states.get(abbreviation)
+            if state is None:
+                missing.add(abbreviation)
+            else:
+                found[abbreviation] = state
+        if not missing:
+            return found
+
+        if self._preloaded:
+            loaded = list(State.objects.filter(abbreviation__in=missing))
+        else:
+            # There are only a few dozen states, so the first miss loads all of them.
+            loaded = list(State.objects.all())
+            self._remember_states(loaded, preloaded=True)
+        loaded = [state for state in loaded if state.abbreviation in missing]
+        found.update((state.abbreviation, state) for state in loaded)
+
+        new_states = [State(abbreviation=abbr, name=self.state_name(abbr))
+                      for abbr in sorted(missing - found.keys())]
+        if new_states:
+            logger.debug(f"Creating states: {new_states}")
+            State.objects.bulk_create(new_states, ignore_conflicts=True)
+            created = State.objects.filter(abbreviation__in=[state.abbreviation
+                                                             for state in new_states])
+            loaded.extend(created)
+            found.update((state.abbreviation, state) for state in created)
+        self._remember_states(loaded)
+        return found
+
+    def cities_in_bulk(self, keys: Iterable[Tuple[str, State]]) -> Dict[Tuple[str, int], City]:
+        """
+        :param keys: (city name, State) pairs.
+        :return: The City for each pair, keyed by (name, state ID), with its state set.
+                 Unknown cities are created.
+        """
+        self._check_version()
+        found = {}
+        missing: Set[Tuple[str, int]] = set()
+        states = {}
+        for name, state in keys:
+            states[state.id] = state
+            city = self._cities.get((name, state.id))
+            if city is None:
+                missing.add((name, state.id))
+            else:
+                found[(name, state.id)] = city
+        if not missing:
+            return found
+
+        def fetch(wanted: Set[Tuple[str, int]]) -> List[City]:
+            cities = City.objects.filter(name__in={name for name, _ in wanted},
+                                         state_id__in={state_id for _, state_id in wanted})
+            return [city for city in cities if (city.name, city.state_id) in wanted]
+
+        loaded = fetch(missing)
+        new_keys = missing - {(city.name, city.state_id) for city in loaded}
+        if new_keys:
+            logger.debug(f"Creating cities: {sorted(new_keys)}")
+            # Cities created concurrently are skipped here and picked up by the fetch below.
+            City.objects.bulk_create([City(name=name, state_id=state_id)
+                                      for name, state_id in sorted(new_keys)],
+                                     ignore_conflicts=True)
+            loaded.extend(fetch(new_keys))
+        for city in loaded:
+            city.state = states[city.state_id]
+            found[(city.name, city.state_id)] = city
+        self._remember_cities(loaded)
+        return found
+
+    def state(self, abbreviation: str) -> State:
+        return self.states_in_bulk([abbreviation])[abbreviation]
+
+    def city(self, name: str, state: State) -> City:
+        return self.cities_in_bulk([(name, state)])[(name, state.id)]
+
+    def invalidate(self) -> None:
+        """Makes every process forget its states and cities, this one straight away."""
+        self._shared_version.bump()
+        transaction.on_commit(self._shared_version.expire)
+
+    def clear(self) -> None:
+        self._states.clear()
+        self._cities.clear()
+        self._preloaded = False
+        self._shared_version.expire()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {'states': self._states.stats(), 'cities': self._cities.stats()}
+
+
+geography_cache = GeographyCache()
@@ -0,0 +1,148 @@
+import hashlib
+import logging
+
+from datetime import datetime
+from typing import Any, Callable, List, Optional
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+
+logger = logging.getLogger('cases')
+
+
+def timestamp_token(timestamp: Optional[datetime]) -> str:
+    """Microsecond resolution token for a timestamp, so that edits within a second differ."""
+    if timestamp is None:
+        return "0"
+    return str(int(timestamp.timestamp() * 1000000))
+
+
+def make_etag(*parts: Any, variant: str = "") -> str:
+    """
+    Builds a strong ETag out of the given parts, e.g. an object's ID and timestamp token.
+    :param parts: Values which together identify one version of a resource.
+    :param variant: Distinguishes different representations of the same version,
+                    such as sparse fieldsets of an incident.
+    :return: The quoted ETag.
+    """
+    tag = ".".join(str(part) for part in parts)
+    if variant:
+        tag = f"{tag}.{variant}"
+    return quote_etag(tag)
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = "The resource has been changed since it was read; fetch it and try again."
+    default_code = "precondition_failed"
+
+
+def if_match_satisfied(request: Request, *parts: Any) -> Optional[bool]:
+    """
+    Checks the request's If-Match header against the current version of a resource, as
+    given to make_etag. The representation variant of the client's ETag is ignored, so the
+    ETag of any sparse fieldset of the resource will do.
+    :param parts: The parts the resource's ETag is currently made of.
+    :return: None if there is no If-Match header, otherwise whether it matches.
+    """
+    header = request.META.get("HTTP_IF_MATCH")
+    if not header:
+        return None
+    current = make_etag(*parts).strip('"')
+    for etag in parse_etags(header):
+        if etag == "*":
+            return True
+        # Weak ETags never match for If-Match, see RFC 7232 section 3.1.
+        if not etag.startswith("W/"):
+            tag = etag.strip('"')
+            if tag == current or tag.startswith(f"{current}."):
+                return True
+    return False
+
+
+def _latest(timestamps) -> Optional[datetime]:
+    return max((timestamp for timestamp in timestamps if timestamp is not None), default=None)
+
+
+class ConditionalGetMixin:
+    """
+    Adds ETag and Last-Modified headers, derived from `updated_timestamp`, to retrieve
+    (and optionally list) responses. Requests carrying a matching If-None-Match or
+    If-Modified-Since header get a 304 after a single cheap query, without the object
+    ever being loaded or serialized.
+    Models whose representation embeds other rows also carry `embedded_updated_timestamp`,
+    which then goes into the headers as well.
+    """
+    conditional_list = True
+    embedded_timestamp_field = "embedded_updated_timestamp"
+
+    def get_etag_variant(self, request: Request) -> str:
+        """Different query strings can select different representations of the same data."""
+        query_string = request.META.get("QUERY_STRING", "")
+        if not query_string:
+            return ""
+        return hashlib.md5(query_string.encode("utf-8")).hexdigest()[:12]
+
+    def _get_version_queryset(self):
+        return self.get_queryset().select_related(None).prefetch_related(None).order_by()
+
+    def _get_timestamp_fields(self) -> List[str]:
+        """:return: The timestamps that together version a representation of the model."""
+        fields = ["updated_timestamp"]
+        try:
+            self.get_queryset().model._meta.get_field(self.embedded_timestamp_field)
+        except FieldDoesNotExist:
+            return fields
+        return fields + [self.embedded_timestamp_field]
+
+    def retrieve(self, request: Request, *args, **kwargs) -> HttpResponse:
+        lookup = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        timestamps = (self._get_version_queryset()
+                          .filter(**{self.lookup_field: lookup})
+                          .values_list(*self._get_timestamp_fields())
+                          .first())
+        if timestamps is None:
+            # Let the regular code path produce the 404.
+            return super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs)
+
+        # updated_timestamp's token comes first, so that if_match_satisfied still accepts
+        # this ETag for writes after embedded rows alone have changed.
+        etag = make_etag(lookup, *[timestamp_token(timestamp) for timestamp in timestamps],
+                         variant=self.get_etag_variant(request))
+        handler = super(ConditionalGetMixin, self).retrieve
+        return self._conditional_response(request, etag, _latest(timestamps),
+                                          handler, *args, **kwargs)
+
+    def list(self, request: Request, *args, **kwargs) -> HttpResponse:
+        if not self.conditional_list:
+            return super(ConditionalGetMixin, self).list(request, *args, **kwargs)
+
+        fields = self._get_timestamp_fields()
+        summary = self._get_version_queryset().aggregate(
+            count=Count("id"), **{field: Max(field) for field in fields})
+        timestamps = [summary[field] for field in fields]
+        etag = make_etag(summary["count"],
+                         *[timestamp_token(timestamp) for timestamp in timestamps],
+                         variant=self.get_etag_variant(request))
+        handler = super(ConditionalGetMixin, self).list
+        return self._conditional_response(request, etag, _latest(timestamps),
+                                          handler, *args, **kwargs)
+
+    def _conditional_response(self, request: Request, etag: str, updated: Optional[datetime],
+                              handler: Callable, *args, **kwargs) -> HttpResponse:
+        last_modified = int(updated.timestamp()) if updated else None
+        not_modified = get_conditional_response(request, etag=etag,
+                                                last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        response = handler(request, *args, **kwargs)
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        return response
@@ -75,6 +75,54 @@ SHIFT_CHOICES = [(DAY, "Day"),
                  (NIGHT, "Night"),
                  EMPTY_CHOICE]
 
+INCIDENT_DATETIME_FIELDS = ("report_datetime",
+                            "reviewed_datetime",
+                            "approved_datetime",
+                            "earliest_occurrence_datetime",
+                            "latest_occurrence_datetime")
+
+INCIDENT_OFFICER_FIELDS = ("reporting_officer",
+                           "reviewed_by_officer",
+                           "investigating_officer",
+                           "officer_making_report",
+                           "supervisor")
+
+# How a write's list of offenses is applied to an existing incident's offenses.
+OFFENSES_APPEND = "append"
+OFFENSES_REPLACE = "replace"
+OFFENSES_REMOVE = "remove"
+
+OFFENSES_MODE_CHOICES = [(OFFENSES_APPEND, "Add to the existing offenses"),
+                         (OFFENSES_REPLACE, "Replace the existing offenses"),
+                         (OFFENSES_REMOVE, "Remove from the existing offenses")]
+
+# Words replaced by their abbreviation when an address is normalized, so that
+# "123 Main Street" and "123 main st." are recognised as the same place. See Address.make_key.
+ADDRESS_ABBREVIATIONS = {
+    "NORTH": "N",
+    "SOUTH": "S",
+    "EAST": "E",
+    "WEST": "W",
+    "NORTHEAST": "NE",
+    "NORTHWEST": "NW",
+    "SOUTHEAST": "SE",
+    "SOUTHWEST": "SW",
+    "STREET": "ST",
+    "AVENUE": "AVE",
+    "ROAD": "RD",
+    "DRIVE": "DR",
+    "BOULEVARD": "BLVD",
+    "LANE": "LN",
+    "COURT": "CT",
+    "CIRCLE": "CIR",
+    "PLACE": "PL",
+    "PARKWAY": "PKWY",
+    "HIGHWAY": "HWY",
+    "TERRACE": "TER",
+    "TRAIL": "TRL",
+    "SQUARE": "SQ",
+}
+
 VICTIM = "VICTIM"
 SUSPECT = "SUSPECT"
 
@@ -0,0 +1,181 @@
+import logging
+import pytz
+
+from typing import Dict, Iterable, Optional, Tuple
+from datetime import datetime, timedelta, tzinfo
+from django.conf import settings
+
+logger = logging.getLogger('cases')
+
+HOUR = timedelta(hours=1)
+# The last instant of an hour long bucket, relative to its start.
+END_OF_HOUR = HOUR - timedelta(microseconds=1)
+# "HH:MM" for every minute of the day, indexed by hour * 60 + minute.
+TIME_STRINGS = tuple(f"{minute // 60:02d}:{minute % 60:02d}" for minute in range(24 * 60))
+
+
+def _parse_date_portion(raw_date_str: str) -> Tuple[int, int, int]:
+    if "-" in raw_date_str:
+        date_parts = raw_date_str.split("-")
+        year = int(date_parts[0])
+        month = int(date_parts[1])
+        day = int(date_parts[2])
+    elif "/" in raw_date_str:
+        date_parts = raw_date_str.split("/")
+        year = int(date_parts[2])
+        month = int(date_parts[0])
+        day = int(date_parts[1])
+    else:
+        logger.error(f'Attempted to parse the raw date string {raw_date_str}, but no valid '
+                     f'delimiter was found.')
+        raise ValueError(f"{raw_date_str} does not contain a valid delimiter.")
+
+    return year, month, day
+
+
+def _parse_time_portion(raw_time_str: str) -> Tuple[int, int]:
+    hours = 0
+    minutes = 0
+    if ':' in raw_time_str:
+        time_parts = raw_time_str.split(':')
+        hours = int(time_parts[0])
+        minutes = int(time_parts[1])
+
+    return hours, minutes
+
+
+def _hour_key(value: datetime) -> int:
+    """Numbers the hours since 0001-01-01, ignoring any time zone."""
+    return value.toordinal() * 24 + value.hour
+
+
+class DateTimeCodec:
+    """
+    Converts between aware datetimes and the API's {"date": "YYYY-MM-DD", "time": "HH:MM"}
+    wire format, in one local time zone.
+
+    A zone's offset only changes at a handful of instants a year, so the codec remembers
+    the offset of every hour it has seen (in UTC when encoding, in local time when decoding)
+    and converts with plain datetime arithmetic after that. Hours in which the offset does
+    change are never remembered and always go through pytz. Decoding localizes properly,
+    rather than attaching the zone's first (LMT) offset as `datetime(tzinfo=zone)` does.
+    """
+
+    def __init__(self, zone_name: str, maxsize: int = 100000) -> None:
+        self.zone = pytz.timezone(zone_name)
+        self.maxsize = maxsize
+        self._utc_offsets: Dict[int, timedelta] = {}
+        self._local_zones: Dict[Tuple[int, int, int, int], tzinfo] = {}
+        self._date_strings: Dict[int, str] = {}
+
+    def _utc_offset(self, utc: datetime) -> timedelta:
+        """:param utc: A naive datetime in UTC."""
+        key = _hour_key(utc)
+        offset = self._utc_offsets.get(key)
+        if offset is None:
+            start = utc.replace(minute=0, second=0, microsecond=0)
+            offset = pytz.utc.localize(start).astimezone(self.zone).utcoffset()
+            end = pytz.utc.localize(start + END_OF_HOUR).astimezone(self.zone).utcoffset()
+            if offset != end:
+                return pytz.utc.localize(utc).astimezone(self.zone).utcoffset()
+            if len(self._utc_offsets) >= self.maxsize:
+                self._utc_offsets.clear()
+            self._utc_offsets[key] = offset
+        return offset
+
+    def _local_zone(self, year: int, month: int, day: int, hour: int) -> Optional[tzinfo]:
+        """
+        :return: The tzinfo pytz localizes the given local hour with, or None if that
+                 changes within the hour.
+        """
+        key = (year, month, day, hour)
+        zone = self._local_zones.get(key)
+        if zone is None:
+            start = datetime(year, month, day, hour)
+            zone = self.zone.localize(start).tzinfo
+            if zone is not self.zone.localize(start + END_OF_HOUR).tzinfo:
+                return None
+            if len(self._local_zones) >= self.maxsize:
+                self._local_zones.clear()
+            self._local_zones[key] = zone
+        return zone
+
+    def _date_string(self, local: datetime) -> str:
+        ordinal = local.toordinal()
+        date_string = self._date_strings.get(ordinal)
+        if date_string is None:
+            if len(self._date_strings) >= self.maxsize:
+                self._date_strings.clear()
+            date_string = f"{local.year:04d}-{local.month:02d}-{local.day:02d}"
+            self._date_strings[ordinal] = date_string
+        return date_string
+
+    def localtime(self, value: datetime) -> datetime:
+        """
+        The counterpart to django.utils.timezone.localtime, for this codec's zone.
+        :param value: An aware datetime.
+        :return: A naive datetime, in local time.
+        """
+        offset = value.utcoffset()
+        if offset is None:
+            raise ValueError("localtime() cannot be applied to a naive datetime")
+        utc = value.replace(tzinfo=None) - offset
+        return utc + self._utc_offset(utc)
+
+    def encode(self, value: Optional[datetime]) -> Optional[Dict[str, str]]:
+        """
+        :param value: An aware datetime.
+        :return: The value's local date and time, e.g. {'date': '2019-03-01', 'time': '13:30'}.
+        """
+        if value is None:
+            return None
+        local = self.localtime(value)
+        return {'date': self._date_string(local),
+                'time': TIME_STRINGS[local.hour * 60 + local.minute]}
+
+    def decode(self, date_string: str, time_string: str = "") -> datetime:
+        """
+        :param date_string: e.g. "2019-03-01" or "3/1/2019"
+        :param time_string: e.g. "13:30"; without one, the date's midnight.
+        :return: The aware datetime the local date and time describe. Times that are
+                 skipped or repeated when the clocks change are read as standard time.
+        :raises ValueError: If either part cannot be parsed.
+        """
+        # The format the API itself sends is sliced rather than split.
+        if len(date_string) == 10 and date_string[4] == "-" and date_string[7] == "-":
+            year, month, day = int(date_string[:4]), int(date_string[5:7]), int(date_string[8:])
+        else:
+            year, month, day = _parse_date_portion(raw_date_str=date_string)
+        if len(time_string) == 5 and time_string[2] == ":":
+            hours, minutes = int(time_string[:2]), int(time_string[3:])
+        else:
+            hours, minutes = _parse_time_portion(raw_time_str=time_string)
+        zone = self._local_zone(year, month, day, hours)
+        if zone is None:
+            return self.zone.localize(datetime(year, month, day, hours, minutes))
+        return datetime(year, month, day, hours, minutes, tzinfo=zone)
+
+    def decode_many(self, values: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], datetime]:
+        """
+        decode, for e.g. every datetime of a bulk request at once. Each distinct
+        (date, time) pair is decoded once.
+        :return: The datetime of each pair, keyed by pair. Pairs that cannot be decoded
+                 are left out, for validation to report.
+        """
+        decoded = {}
+        for value in values:
+            if value in decoded:
+                continue
+            try:
+                decoded[value] = self.decode(*value)
+            except (TypeError, ValueError):
+                pass
+        return decoded
+
+    def clear(self) -> None:
+        self._utc_offsets.clear()
+        self._local_zones.clear()
+        self._date_strings.clear()
+
+
+local_datetimes = DateTimeCodec(settings.TIME_ZONE)
@@ -0,0 +1,150 @@
+import csv
+import json
+import logging
+
+from collections import OrderedDict
+from datetime import date, datetime
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List
+
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+
+from cases.constants import INCIDENT_OFFICER_FIELDS
+from cases.caches import offense_catalog
+from cases.models import Incident
+
+logger = logging.getLogger('cases')
+
+NDJSON = "ndjson"
+CSV = "csv"
+EXPORT_FORMATS = {NDJSON: "application/x-ndjson",
+                  CSV: "text/csv"}
+EXPORT_CHUNK_SIZE = 2000
+
+INCIDENT_EXPORT_FIELDS = ("id", "incident_number", "report_datetime", "reviewed_datetime",
+                          "approved_datetime", "earliest_occurrence_datetime",
+                          "latest_occurrence_datetime", "beat", "shift",
+                          "damaged_amount", "stolen_amount", "narrative")
+LOCATION_EXPORT_FIELDS = (("street_number", "location__street_number"),
+                          ("route", "location__route"),
+                          ("city", "location__city__name"),
+                          ("state", "location__city__state__abbreviation"),
+                          ("postal_code", "location__postal_code"))
+
+
+def _officer_lookups(officer_field: str) -> List[tuple]:
+    return [(f"{officer_field}_number", f"{officer_field}__officer_number"),
+            (f"{officer_field}_first_name", f"{officer_field}__user__first_name"),
+            (f"{officer_field}_last_name", f"{officer_field}__user__last_name")]
+
+
+# (column name, ORM lookup) pairs, in the order columns are written.
+EXPORT_LOOKUPS = ([(field, field) for field in INCIDENT_EXPORT_FIELDS] +
+                  [lookup for field in INCIDENT_OFFICER_FIELDS
+                   for lookup in _officer_lookups(field)] +
+                  [(f"location_{column}", lookup) for column, lookup in LOCATION_EXPORT_FIELDS])
+EXPORT_COLUMNS = [column for column, _ in EXPORT_LOOKUPS] + ["offense_ids", "offense_ucr_codes"]
+
+
+def _chunked(iterable: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _serialize_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def iter_incident_rows(queryset: QuerySet,
+                       chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Yields every incident of the queryset as a flat dict, with its officers, location, and
+    offenses folded into columns. Incidents are read through a server-side cursor (on
+    databases that support one) chunk_size rows at a time, and the offenses of each chunk
+    are fetched with a single query, so memory use does not depend on the number of rows.
+    :param queryset: The incidents to export.
+    :param chunk_size: Number of incidents fetched per round trip.
+    :return: An iterator of OrderedDicts keyed by EXPORT_COLUMNS.
+    """
+    through = Incident.offenses.through
+
+    rows = (queryset.order_by("report_datetime", "id")
+                    .values(*[lookup for _, lookup in EXPORT_LOOKUPS])
+                    .iterator(chunk_size=chunk_size))
+    exported = 0
+    for chunk in _chunked(rows, chunk_size):
+        offenses = {}
+        links = (through.objects.filter(incident_id__in=[row["id"] for row in chunk])
+                                .order_by("offense_id")
+                                .values_list("incident_id", "offense_id"))
+        for incident_id, offense_id in links:
+            offenses.setdefault(incident_id, []).append(offense_id)
+
+        for row in chunk:
+            flat = OrderedDict((column, _serialize_value(row[lookup]))
+                               for column, lookup in EXPORT_LOOKUPS)
+            offense_ids = offenses.get(row["id"], [])
+            flat["offense_ids"] = offense_ids
+            offense_objects = offense_catalog.in_bulk(offense_ids)
+            flat["offense_ucr_codes"] = [offense_objects[offense_id].ucr_code
+                                         for offense_id in offense_ids
+                                         if offense_id in offense_objects]
+            yield flat
+        exported += len(chunk)
+    logger.info(f"Exported {exported} incidents")
+
+
+def render_ndjson(rows: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """One JSON document per line, emitted a chunk of lines at a time."""
+    for chunk in _chunked(rows, EXPORT_CHUNK_SIZE):
+        yield "".join(json.dumps(row) + "\n" for row in chunk)
+
+
+class _Echo:
+    """File-like object whose write() hands back the line instead of storing it."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def render_csv(rows: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """A header line followed by one line per row; list columns are joined with ';'."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for chunk in _chunked(rows, EXPORT_CHUNK_SIZE):
+        lines = []
+        for row in chunk:
+            values = [";".join(str(item) for item in value) if isinstance(value, list) else value
+                      for value in row.values()]
+            lines.append(writer.writerow(values))
+        yield "".join(lines)
+
+
+RENDERERS = {NDJSON: render_ndjson,
+             CSV: render_csv}
+
+
+def render(queryset: QuerySet, export_format: str,
+           chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Lazily renders the incidents of the queryset in the given format.
+    :param queryset: The incidents to export.
+    :param export_format: Either NDJSON or CSV.
+    :param chunk_size: Number of incidents fetched per round trip.
+    :return: An iterator of text chunks.
+    """
+    return RENDERERS[export_format](iter_incident_rows(queryset, chunk_size=chunk_size))
+
+
+def streaming_export_response(queryset: QuerySet, export_format: str) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(render(queryset, export_format),
+                                     content_type=EXPORT_FORMATS[export_format])
+    response["Content-Disposition"] = f'attachment; filename="incidents.{export_format}"'
+    return response
@@ -0,0 +1,143 @@
+import logging
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import QuerySet
+from rest_framework import serializers
+
+from cases.datetimes import local_datetimes
+from cases.models import Incident
+from cases.serializers import AddressSerializer, DateTimeSerializer, IncidentSerializer
+
+logger = logging.getLogger('cases')
+
+# Fields whose representation of a database value is the value itself.
+PASSTHROUGH_FIELDS = (serializers.IntegerField, serializers.CharField,
+                      serializers.PrimaryKeyRelatedField)
+# The ORM lookups behind AddressSerializer's method fields, relative to the address.
+METHOD_FIELD_LOOKUPS = {(AddressSerializer, "city"): "city__name",
+                        (AddressSerializer, "state"): "city__state__abbreviation"}
+
+# How a field's value is produced from a row; see FlatIncidentSerializer._compile.
+VALUE, CONVERT, NESTED, OFFENSES = range(4)
+Step = Tuple[str, int, Any, Optional[Callable]]
+# The incident columns and steps, then the through table's columns and the offense steps.
+Plan = Tuple[List[str], List[Step], Tuple[List[str], List[Step]]]
+
+
+class FlatIncidentSerializer:
+    """
+    A read only stand in for IncidentSerializer(many=True), for the incident list.
+
+    Every column IncidentSerializer renders, including those of the officers, their users,
+    and the location, is read with one `.values()` query joined in SQL, the offenses with
+    one query on the through table joined to the offenses, and the dicts are built
+    directly from the rows. Which fields there are, their order, and how each value
+    is rendered are all taken from IncidentSerializer when the plan is compiled, so the
+    output is the same, without any of DRF's per field machinery running per row.
+    Sparse fieldsets are not supported; use IncidentSerializer for those.
+    """
+
+    def __init__(self) -> None:
+        self._plan: Optional[Plan] = None
+
+    def _compile(self, serializer: serializers.Serializer, prefix: str,
+                 lookups: List[str]) -> List[Step]:
+        """
+        :param serializer: The (nested) serializer to mirror.
+        :param prefix: The ORM lookup of the serializer's instance, e.g. "location__".
+        :param lookups: The columns to select, which every field's column is added to.
+        :return: One (name, kind, lookup or nested steps, converter) step per field.
+        """
+        def lookup(name: str) -> str:
+            if name not in lookups:
+                lookups.append(name)
+            return name
+
+        steps = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            key = (type(serializer), name)
+            if key in METHOD_FIELD_LOOKUPS:
+                steps.append((name, VALUE, lookup(prefix + METHOD_FIELD_LOOKUPS[key]), None))
+            elif isinstance(field, serializers.ListSerializer) and name == "offenses":
+                # Read from the through table, relative to which the offense is "offense__".
+                offense_lookups = ["incident_id"]
+                nested = self._compile(field.child, "offense__", offense_lookups)
+                steps.append((name, OFFENSES, (offense_lookups, nested), None))
+            elif isinstance(field, serializers.BaseSerializer):
+                # The foreign key itself tells a missing relation from a present one.
+                lookup(prefix + field.source)
+                nested = self._compile(field, f"{prefix}{field.source}__", lookups)
+                steps.append((name, NESTED, (prefix + field.source, nested), None))
+            elif isinstance(field, DateTimeSerializer):
+                steps.append((name, CONVERT, lookup(prefix + field.source),
+                              local_datetimes.encode))
+            elif isinstance(field, PASSTHROUGH_FIELDS):
+                steps.append((name, VALUE, lookup(prefix + field.source), None))
+            elif isinstance(field, (serializers.DateTimeField, serializers.ChoiceField)):
+                steps.append((name, CONVERT, lookup(prefix + field.source),
+                              field.to_representation))
+            else:
+                raise ImproperlyConfigured(f"FlatIncidentSerializer cannot render "
+                                           f"{type(serializer).__name__}.{name}, "
+                                           f"a {type(field).__name__}")
+        return steps
+
+    def _get_plan(self) -> Plan:
+        if self._plan is None:
+            lookups = ["id", "report_datetime"]
+            steps = self._compile(IncidentSerializer(), "", lookups)
+            offenses = next(source for _, kind, source, _ in steps if kind == OFFENSES)
+            self._plan = (lookups, steps, offenses)
+        return self._plan
+
+    @property
+    def lookups(self) -> List[str]:
+        """Every column the representation needs, as ORM lookups from Incident."""
+        return self._get_plan()[0]
+
+    def select(self, queryset: QuerySet) -> QuerySet:
+        """:return: The incidents of the queryset as dict rows of every needed column."""
+        return queryset.values(*self.lookups)
+
+    def _build(self, steps: List[Step], row: Dict[str, Any],
+               offenses: Dict[int, List[Dict]]) -> Dict[str, Any]:
+        data = {}
+        for name, kind, source, convert in steps:
+            if kind == VALUE:
+                data[name] = row[source]
+            elif kind == CONVERT:
+                value = row[source]
+                data[name] = None if value is None else convert(value)
+            elif kind == NESTED:
+                foreign_key, nested = source
+                data[name] = (None if row[foreign_key] is None
+                              else self._build(nested, row, offenses))
+            else:
+                data[name] = offenses.get(row["id"], [])
+        return data
+
+    def to_representation(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        :param rows: Rows as returned by select, e.g. a page of them.
+        :return: What IncidentSerializer(incidents, many=True).data would be for them.
+        """
+        lookups, steps, (offense_lookups, offense_steps) = self._get_plan()
+        if not rows:
+            return []
+        through = Incident.offenses.through
+        links = (through.objects.filter(incident_id__in=[row["id"] for row in rows])
+                                .order_by("offense_id")
+                                .values(*offense_lookups))
+        offenses = {}
+        for link in links:
+            offenses.setdefault(link["incident_id"], []).append(
+                self._build(offense_steps, link, {})
+            )
+        logger.debug(f"Flat serializing {len(rows)} incidents from {len(lookups)} columns")
+        return [self._build(steps, row, offenses) for row in rows]
+
+
+flat_incident_serializer = FlatIncidentSerializer()
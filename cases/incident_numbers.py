@@ -0,0 +1,86 @@
+import logging
+import threading
+
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from cases.models import IncidentNumberCounter
+
+logger = logging.getLogger('cases')
+
+# e.g. "19-0001234": the two digit year, and the incident's place in that year.
+INCIDENT_NUMBER_FORMAT = "{year:02d}-{sequence:07d}"
+
+
+def format_incident_number(year: int, sequence: int) -> str:
+    return INCIDENT_NUMBER_FORMAT.format(year=year % 100, sequence=sequence)
+
+
+def reserve_block(year: int, size: int) -> Tuple[int, int]:
+    """
+    Reserves `size` consecutive sequence values for the year from IncidentNumberCounter, on
+    the default connection. Called outside a transaction, as the API does, the reservation
+    is committed straight away and the counter row is only locked for the length of one
+    UPDATE; within one, it is a savepoint, and lasts only as long as that transaction.
+    :return: The first reserved value, and the one after the last.
+    """
+    table = IncidentNumberCounter._meta.db_table
+    now = timezone.now()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {table} "
+                       f"(year, next_value, created_timestamp, updated_timestamp) "
+                       f"VALUES (%s, 1, %s, %s) ON CONFLICT (year) DO NOTHING",
+                       [year, now, now])
+        cursor.execute(f"UPDATE {table} SET next_value = next_value + %s, "
+                       f"updated_timestamp = %s WHERE year = %s",
+                       [size, now, year])
+        cursor.execute(f"SELECT next_value FROM {table} WHERE year = %s", [year])
+        end = cursor.fetchone()[0]
+    logger.debug(f"Reserved incident numbers {end - size} to {end - 1} for {year}")
+    return end - size, end
+
+
+class IncidentNumberAllocator:
+    """
+    Hands out APD formatted incident numbers, unique across processes. Each process
+    reserves a block of numbers per year from the database and allocates from it in memory,
+    so the shared counter is touched once per `block_size` incidents rather than once per
+    incident. Numbers reserved by a process that exits are never used, leaving gaps.
+    Allocate outside transactions: a block reserved within one that is rolled back goes
+    back to the counter while this process keeps handing it out.
+    """
+
+    def __init__(self, block_size: int) -> None:
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._blocks: Dict[int, Tuple[int, int]] = {}
+
+    def allocate(self, count: int = 1, year: Optional[int] = None) -> List[str]:
+        """
+        :param count: How many numbers to allocate.
+        :param year: The year to number within, by default the current (local) one.
+        :return: `count` unused incident numbers, in ascending order.
+        """
+        if year is None:
+            year = timezone.localtime(timezone.now()).year
+        numbers = []
+        with self._lock:
+            while len(numbers) < count:
+                start, end = self._blocks.get(year, (0, 0))
+                if start == end:
+                    start, end = reserve_block(year, max(self.block_size, count - len(numbers)))
+                taken = min(end - start, count - len(numbers))
+                numbers.extend(format_incident_number(year, sequence)
+                               for sequence in range(start, start + taken))
+                self._blocks[year] = (start + taken, end)
+        return numbers
+
+    def clear(self) -> None:
+        """Abandons the reserved blocks, e.g. between tests."""
+        with self._lock:
+            self._blocks.clear()
+
+
+incident_number_allocator = IncidentNumberAllocator(block_size=settings.INCIDENT_NUMBER_BLOCK_SIZE)
@@ -0,0 +1,65 @@
+import random
+import timeit
+import pytz
+
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cases.datetimes import DateTimeCodec, _parse_date_portion, _parse_time_portion
+
+
+def legacy_encode(value: datetime):
+    """DateTimeSerializer.to_representation, as it was before the codec."""
+    local_datetime = timezone.localtime(value, timezone=pytz.timezone(settings.TIME_ZONE))
+    return {'date': local_datetime.date().strftime("%Y-%m-%d"),
+            'time': local_datetime.time().strftime("%H:%M")}
+
+
+def legacy_decode(date_string: str) -> datetime:
+    """convert_date_string_to_object, as it was before the codec (including its LMT offset)."""
+    parts = date_string.split()
+    year, month, day = _parse_date_portion(raw_date_str=parts[0])
+    hours, minutes = _parse_time_portion(raw_time_str=parts[-1])
+    return datetime(year=year, month=month, day=day, hour=hours, minute=minutes,
+                    tzinfo=pytz.timezone(settings.TIME_ZONE))
+
+
+class Command(BaseCommand):
+    help = ("Times encoding datetimes to, and decoding them from, the API's {date, time} "
+            "format with the codec against the implementation it replaced. "
+            "Needs no database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=20000,
+                            help="Number of datetimes to convert per run.")
+        parser.add_argument("--repeat", type=int, default=5,
+                            help="Number of runs; the fastest is reported.")
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        now = timezone.now()
+        # Five years back, like seed_incidents, so the codec's caches see ~40k distinct hours.
+        values = [now - timedelta(minutes=rng.randint(0, 60 * 24 * 365 * 5))
+                  for _ in range(options["count"])]
+        codec = DateTimeCodec(settings.TIME_ZONE)
+        encoded = [codec.encode(value) for value in values]
+        pairs = [(item['date'], item['time']) for item in encoded]
+        strings = [f"{date_string} {time_string}" for date_string, time_string in pairs]
+
+        cases = [
+            ("encode", "legacy", lambda: [legacy_encode(value) for value in values]),
+            ("encode", "codec", lambda: [codec.encode(value) for value in values]),
+            ("decode", "legacy", lambda: [legacy_decode(string) for string in strings]),
+            ("decode", "codec", lambda: [codec.decode(*pair) for pair in pairs]),
+            ("decode", "codec batch", lambda: codec.decode_many(pairs)),
+        ]
+        baseline = {}
+        for operation, name, run in cases:
+            elapsed = min(timeit.repeat(run, number=1, repeat=options["repeat"]))
+            per_value = elapsed / len(values) * 1e6
+            baseline.setdefault(operation, per_value)
+            self.stdout.write(f"{operation:>6} {name:<12} {per_value:8.2f} us/value "
+                              f"{baseline[operation] / per_value:6.1f}x")
@@ -0,0 +1,90 @@
+import re
+import time
+
+from datetime import timedelta
+from typing import Dict, List, Tuple
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from cases.filters import filter_incidents
+from cases.models import Incident
+from cases.pagination import IncidentCursorPagination
+
+INDEX_SCAN = re.compile(r"Index (?:Only )?Scan using (\w+) on|Bitmap Index Scan on (\w+)")
+OFFICER_INDEXES = ("incident_rep_officer_idx",
+                   "incident_rev_officer_idx",
+                   "incident_inv_officer_idx",
+                   "incident_mkr_officer_idx",
+                   "incident_sup_officer_idx")
+
+
+class Command(BaseCommand):
+    help = ("Runs EXPLAIN ANALYZE for the first page of the incident list under each filter "
+            "and reports which indexes it is read through, failing when a filter's own "
+            "index is not among them. "
+            "Seed a large dataset first, e.g. with `manage.py seed_incidents`.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--verbose-plans", action="store_true",
+                            help="Print the full plan of every query.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("The filter benchmark requires PostgreSQL.")
+
+        sample = (Incident.objects.select_related("location__city")
+                                  .prefetch_related("offenses")
+                                  .order_by("?").first())
+        if sample is None:
+            raise CommandError("There are no incidents; run seed_incidents first.")
+
+        total = Incident.objects.count()
+        self.stdout.write(f"{total} incidents")
+
+        failures = []
+        for label, params, expected in self._cases(sample):
+            queryset = (filter_incidents(Incident.objects.all(), params)
+                        .order_by(*IncidentCursorPagination.ordering)
+                        [:IncidentCursorPagination.page_size])
+            started = time.perf_counter()
+            plan = queryset.explain(analyze=True)
+            elapsed = (time.perf_counter() - started) * 1000
+
+            used = {scan or bitmap for scan, bitmap in INDEX_SCAN.findall(plan)}
+            verdict = ",".join(sorted(used)) or "no index"
+            missing = [name for name in expected if name not in used]
+            if missing:
+                failures.append(label)
+                verdict += f"  MISSING {','.join(missing)}"
+            self.stdout.write(f"{label:>16} {elapsed:8.2f} ms  {verdict}")
+            if options["verbose_plans"]:
+                self.stdout.write(str(params))
+                self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(f"Not read through their own index: {', '.join(failures)}")
+
+    def _cases(self, incident: Incident) -> List[Tuple[str, Dict[str, str], Tuple[str, ...]]]:
+        """
+        :param incident: The incident to take the filter values from.
+        :return: (label, query parameters, indexes the plan must use) for every filter. The
+        date ranges are one day wide: a range open on one side matches a large share of the
+        table, and is then best served by the pagination index.
+        """
+        week = timedelta(days=7)
+        day = timedelta(days=1)
+        offense = incident.offenses.all()[0]
+        reported = incident.report_datetime - week
+        occurred = incident.earliest_occurrence_datetime - week
+        return [("report range", {'report_after': reported.isoformat(),
+                                  'report_before': (reported + day).isoformat()},
+                 ("incident_report_dt_id_idx",)),
+                ("occurred range", {'occurred_after': occurred.isoformat(),
+                                    'occurred_before': (occurred + day).isoformat()},
+                 ("incident_occurred_idx",)),
+                ("beat", {'beat': str(incident.beat)}, ("incident_beat_report_dt_idx",)),
+                ("shift", {'shift': incident.shift}, ("incident_shift_report_dt_idx",)),
+                ("officer", {'officer': str(incident.reporting_officer_id)}, OFFICER_INDEXES),
+                ("offense", {'offense': offense.ucr_code or offense.gcic_code},
+                 ("incident_offenses_offense_incident_idx",)),
+                ("city", {'city': incident.location.city.name}, ("incident_location_idx",))]
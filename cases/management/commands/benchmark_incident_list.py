@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from cases.flat import flat_incident_serializer
+from cases.models import Incident
+from cases.pagination import IncidentCursorPagination
+from cases.serializers import IncidentSerializer
+
+
+class Command(BaseCommand):
+    help = ("Measures incident list throughput, from query to rendered JSON, with "
+            "IncidentSerializer and with the flat serializer, and checks that both render "
+            "the same bytes. Seed a large dataset first, e.g. with `manage.py seed_incidents`.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-size", type=int, default=IncidentCursorPagination.page_size)
+        parser.add_argument("--pages", type=int, default=20,
+                            help="Number of consecutive pages to render per path.")
+
+    def handle(self, *args, **options):
+        ordering = IncidentCursorPagination.ordering
+        total = options["page_size"] * options["pages"]
+        ids = list(Incident.objects.order_by(*ordering).values_list("id", flat=True)[:total])
+        if not ids:
+            raise CommandError("There are no incidents; run seed_incidents first.")
+        pages = [ids[start:start + options["page_size"]]
+                 for start in range(0, len(ids), options["page_size"])]
+        renderer = JSONRenderer()
+
+        def serializer_page(page_ids):
+            incidents = (Incident.objects.with_related().filter(id__in=page_ids)
+                                         .order_by(*ordering))
+            return renderer.render(IncidentSerializer(incidents, many=True).data)
+
+        def flat_page(page_ids):
+            rows = flat_incident_serializer.select(Incident.objects.filter(id__in=page_ids)
+                                                                   .order_by(*ordering))
+            return renderer.render(flat_incident_serializer.to_representation(list(rows)))
+
+        if serializer_page(pages[0]) != flat_page(pages[0]):
+            raise CommandError("The flat serializer's output differs from IncidentSerializer's.")
+
+        self.stdout.write(f"{len(ids)} incidents in pages of {options['page_size']}")
+        baseline = None
+        for name, render in (("serializer", serializer_page), ("flat", flat_page)):
+            started = time.perf_counter()
+            for page_ids in pages:
+                render(page_ids)
+            elapsed = time.perf_counter() - started
+            rate = len(ids) / elapsed
+            baseline = baseline or rate
+            self.stdout.write(f"{name:>10} {elapsed * 1000 / len(pages):8.1f} ms/page "
+                              f"{rate:10.0f} incidents/s {rate / baseline:6.1f}x")
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from cases.models import Incident
+from cases.printing import IncidentReportPDFGenerator, load_incident_report
+
+
+class Command(BaseCommand):
+    help = ("Measures printing incident reports, split into loading each report from the "
+            "database and drawing its PDF, with the queries each step runs. Seed a dataset "
+            "first, e.g. with `manage.py seed_incidents`.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=50,
+                            help="Number of (most recently reported) incidents to print.")
+
+    def handle(self, *args, **options):
+        ids = list(Incident.objects.order_by("-report_datetime", "-id")
+                                   .values_list("id", flat=True)[:options["count"]])
+        if not ids:
+            raise CommandError("There are no incidents; run seed_incidents first.")
+
+        with CaptureQueriesContext(connection) as loading:
+            started = time.perf_counter()
+            reports = [load_incident_report(incident_id) for incident_id in ids]
+            load_time = time.perf_counter() - started
+
+        with CaptureQueriesContext(connection) as drawing:
+            started = time.perf_counter()
+            size = sum(len(IncidentReportPDFGenerator(report).render()) for report in reports)
+            draw_time = time.perf_counter() - started
+
+        self.stdout.write(f"{len(ids)} reports, {size / len(ids) / 1024:.1f} KiB each")
+        for name, elapsed, queries in (("load", load_time, loading.captured_queries),
+                                       ("draw", draw_time, drawing.captured_queries)):
+            self.stdout.write(f"{name:>6} {elapsed * 1000 / len(ids):8.2f} ms/report "
+                              f"{len(queries) / len(ids):6.1f} queries/report")
@@ -0,0 +1,77 @@
+from typing import Dict, List
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from cases.models import Address, Incident, IncidentInvolvedParty
+from cases.signals import forget_incidents_where
+
+
+class Command(BaseCommand):
+    help = ("Gives every address saved without an address_key its key, merging it into the "
+            "address that already has that key, if any. References to merged addresses are "
+            "rewritten to the surviving address. Works through the table in batches, each in "
+            "its own transaction, so it can be run against a live database and resumed.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000,
+                            help="Number of addresses to process per transaction.")
+
+    def handle(self, *args, **options):
+        # Every foreign key to Address, e.g. (Incident, "location").
+        references = [(relation.related_model, relation.field.attname)
+                      for relation in Address._meta.related_objects]
+        keyed = merged = 0
+        while True:
+            with transaction.atomic():
+                batch = list(Address.objects.select_related("city__state")
+                                            .filter(address_key__isnull=True)
+                                            .order_by("id")[:options["batch_size"]])
+                if not batch:
+                    break
+                survivors, duplicates = self._merge_batch(batch)
+                for model, attname in references:
+                    self._rewrite_references(model, attname, duplicates)
+                Address.objects.filter(id__in=duplicates.keys()).delete()
+                Address.objects.bulk_update(survivors, ["address_key"])
+            keyed += len(survivors)
+            merged += len(duplicates)
+            self.stdout.write(f"Keyed {keyed} addresses, merged {merged} duplicates")
+
+        self.stdout.write(f"Done: {keyed} addresses keyed, {merged} duplicates merged")
+
+    def _merge_batch(self, batch: List[Address]):
+        """
+        :return: The addresses of the batch that survive, with their key set, and a dict of
+                 the IDs of those that are merged into another to that other's ID.
+        """
+        keys = {address.id: address.compute_key() for address in batch}
+        targets = dict(Address.objects.filter(address_key__in=set(keys.values()))
+                                      .values_list("address_key", "id"))
+        survivors = []
+        duplicates = {}
+        for address in batch:
+            key = keys[address.id]
+            if key in targets:
+                duplicates[address.id] = targets[key]
+            else:
+                targets[key] = address.id
+                address.address_key = key
+                survivors.append(address)
+        return survivors, duplicates
+
+    def _rewrite_references(self, model, attname: str, duplicates: Dict[int, int]) -> None:
+        if not duplicates:
+            return
+        survivor = Case(*[When(**{attname: duplicate}, then=Value(target))
+                          for duplicate, target in duplicates.items()],
+                        output_field=IntegerField())
+        updated = (model.objects.filter(**{f"{attname}__in": duplicates.keys()})
+                                .update(**{attname: survivor}))
+        if updated:
+            self.stdout.write(f"Pointed {updated} {model._meta.db_table}.{attname} "
+                              f"at surviving addresses")
+        if updated and model in (Incident, IncidentInvolvedParty):
+            # A surviving address may be written differently from the one it replaced.
+            path = "" if model is Incident else "incidentinvolvedparty__"
+            forget_incidents_where(Q(**{f"{path}{attname}__in": set(duplicates.values())}))
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from rest_framework.exceptions import ValidationError
+
+from cases import export
+from cases.filters import INCIDENT_FILTERS, filter_incidents
+from cases.models import Incident
+
+
+class Command(BaseCommand):
+    help = ("Streams incidents, with their officers, location, and offenses flattened, "
+            "as NDJSON or CSV.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", dest="export_format", default=export.NDJSON,
+                            choices=sorted(export.EXPORT_FORMATS))
+        parser.add_argument("--report-after",
+                            help="Only incidents reported at or after this ISO 8601 date/time.")
+        parser.add_argument("--report-before",
+                            help="Only incidents reported before this ISO 8601 date/time.")
+        parser.add_argument("--filter", action="append", default=[], metavar="NAME=VALUE",
+                            help=f"Any of the incident list filters: "
+                                 f"{', '.join(INCIDENT_FILTERS)}. May be repeated.")
+        parser.add_argument("--output", "-o",
+                            help="File to write to. Defaults to standard output.")
+        parser.add_argument("--chunk-size", type=int, default=export.EXPORT_CHUNK_SIZE,
+                            help="Number of incidents fetched per round trip.")
+
+    def handle(self, *args, **options):
+        params = {'report_after': options["report_after"],
+                  'report_before': options["report_before"]}
+        for item in options["filter"]:
+            name, _, value = item.partition("=")
+            if name not in INCIDENT_FILTERS:
+                raise CommandError(f"Unknown filter {name}")
+            params[name] = value
+
+        try:
+            queryset = filter_incidents(Incident.objects.all(), params)
+        except ValidationError as err:
+            raise CommandError(str(err.detail))
+
+        chunks = export.render(queryset, options["export_format"],
+                               chunk_size=options["chunk_size"])
+        if options["output"]:
+            with open(options["output"], "w", newline="") as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from rest_framework.exceptions import ValidationError
+
+from cases import batch_printing
+from cases.filters import INCIDENT_FILTERS, filter_incidents
+from cases.models import Incident
+
+
+class Command(BaseCommand):
+    help = ("Prints the reports of every matching incident, oldest first, as a ZIP of one "
+            "PDF per incident or as one merged PDF, rendered across a pool of processes.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", dest="print_format", default=batch_printing.ZIP,
+                            choices=sorted(batch_printing.BATCH_PRINT_FORMATS))
+        parser.add_argument("--report-after",
+                            help="Only incidents reported at or after this ISO 8601 date/time.")
+        parser.add_argument("--report-before",
+                            help="Only incidents reported before this ISO 8601 date/time.")
+        parser.add_argument("--filter", action="append", default=[], metavar="NAME=VALUE",
+                            help=f"Any of the incident list filters: "
+                                 f"{', '.join(INCIDENT_FILTERS)}. May be repeated.")
+        parser.add_argument("--output", "-o", required=True, help="File to write to.")
+        parser.add_argument("--workers", type=int,
+                            help="Number of processes rendering the reports. Defaults "
+                                 "to settings.BATCH_PRINT_WORKERS.")
+
+    def handle(self, *args, **options):
+        params = {'report_after': options["report_after"],
+                  'report_before': options["report_before"]}
+        for item in options["filter"]:
+            name, _, value = item.partition("=")
+            if name not in INCIDENT_FILTERS:
+                raise CommandError(f"Unknown filter {name}")
+            params[name] = value
+
+        try:
+            queryset = filter_incidents(Incident.objects.all(), params)
+        except ValidationError as err:
+            raise CommandError(str(err.detail))
+
+        versions = batch_printing.batch_versions(queryset)
+        if not versions:
+            raise CommandError("No incidents match.")
+        chunks = batch_printing.render(versions, options["print_format"],
+                                       timezone.now().date(), workers=options["workers"])
+        with open(options["output"], "wb") as output:
+            for chunk in chunks:
+                output.write(chunk)
+        self.stdout.write(f"Printed {len(versions)} reports to {options['output']}")
@@ -0,0 +1,112 @@
+import random
+
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from cases.caches import geography_cache, offense_catalog
+from cases.constants import SHIFT_CHOICES, STATES
+from cases.models import Address, Incident, Officer, Offense
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ("Fills the database with randomly generated incidents, for benchmarking. "
+            "Never run this against a production database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=100000,
+                            help="Number of incidents to create.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--officers", type=int, default=200)
+        parser.add_argument("--offenses", type=int, default=300)
+        parser.add_argument("--cities", type=int, default=100)
+        parser.add_argument("--seed", type=int, default=None,
+                            help="Seed for the random number generator, for repeatable data.")
+        parser.add_argument("--no-analyze", action="store_true",
+                            help="Skip refreshing the planner statistics afterwards.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        officers = self._create_officers(options["officers"])
+        offenses = self._create_offenses(options["offenses"])
+        cities = self._create_cities(options["cities"], rng)
+        shifts = [choice[0] for choice in SHIFT_CHOICES if choice[0]]
+        through = Incident.offenses.through
+        prefix = f"seed-{timezone.now():%Y%m%d%H%M%S}"
+        now = timezone.now()
+
+        created = 0
+        while created < options["count"]:
+            size = min(options["batch_size"], options["count"] - created)
+            with transaction.atomic():
+                addresses = Address.objects.bulk_create(
+                    [Address(street_number=str(rng.randint(1, 9999)),
+                             route=f"Route {rng.randint(1, 500)}",
+                             city=rng.choice(cities),
+                             postal_code=f"{rng.randint(10000, 99999)}")
+                     for _ in range(size)]
+                )
+                incidents = []
+                for num, address in enumerate(addresses):
+                    occurred = now - timedelta(minutes=rng.randint(0, 60 * 24 * 365 * 5))
+                    incident_officers = [rng.choice(officers) for _ in range(5)]
+                    incidents.append(Incident(
+                        incident_number=f"{prefix}-{created + num}",
+                        report_datetime=occurred + timedelta(hours=rng.randint(0, 72)),
+                        reporting_officer=incident_officers[0],
+                        reviewed_by_officer=incident_officers[1],
+                        investigating_officer=incident_officers[2],
+                        officer_making_report=incident_officers[3],
+                        supervisor=incident_officers[4],
+                        earliest_occurrence_datetime=occurred,
+                        latest_occurrence_datetime=occurred + timedelta(hours=rng.randint(0, 6)),
+                        location=address,
+                        beat=rng.randint(1, 1000),
+                        shift=rng.choice(shifts),
+                        narrative=f"Seeded incident {created + num}",
+                    ))
+                incidents = Incident.objects.bulk_create(incidents)
+                through.objects.bulk_create(
+                    [through(incident_id=incident.id, offense_id=offense.id)
+                     for incident in incidents
+                     for offense in rng.sample(offenses, rng.randint(1, 3))]
+                )
+            created += size
+            self.stdout.write(f"Created {created} of {options['count']} incidents")
+
+        if connection.vendor == "postgresql" and not options["no_analyze"]:
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+    def _create_officers(self, count: int):
+        next_number = (Officer.objects.aggregate(number=Max("officer_number"))["number"] or 0) + 1
+        users = User.objects.bulk_create(
+            [User(username=f"seed_officer_{next_number + num}",
+                  first_name="Seed", last_name=f"Officer {next_number + num}")
+             for num in range(count)]
+        )
+        return Officer.objects.bulk_create(
+            [Officer(user=user, officer_number=next_number + num)
+             for num, user in enumerate(users)]
+        )
+
+    def _create_offenses(self, count: int):
+        offenses = Offense.objects.bulk_create(
+            [Offense(ucr_name_classification=f"Seeded offense {num}",
+                     ucr_code=f"S{num:05d}", gcic_code=f"G{num:05d}", ucr_alpha="SEED")
+             for num in range(count)]
+        )
+        # bulk_create sends no post_save signals, so invalidate the catalog by hand.
+        offense_catalog.invalidate()
+        return offenses
+
+    def _create_cities(self, count: int, rng: random.Random):
+        states = list(geography_cache.states_in_bulk(STATES).values())
+        cities = geography_cache.cities_in_bulk((f"Seed City {num}", rng.choice(states))
+                                                for num in range(count))
+        return list(cities.values())
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.1 on 2026-10-18 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0004_auto_20190523_1053'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['-report_datetime', '-id'], name='incident_report_dt_id_idx'),
+        ),
+    ]
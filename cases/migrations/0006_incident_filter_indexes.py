@@ -0,0 +1,37 @@
+# Generated by Django 2.2.1 on 2026-10-18 16:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0005_incident_report_datetime_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='city',
+            index=models.Index(fields=['name'], name='city_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['earliest_occurrence_datetime'], name='incident_occurred_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['beat', '-report_datetime'], name='incident_beat_report_dt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['shift', '-report_datetime'], name='incident_shift_report_dt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='offense',
+            index=models.Index(fields=['ucr_code'], name='offense_ucr_code_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='offense',
+            index=models.Index(fields=['gcic_code'], name='offense_gcic_code_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from cases.search import install_search_index, remove_search_index
+
+
+def forwards(apps, schema_editor):
+    install_search_index(schema_editor)
+
+
+def backwards(apps, schema_editor):
+    remove_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0006_incident_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.1 on 2026-10-18 17:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0007_incident_narrative_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='address',
+            name='address_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
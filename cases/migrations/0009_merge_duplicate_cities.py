@@ -0,0 +1,31 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_cities(apps, schema_editor):
+    """
+    parse_and_create_address used to save a new City for every address, so the same city
+    can exist many times. Point every address at the oldest copy and delete the others,
+    so that (name, state) can be made unique.
+    """
+    City = apps.get_model("cases", "City")
+    Address = apps.get_model("cases", "Address")
+    duplicated = (City.objects.values("name", "state_id")
+                              .annotate(keep=Min("id"), copies=Count("id"))
+                              .filter(copies__gt=1))
+    for group in list(duplicated):
+        copies = City.objects.filter(name=group["name"], state_id=group["state_id"])
+        copies = copies.exclude(id=group["keep"])
+        Address.objects.filter(city__in=copies).update(city_id=group["keep"])
+        copies.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0008_address_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_cities, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.1 on 2026-10-18 17:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0009_merge_duplicate_cities'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='city',
+            constraint=models.UniqueConstraint(fields=('name', 'state'), name='city_name_state_uniq'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.1 on 2026-10-18 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0010_city_name_state_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IncidentNumberCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_timestamp', models.DateTimeField(auto_now_add=True)),
+                ('updated_timestamp', models.DateTimeField(auto_now=True)),
+                ('year', models.PositiveSmallIntegerField(unique=True)),
+                ('next_value', models.PositiveIntegerField(default=1)),
+            ],
+            options={
+                'db_table': 'incident_number_counter',
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.1 on 2026-10-18 18:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0011_incident_number_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_timestamp', models.DateTimeField(auto_now_add=True)),
+                ('updated_timestamp', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.CharField(max_length=32)),
+            ],
+            options={
+                'db_table': 'cache_version',
+            },
+        ),
+    ]
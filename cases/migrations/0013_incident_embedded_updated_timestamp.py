@@ -0,0 +1,26 @@
+# Generated by Django 2.2.1 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+from cases.search import install_search_index
+
+
+def reinstall_search_index(apps, schema_editor):
+    # Adding the field rebuilds the incident table on SQLite, dropping the FTS5 triggers.
+    install_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0012_cache_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='incident',
+            name='embedded_updated_timestamp',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(reinstall_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 2.2.1 on 2026-10-18 21:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from cases.search import install_search_index
+
+
+def reinstall_search_index(apps, schema_editor):
+    # Altering the FKs rebuilds the incident table on SQLite, dropping the FTS5 triggers.
+    install_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0013_incident_embedded_updated_timestamp'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='incident',
+            name='investigating_officer',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='investigated_incidents', to='cases.Officer'),
+        ),
+        migrations.AlterField(
+            model_name='incident',
+            name='location',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, to='cases.Address'),
+        ),
+        migrations.AlterField(
+            model_name='incident',
+            name='officer_making_report',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='made_report_incidents', to='cases.Officer'),
+        ),
+        migrations.AlterField(
+            model_name='incident',
+            name='reporting_officer',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='reported_incidents', to='cases.Officer'),
+        ),
+        migrations.AlterField(
+            model_name='incident',
+            name='reviewed_by_officer',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='reviewed_incidents', to='cases.Officer'),
+        ),
+        migrations.AlterField(
+            model_name='incident',
+            name='supervisor',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='supervised_reports', to='cases.Officer'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['reporting_officer', '-report_datetime', '-id'], name='incident_rep_officer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['reviewed_by_officer', '-report_datetime', '-id'], name='incident_rev_officer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['investigating_officer', '-report_datetime', '-id'], name='incident_inv_officer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['officer_making_report', '-report_datetime', '-id'], name='incident_mkr_officer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['supervisor', '-report_datetime', '-id'], name='incident_sup_officer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['location'], name='incident_location_idx'),
+        ),
+        # The offense filter looks incidents up from offense ids; the unique index Django
+        # gives the auto-created through table leads with incident_id instead.
+        migrations.RunSQL(
+            "CREATE INDEX incident_offenses_offense_incident_idx "
+            "ON incident_offenses (offense_id, incident_id)",
+            "DROP INDEX incident_offenses_offense_incident_idx",
+        ),
+        migrations.RunPython(reinstall_search_index, migrations.RunPython.noop),
+    ]
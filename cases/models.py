@@ -1,5 +1,8 @@
 import os
+import re
+import hashlib
 
+from typing import Dict, Optional, Set
 from datetime import datetime
 from django.db import models
 from django.conf import settings
@@ -8,7 +11,8 @@ from django.contrib.auth import get_user_model
 from cases.constants import (STATE_CHOICES, SHIFT_CHOICES,
                              PARTY_TYPE_CHOICES, SEX_CHOICES,
                              RACE_CHOICES, HAIR_COLOR_CHOICES,
-                             EYE_COLOR_CHOICES)
+                             EYE_COLOR_CHOICES, INCIDENT_OFFICER_FIELDS,
+                             ADDRESS_ABBREVIATIONS)
 User = get_user_model()
 
 
@@ -48,6 +52,13 @@ class City(APDIncidentBaseModel):
 
     class Meta:
         db_table = "city"
+        constraints = [
+            models.UniqueConstraint(fields=["name", "state"], name="city_name_state_uniq"),
+        ]
+        indexes = [
+            # Backs the incident `city` filter, see cases/filters.py
+            models.Index(fields=["name"], name="city_name_idx"),
+        ]
 
 
 class Address(APDIncidentBaseModel):
@@ -55,10 +66,45 @@ class Address(APDIncidentBaseModel):
     route = models.CharField(max_length=255, null=True, blank=True)
     city = models.ForeignKey(City, on_delete=models.DO_NOTHING)
     postal_code = models.CharField(max_length=10, null=True, blank=True)
+    # Hash of the normalized address, see make_key. Rows saved before it was introduced have
+    # none until `manage.py dedupe_addresses` has merged them.
+    address_key = models.CharField(max_length=64, unique=True, null=True,
+                                   blank=True, editable=False)
 
     def __str__(self):
         return f"{self.street_number} {self.route} {self.city} {self.postal_code}"
 
+    @staticmethod
+    def normalize(value: Optional[str]) -> str:
+        """
+        Upper cases value, drops punctuation and extra whitespace, and abbreviates the
+        words in ADDRESS_ABBREVIATIONS.
+        :param value: One part of an address, e.g. the route.
+        :return: The normalized value; an empty string for None.
+        """
+        words = re.sub(r"[^\w\s]", " ", value or "").upper().split()
+        return " ".join(ADDRESS_ABBREVIATIONS.get(word, word) for word in words)
+
+    @classmethod
+    def make_key(cls, street_number: Optional[str], route: Optional[str], city_name: str,
+                 state_abbreviation: str, postal_code: Optional[str]) -> str:
+        """
+        :return: The SHA-256 hex digest identifying the normalized address. The city is
+                 keyed by name and state rather than by ID, so duplicate cities do not
+                 produce duplicate addresses.
+        """
+        parts = (street_number, route, city_name, state_abbreviation, postal_code)
+        normalized = "|".join(cls.normalize(part) for part in parts)
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def compute_key(self) -> str:
+        return self.make_key(self.street_number, self.route, self.city.name,
+                             self.city.state.abbreviation, self.postal_code)
+
+    def save(self, *args, **kwargs):
+        self.address_key = self.compute_key()
+        super(Address, self).save(*args, **kwargs)
+
     class Meta:
         db_table = "address"
 
@@ -75,37 +121,98 @@ class Officer(APDIncidentBaseModel):
         db_table = "officer"
 
 
+class IncidentQuerySet(models.QuerySet):
+    def with_related(self, fields: Optional[Dict[str, Dict]] = None,
+                     expand: Optional[Set[str]] = None) -> "IncidentQuerySet":
+        """
+        Eagerly loads every relation that IncidentSerializer walks, so that serializing
+        any number of incidents costs a fixed number of queries: one for the incidents
+        (with their officers, users, and location joined in) and one for the offenses.
+        When a sparse fieldset is requested, only what it needs is loaded.
+        :param fields: Requested field tree (see cases.utils.parse_field_tree), or None for all.
+        :param expand: Relations to render in full, or None to expand all of them.
+        :return: A new queryset with the related objects selected/prefetched.
+        """
+        def wanted(name: str) -> bool:
+            return not fields or name in fields
+
+        def expanded(name: str) -> bool:
+            return expand is None or name in expand or bool(fields and fields.get(name))
+
+        def subfields(name: str) -> Dict[str, Dict]:
+            return (fields or {}).get(name) or {}
+
+        select = []
+        for field in INCIDENT_OFFICER_FIELDS:
+            if wanted(field) and expanded(field):
+                needs_user = not subfields(field) or "user" in subfields(field)
+                select.append(f"{field}__user" if needs_user else field)
+
+        if wanted("location") and expanded("location"):
+            location_fields = subfields("location")
+            needs_city = not location_fields or {"city", "state"} & set(location_fields)
+            select.append("location__city__state" if needs_city else "location")
+
+        queryset = self.select_related(*select)
+
+        if wanted("offenses"):
+            offenses = Offense.objects.order_by("id")
+            if not expanded("offenses"):
+                offenses = offenses.only("id")
+            queryset = queryset.prefetch_related(models.Prefetch("offenses", queryset=offenses))
+
+        if fields:
+            # Skip loading columns (notably the narrative) that nobody asked for.
+            # report_datetime is always needed as the pagination key.
+            columns = {field.name for field in self.model._meta.concrete_fields}
+            queryset = queryset.only("id", "report_datetime", *(columns & set(fields)))
+
+        return queryset
+
+
 class Incident(APDIncidentBaseModel):
-    # Should incident number be auto-generated?
+    # Either given by the client, or allocated by cases.incident_numbers when left out.
     incident_number = models.CharField(max_length=35, unique=True)
     report_datetime = models.DateTimeField(default=datetime.now)
     reporting_officer = models.ForeignKey(Officer,
                                           on_delete=models.CASCADE,
+                                          db_index=False,
                                           related_name="reported_incidents")
     reviewed_by_officer = models.ForeignKey(Officer,
                                             on_delete=models.CASCADE,
+                                            db_index=False,
                                             related_name="reviewed_incidents")
     reviewed_datetime = models.DateTimeField(null=True, blank=True)
     investigating_officer = models.ForeignKey(Officer,
                                               on_delete=models.CASCADE,
+                                              db_index=False,
                                               related_name="investigated_incidents")
     officer_making_report = models.ForeignKey(Officer,
                                               on_delete=models.CASCADE,
+                                              db_index=False,
                                               related_name="made_report_incidents")
     supervisor = models.ForeignKey(Officer,
                                    on_delete=models.CASCADE,
+                                   db_index=False,
                                    related_name="supervised_reports")
     approved_datetime = models.DateTimeField(null=True, blank=True)
     earliest_occurrence_datetime = models.DateTimeField()
     latest_occurrence_datetime = models.DateTimeField()
-    location = models.ForeignKey(Address, on_delete=models.DO_NOTHING)
+    location = models.ForeignKey(Address, on_delete=models.DO_NOTHING, db_index=False)
     beat = models.IntegerField()
     shift = models.CharField(max_length=1, choices=SHIFT_CHOICES)
     damaged_amount = models.PositiveIntegerField(null=True)
     stolen_amount = models.PositiveIntegerField(null=True)
 
+    # The through table also has an (offense_id, incident_id) index, see migration 0014.
     offenses = models.ManyToManyField("Offense")
     narrative = models.TextField(null=True)
+    # Moved forward whenever a row the incident embeds or prints changes, e.g. an officer,
+    # an address, its offenses or its parties; see cases/signals.py. Unlike
+    # updated_timestamp, this does not fail clients' If-Match on the incident itself.
+    embedded_updated_timestamp = models.DateTimeField(null=True)
+
+    objects = IncidentQuerySet.as_manager()
 
     # TODO Fields
     # associated_offense_number
@@ -121,6 +228,31 @@ class Incident(APDIncidentBaseModel):
 
     class Meta:
         db_table = "incident"
+        indexes = [
+            # Backs keyset pagination, see cases/pagination.py
+            models.Index(fields=["-report_datetime", "-id"],
+                         name="incident_report_dt_id_idx"),
+            # The rest back the list filters, see cases/filters.py
+            models.Index(fields=["earliest_occurrence_datetime"],
+                         name="incident_occurred_idx"),
+            models.Index(fields=["beat", "-report_datetime"],
+                         name="incident_beat_report_dt_idx"),
+            models.Index(fields=["shift", "-report_datetime"],
+                         name="incident_shift_report_dt_idx"),
+            # These replace the officer and location FKs' own indexes. The officer filter
+            # collects an officer's incidents from the officer ones alone, id included.
+            models.Index(fields=["reporting_officer", "-report_datetime", "-id"],
+                         name="incident_rep_officer_idx"),
+            models.Index(fields=["reviewed_by_officer", "-report_datetime", "-id"],
+                         name="incident_rev_officer_idx"),
+            models.Index(fields=["investigating_officer", "-report_datetime", "-id"],
+                         name="incident_inv_officer_idx"),
+            models.Index(fields=["officer_making_report", "-report_datetime", "-id"],
+                         name="incident_mkr_officer_idx"),
+            models.Index(fields=["supervisor", "-report_datetime", "-id"],
+                         name="incident_sup_officer_idx"),
+            models.Index(fields=["location"], name="incident_location_idx"),
+        ]
 
 
 class Offense(APDIncidentBaseModel):
@@ -138,6 +270,41 @@ class Offense(APDIncidentBaseModel):
 
     class Meta:
         db_table = "offense"
+        indexes = [
+            models.Index(fields=["ucr_code"], name="offense_ucr_code_idx"),
+            models.Index(fields=["gcic_code"], name="offense_gcic_code_idx"),
+        ]
+
+
+class IncidentNumberCounter(APDIncidentBaseModel):
+    """
+    The next unreserved incident number sequence value for a year. Processes reserve blocks
+    of numbers from it, see cases.incident_numbers.
+    """
+    year = models.PositiveSmallIntegerField(unique=True)
+    next_value = models.PositiveIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.year}: {self.next_value}"
+
+    class Meta:
+        db_table = "incident_number_counter"
+
+
+class CacheVersion(APDIncidentBaseModel):
+    """
+    The version of something every process caches, e.g. the offense catalog, replaced
+    within the transaction that changes it, see cases.caches.SharedVersion.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    # A random token rather than a counter, so that a rolled back version is never reused.
+    value = models.CharField(max_length=32)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+    class Meta:
+        db_table = "cache_version"
 
 
 class IncidentInvolvedParty(APDIncidentBaseModel):
@@ -0,0 +1,165 @@
+import logging
+
+from base64 import b64decode, b64encode
+from collections import OrderedDict, namedtuple
+from typing import Any, List, Optional
+from urllib import parse
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+logger = logging.getLogger('cases')
+KeysetCursor = namedtuple("KeysetCursor", ["reverse", "timestamp", "id"])
+
+
+class IncidentCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (report_datetime, id), newest first.
+
+    DRF's CursorPagination only keys on the first ordering field and falls back to an
+    OFFSET within runs of identical values. Here the cursor carries both the timestamp
+    and the id of the boundary row, so every page is a single range scan on the
+    incident_report_dt_id_idx index no matter how deep into the table it is.
+    """
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    ordering = ("-report_datetime", "-id")
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request,
+                          view: Any = None) -> Optional[List]:
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+
+        if self.cursor is None:
+            queryset = queryset.order_by(*self.ordering)
+        elif self.cursor.reverse:
+            # Walking backwards: everything newer than the boundary, oldest first.
+            queryset = queryset.filter(
+                Q(report_datetime__gte=self.cursor.timestamp),
+                Q(report_datetime__gt=self.cursor.timestamp) | Q(id__gt=self.cursor.id)
+            ).order_by("report_datetime", "id")
+        else:
+            queryset = queryset.filter(
+                Q(report_datetime__lte=self.cursor.timestamp),
+                Q(report_datetime__lt=self.cursor.timestamp) | Q(id__lt=self.cursor.id)
+            ).order_by(*self.ordering)
+
+        # One extra row tells us whether there is anything beyond this page.
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if self.cursor is not None and self.cursor.reverse:
+            self.page.reverse()
+            self.has_previous = has_more
+            self.has_next = True
+        else:
+            self.has_previous = self.cursor is not None
+            self.has_next = has_more
+
+        return self.page
+
+    def get_page_size(self, request: Request) -> int:
+        page_size = super(IncidentCursorPagination, self).get_page_size(request)
+        return min(page_size, self.max_page_size)
+
+    def get_next_link(self) -> Optional[str]:
+        if not self.has_next:
+            return None
+        if not self.page:
+            # Walked backwards past the newest row; start over from the top.
+            return replace_query_param(self.base_url, self.cursor_query_param, "")
+        return self.encode_cursor(self._cursor_for(self.page[-1], reverse=False))
+
+    def get_previous_link(self) -> Optional[str]:
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self._cursor_for(self.page[0], reverse=True))
+
+    def _cursor_for(self, row: Any, reverse: bool) -> KeysetCursor:
+        if isinstance(row, dict):
+            return KeysetCursor(reverse=reverse, timestamp=row["report_datetime"], id=row["id"])
+        return KeysetCursor(reverse=reverse, timestamp=row.report_datetime, id=row.id)
+
+    def decode_cursor(self, request: Request) -> Optional[KeysetCursor]:
+        """
+        Given a request with a cursor, return a KeysetCursor instance.
+        :param request: The incoming request.
+        :return: The decoded cursor, or None if no cursor was supplied.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            querystring = b64decode(encoded.encode("ascii")).decode("ascii")
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            timestamp = parse_datetime(tokens["p"][0])
+            row_id = int(tokens["i"][0])
+            reverse = bool(int(tokens.get("r", ["0"])[0]))
+        except (TypeError, ValueError, KeyError, IndexError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if timestamp is None:
+            raise NotFound(self.invalid_cursor_message)
+
+        return KeysetCursor(reverse=reverse, timestamp=timestamp, id=row_id)
+
+    def encode_cursor(self, cursor: KeysetCursor) -> str:
+        """
+        Given a KeysetCursor instance, return an url with the encoded cursor.
+        :param cursor: The cursor to encode.
+        :return: The current URL with its cursor parameter replaced.
+        """
+        tokens = {'p': cursor.timestamp.isoformat(),
+                  'i': str(cursor.id)}
+        if cursor.reverse:
+            tokens['r'] = '1'
+        querystring = parse.urlencode(tokens)
+        encoded = b64encode(querystring.encode("ascii")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+
+class IncidentSearchPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination for ranked search results, which have no stable key to page on.
+    Rather than counting every match (which would mean ranking and highlighting all of
+    them), one extra row is fetched to tell whether there is a next page.
+    """
+    default_limit = 25
+    max_limit = 100
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request,
+                          view: Any = None) -> Optional[List]:
+        self.limit = self.get_limit(request)
+        self.offset = self.get_offset(request)
+        self.request = request
+
+        results = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(results) > self.limit
+        return results[:self.limit]
+
+    def get_paginated_response(self, data: List) -> Response:
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+    def get_next_link(self) -> Optional[str]:
+        if not self.has_next:
+            return None
+        url = replace_query_param(self.request.build_absolute_uri(),
+                                  self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
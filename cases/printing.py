@@ -1,13 +1,17 @@
 import math
 
-from typing import Optional
+from datetime import date, datetime
+from io import BytesIO
+from typing import Iterable, List, NamedTuple, Optional
 from django.utils import timezone
+from django.utils.text import get_valid_filename
 from reportlab.pdfgen.canvas import Canvas
 from reportlab.pdfbase.pdfmetrics import stringWidth
 from textwrap import wrap
 from cases.models import Incident, Offense, IncidentInvolvedParty
 from cases.constants import (VICTIM,
                              SUSPECT,
+                             INCIDENT_OFFICER_FIELDS,
                              PAGE_WIDTH,
                              PAGE_CENTER_X,
                              COLUMN_X_POSITION_MAP,
@@ -18,24 +22,173 @@ from cases.constants import (VICTIM,
                              COLOR_RGB_VALUES)
 
 
+class ReportOffense(NamedTuple):
+    ucr_name_classification: str
+    ucr_subclass_description: str
+    gcic_code: Optional[str]
+    ucr_code: Optional[str]
+
+
+class ReportParty(NamedTuple):
+    """A victim or suspect, with addresses already formatted as str(Address) would."""
+    party_type: str
+    name: str
+    juvenile: bool
+    home_address: Optional[str]
+    social_security_number: Optional[str]
+    date_of_birth: Optional[date]
+    sex: str
+    race: str
+    height: Optional[int]
+    weight: Optional[int]
+    hair_color: Optional[str]
+    eye_color: Optional[str]
+    drivers_license: Optional[str]
+    drivers_license_state: Optional[str]
+    employer: Optional[str]
+    employer_address: Optional[str]
+
+
+class IncidentReport(NamedTuple):
+    """
+    Everything an incident report prints, loaded up front by load_incident_report, so that
+    drawing it needs no database access. Officers and the location are formatted as their
+    models' __str__ would.
+    """
+    incident_number: str
+    report_datetime: datetime
+    reviewed_datetime: Optional[datetime]
+    reporting_officer: str
+    reviewed_by_officer: str
+    investigating_officer: str
+    officer_making_report: str
+    supervisor: str
+    earliest_occurrence_datetime: Optional[datetime]
+    latest_occurrence_datetime: Optional[datetime]
+    location: str
+    beat: int
+    shift: str
+    damaged_amount: Optional[int]
+    stolen_amount: Optional[int]
+    narrative: Optional[str]
+    offenses: List[ReportOffense]
+    victims: List[ReportParty]
+    suspects: List[ReportParty]
+
+
+def _format_address(address) -> Optional[str]:
+    return None if address is None else str(address)
+
+
+def load_incident_reports(incident_ids: Iterable[int]) -> List[IncidentReport]:
+    """
+    Loads incidents' reports in three queries, however many there are: the incidents with
+    their officers, their users and their locations; their offenses; and their victims and
+    suspects with their addresses.
+    :param incident_ids: IDs of the incidents to load.
+    :return: The reports, in the order of incident_ids. Unknown IDs are left out.
+    """
+    incident_ids = list(incident_ids)
+    address_path = "city__state"
+    incidents = (Incident.objects.select_related(*[f"{field}__user"
+                                                   for field in INCIDENT_OFFICER_FIELDS],
+                                                 f"location__{address_path}")
+                                 .in_bulk(incident_ids))
+    offenses = {incident_id: [] for incident_id in incidents}
+    for incident_id, *row in (Offense.objects.filter(incident__in=list(incidents))
+                                             .order_by("id")
+                                             .values_list("incident", "ucr_name_classification",
+                                                          "ucr_subclass_description",
+                                                          "gcic_code", "ucr_code")):
+        offenses[incident_id].append(ReportOffense(*row))
+    parties = {incident_id: {VICTIM: [], SUSPECT: []} for incident_id in incidents}
+    for party in (IncidentInvolvedParty.objects.filter(incident__in=list(incidents),
+                                                       party_type__in=(VICTIM, SUSPECT))
+                                               .select_related(f"home_address__{address_path}",
+                                                               f"employer_address__"
+                                                               f"{address_path}")
+                                               .order_by("id")):
+        parties[party.incident_id][party.party_type].append(ReportParty(
+            party_type=party.party_type, name=party.name, juvenile=party.juvenile,
+            home_address=_format_address(party.home_address),
+            social_security_number=party.social_security_number,
+            date_of_birth=party.date_of_birth, sex=party.sex, race=party.race,
+            height=party.height, weight=party.weight, hair_color=party.hair_color,
+            eye_color=party.eye_color, drivers_license=party.drivers_license,
+            drivers_license_state=party.drivers_license_state, employer=party.employer,
+            employer_address=_format_address(party.employer_address),
+        ))
+
+    reports = []
+    for incident_id in incident_ids:
+        incident = incidents.get(incident_id)
+        if incident is None:
+            continue
+        officers = {field: str(getattr(incident, field)) for field in INCIDENT_OFFICER_FIELDS}
+        reports.append(IncidentReport(
+            incident_number=incident.incident_number,
+            report_datetime=incident.report_datetime,
+            reviewed_datetime=incident.reviewed_datetime,
+            earliest_occurrence_datetime=incident.earliest_occurrence_datetime,
+            latest_occurrence_datetime=incident.latest_occurrence_datetime,
+            location=str(incident.location), beat=incident.beat, shift=incident.shift,
+            damaged_amount=incident.damaged_amount, stolen_amount=incident.stolen_amount,
+            narrative=incident.narrative, offenses=offenses[incident_id],
+            victims=parties[incident_id][VICTIM], suspects=parties[incident_id][SUSPECT],
+            **officers
+        ))
+    return reports
+
+
+def load_incident_report(incident_id: int) -> IncidentReport:
+    """
+    Loads an incident's report in three queries, see load_incident_reports.
+    :param incident_id: ID of the incident to load.
+    :return: The report.
+    :raises Incident.DoesNotExist: If there is no such incident.
+    """
+    reports = load_incident_reports([incident_id])
+    if not reports:
+        raise Incident.DoesNotExist(f"Incident {incident_id} does not exist.")
+    return reports[0]
+
+
+def report_file_name(incident_number: str) -> str:
+    """The name an incident's PDF is served under, e.g. incident-18-000123.pdf."""
+    return get_valid_filename(f"incident-{incident_number}.pdf")
+
+
 # Note: there is some hard coded stuff in here to make the printing example for one specific report
 # look nice. It needs to be actually fixed.
 class IncidentReportPDFGenerator:
-    def __init__(self, file_name: str, incident_id: int, default_font_size: int = 12) -> None:
+    def __init__(self, report: IncidentReport, default_font_size: int = 12,
+                 print_date: Optional[date] = None) -> None:
         """
-        Given an Incident ID, this class handles the generation of a PDF document according
-        to specifications provided by APD
-        :param file_name: The name given to the generated PDF.
-        :param incident_id: Integer ID of the incident to generate a PDF for.
+        Given an incident's report, this class handles the generation of a PDF document
+        according to specifications provided by APD. The document is rendered into an
+        in-memory buffer without any database access, so any number of reports can be
+        generated concurrently.
+        :param report: The incident's report, see load_incident_report.
         :param default_font_size: Font size, in points, to be used when nothing else is specified.
+        :param print_date: The date printed in each page's header; today by default.
         """
-        self.incident = Incident.objects.get(id=incident_id)
-        self.pdf = Canvas(filename=file_name)
+        self.report = report
+        self.print_date = print_date or timezone.now().date()
+        self.buffer = BytesIO()
+        self.pdf = Canvas(self.buffer)
         self.row_number = 1
         self.page_number = 1
         self.default_font_size = default_font_size
         self.draw_func = self.pdf.drawString
 
+    @classmethod
+    def for_incident(cls, incident_id: int, **kwargs) -> "IncidentReportPDFGenerator":
+        """
+        :param incident_id: Integer ID of the incident to generate a PDF for.
+        :raises Incident.DoesNotExist: If there is no such incident.
+        """
+        return cls(load_incident_report(incident_id), **kwargs)
+
     def _set_font_color_rgb(self, red: int, green: int, blue: int) -> None:
         """
         Simply a wrapper around the setFillColorRGB method to allow use of the
@@ -140,8 +293,7 @@ class IncidentReportPDFGenerator:
         self.pdf.setFont("Courier", 10)
         self._draw_label("Printed By:",
                          color="blue")
-        today = timezone.now().date()
-        us_format_date_string = today.strftime("%m/%d/%Y")
+        us_format_date_string = self.print_date.strftime("%m/%d/%Y")
         self._draw_label(label="Print Date:",
                          data=us_format_date_string)
         self.row_number += 1
@@ -149,7 +301,7 @@ class IncidentReportPDFGenerator:
                          centered=True)
         self._draw_label("Offense Report",
                          centered=True)
-        self._draw_label(f"INCIDENT NUMBER: {self.incident.incident_number}",
+        self._draw_label(f"INCIDENT NUMBER: {self.report.incident_number}",
                          centered=True)
         self.pdf.drawString(525, TOP_ALIGN_Y, f"PAGE: {self.page_number}")
 
@@ -162,41 +314,41 @@ class IncidentReportPDFGenerator:
                          color="red")
         self.row_number += 1
         self._draw_label(label="Report Date:",
-                         data=self.incident.report_datetime.date())
+                         data=self.report.report_datetime.date())
         self._draw_label(label="Time:",
-                         data=self.incident.report_datetime.time(),
+                         data=self.report.report_datetime.time(),
                          row=self.row_number - 1,
                          column=3)
         self._draw_label(label="Reporting Officer:",
-                         data=self.incident.reporting_officer)
+                         data=self.report.reporting_officer)
         self._draw_label(label="Reviewed by Officer:",
-                         data=self.incident.reviewed_by_officer)
+                         data=self.report.reviewed_by_officer)
         self._draw_label(label="Investigating Officer:",
-                         data=self.incident.investigating_officer)
+                         data=self.report.investigating_officer)
         self._draw_label(label="Officer Making Rpt",
-                         data=self.incident.officer_making_report)
+                         data=self.report.officer_making_report)
         self._draw_label(label="Supervisor:",
-                         data=self.incident.supervisor)
+                         data=self.report.supervisor)
         self._draw_label(label="Occur/Earliest Date / Time:",
-                         data=self.incident.earliest_occurrence_datetime)
+                         data=self.report.earliest_occurrence_datetime)
         self._draw_label(label="Location:",
-                         data=str(self.incident.location))
+                         data=str(self.report.location))
         self._draw_label(label="Latest Poss Date / Time:",
-                         data=self.incident.latest_occurrence_datetime)
+                         data=self.report.latest_occurrence_datetime)
         self._draw_label(label="Assoc Offense #:")
         self._draw_label(label="RD:")
         self._draw_label(label="Beat:",
-                         data=self.incident.beat,
+                         data=self.report.beat,
                          row=self.row_number - 1,
                          column=2)
         self._draw_label(label="Shift:",
-                         data=self.incident.shift,
+                         data=self.report.shift,
                          row=self.row_number - 1,
                          column=4)
         self._draw_label(label="Damaged Amount:",
-                         data=self.incident.damaged_amount)
+                         data=self.report.damaged_amount)
         self._draw_label(label=f"Stolen Amount:",
-                         data=self.incident.stolen_amount,
+                         data=self.report.stolen_amount,
                          row=self.row_number - 1,
                          column=2)
         self._draw_label("Disposition:")
@@ -211,7 +363,7 @@ class IncidentReportPDFGenerator:
                          centered=True,
                          color="red")
 
-        for offense in self.incident.offenses.all():
+        for offense in self.report.offenses:
             self._draw_offense(offense=offense)
             self.row_number += 1
 
@@ -226,11 +378,11 @@ class IncidentReportPDFGenerator:
                          color="red")
         self.row_number += 2
 
-    def _draw_victims(self, victims) -> None:
+    def _draw_victims(self, victims: List[ReportParty]) -> None:
         """
         Draws IncidentInvoledParty information for all parties reporting to be a victim of
         the incident.
-        :param victims: A QuerySet of IncidentInvolvedParty objects where party_type = VICTIM.
+        :param victims: The incident's victims.
         :return: None
         """
         self._draw_label("------------ VICTIM ------------",
@@ -245,10 +397,10 @@ class IncidentReportPDFGenerator:
 
         self.row_number += 2
 
-    def _draw_suspects(self, suspects) -> None:
+    def _draw_suspects(self, suspects: List[ReportParty]) -> None:
         """
         Draws IncidentInvoledParty information for all parties reported as suspects in the incident.
-        :param suspects: A QuerySet of IncidentInvolvedParty objects where party_type = SUSPECT.
+        :param suspects: The incident's suspects.
         :return: None
         """
         self._draw_label("------------ SUSPECT ------------",
@@ -264,13 +416,8 @@ class IncidentReportPDFGenerator:
 
     def _draw_parties(self) -> None:
         """Draws information for all IncidentInvolvedParty objects related to the incident."""
-        all_parties = self.incident.incidentinvolvedparty_set.all()
-
-        victims = all_parties.filter(party_type=VICTIM)
-        self._draw_victims(victims=victims)
-
-        suspects = all_parties.filter(party_type=SUSPECT)
-        self._draw_suspects(suspects=suspects)
+        self._draw_victims(victims=self.report.victims)
+        self._draw_suspects(suspects=self.report.suspects)
 
     def _draw_labels(self) -> None:
         """Perhaps misnamed, this method essentially draws the entire document."""
@@ -284,7 +431,7 @@ class IncidentReportPDFGenerator:
         self.row_number += 4
         self._draw_signature_lines()
 
-    def _draw_offense(self, offense: Offense) -> None:
+    def _draw_offense(self, offense: ReportOffense) -> None:
         """
         Draws information regarding one specific offense being reported as part of the incident.
         :param offense: Offense object to be drawn
@@ -302,7 +449,7 @@ class IncidentReportPDFGenerator:
                          row=self.row_number,
                          column=3)
 
-    def _draw_party(self, count: int, party: IncidentInvolvedParty) -> None:
+    def _draw_party(self, count: int, party: ReportParty) -> None:
         """
         Draws information regarding one specific party involved in the incident.
         :param count: Sequence number of the specified partym given its type, e.g. Victim #3
@@ -404,7 +551,7 @@ class IncidentReportPDFGenerator:
         self._draw_label(label="Incident Narrative",
                          centered=True,
                          color="red")
-        lines = wrap(self.incident.narrative,
+        lines = wrap(self.report.narrative,
                      MAX_TEXT_LINE_WIDTH)
 
         # Each line has length 12
@@ -435,8 +582,8 @@ class IncidentReportPDFGenerator:
         """Draws all necessary labels and lines for legal signatures required by APD."""
         self._add_new_page()
         self.row_number += 2
-        reviewed_str = (f"OFFENSE REPORT REVIEWED BY {self.incident.reviewed_by_officer} "
-                        f"ON {self.incident.reviewed_datetime}")
+        reviewed_str = (f"OFFENSE REPORT REVIEWED BY {self.report.reviewed_by_officer} "
+                        f"ON {self.report.reviewed_datetime}")
         reviewed_length = stringWidth(reviewed_str,
                                       fontName="Courier",
                                       fontSize=10)
@@ -451,8 +598,8 @@ class IncidentReportPDFGenerator:
         self.pdf.drawString(review_x_pos, self.current_y_position, reviewed_str)
         self.row_number += 4
 
-        approved_str = (f"OFFENSE REPORT APPROVED BY {self.incident.supervisor} "
-                        f"ON {self.incident.reviewed_datetime}")
+        approved_str = (f"OFFENSE REPORT APPROVED BY {self.report.supervisor} "
+                        f"ON {self.report.reviewed_datetime}")
         approved_length = stringWidth(approved_str,
                                       fontName="Courier",
                                       fontSize=10)
@@ -466,6 +613,10 @@ class IncidentReportPDFGenerator:
         self.pdf.drawPath(approved_line)
         self.pdf.drawString(approved_x_pos, self.current_y_position, approved_str)
 
+    @property
+    def file_name(self) -> str:
+        return report_file_name(self.report.incident_number)
+
     def generate(self) -> Canvas:
         """
         Makes the necessary calls to draw all information related to the incident.
@@ -475,3 +626,11 @@ class IncidentReportPDFGenerator:
         self.pdf.showPage()
         self.pdf.save()
         return self.pdf
+
+    def render(self) -> bytes:
+        """
+        Generates the document.
+        :return: The PDF's bytes.
+        """
+        self.generate()
+        return self.buffer.getvalue()
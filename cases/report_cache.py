@@ -0,0 +1,195 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+from datetime import date, datetime
+from typing import BinaryIO, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, QuerySet
+
+from cases.conditional import timestamp_token
+from cases.models import Incident
+
+logger = logging.getLogger('cases')
+
+
+class ReportVersion(NamedTuple):
+    incident_number: str
+    # Changes whenever the incident, one of its parties or anything either of them embeds
+    # (officers, addresses, offenses) is saved, added or deleted.
+    token: str
+    # When that last happened, which only ever moves forward.
+    updated: datetime
+
+
+def report_versions(incidents: QuerySet) -> Dict[int, ReportVersion]:
+    """
+    Reads the versions of incidents' printed reports with one query.
+    :param incidents: A queryset of the incidents, e.g. filtered.
+    :return: The versions by incident ID, in the queryset's order.
+    """
+    parties = "incidentinvolvedparty"
+    rows = (incidents.annotate(party_count=Count(parties),
+                               parties_updated=Max(f"{parties}__updated_timestamp"))
+                     .values("id", "incident_number", "updated_timestamp",
+                             "embedded_updated_timestamp", "party_count", "parties_updated"))
+    versions = {}
+    for row in rows:
+        timestamps = (row["updated_timestamp"], row["embedded_updated_timestamp"],
+                      row["parties_updated"])
+        token = "-".join([timestamp_token(timestamp) for timestamp in timestamps]
+                         + [str(row["party_count"])])
+        # A deleted party's timestamp is gone, but it moved embedded_updated_timestamp on.
+        changed = max(timestamp for timestamp in timestamps if timestamp is not None)
+        versions[row["id"]] = ReportVersion(row["incident_number"], token, changed)
+    return versions
+
+
+def report_version(incident_id: int) -> Optional[ReportVersion]:
+    """
+    Reads the version of an incident's printed report with one query.
+    :return: The version, or None if there is no such incident.
+    """
+    return report_versions(Incident.objects.filter(id=incident_id)).get(incident_id)
+
+
+class ReportPDFCache:
+    """
+    Rendered incident reports on disk, in settings.REPORT_PDF_CACHE_DIR, one directory per
+    incident and one file per report version and print date, e.g. 42/<token>.2019-05-01.pdf.
+    Files are written atomically, so processes can share the directory.
+
+    The cache is limited to settings.REPORT_PDF_CACHE_MAX_BYTES: serving a file marks it
+    as recently used (its mtime), and once the size grows past the limit the least
+    recently used files are deleted until it is back under 90% of it. Each process tracks
+    the size from what it writes, and rescans the directory before evicting.
+    Every change to a report moves its version forward (see report_versions), so files of
+    outdated versions are never served; the signal handlers in cases/signals.py delete
+    them early to save space.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._sizes: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def root(self) -> str:
+        return str(settings.REPORT_PDF_CACHE_DIR)
+
+    @property
+    def max_bytes(self) -> int:
+        return settings.REPORT_PDF_CACHE_MAX_BYTES
+
+    def _path(self, incident_id: int, version: str, print_date: date) -> str:
+        return os.path.join(self.root, str(incident_id), f"{version}.{print_date}.pdf")
+
+    def open(self, incident_id: int, version: str, print_date: date) -> Optional[BinaryIO]:
+        """
+        :return: The cached PDF, opened for reading, or None if it is not cached.
+        """
+        path = self._path(incident_id, version, print_date)
+        try:
+            os.utime(path)
+            document = open(path, "rb")
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return document
+
+    def store(self, incident_id: int, version: str, print_date: date, pdf: bytes) -> None:
+        """Caches a rendered PDF, evicting the least recently used ones if need be."""
+        path = self._path(incident_id, version, print_date)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(descriptor, "wb") as output:
+                output.write(pdf)
+            os.replace(temporary, path)
+        except OSError as error:
+            # E.g. the incident was invalidated meanwhile; the report is served regardless.
+            logger.warning(f"Could not cache the report of incident {incident_id}: {error}")
+            return
+
+        with self._lock:
+            size = self._sizes.get(self.root)
+            if size is None:
+                size = self._scan_size()
+            else:
+                size += len(pdf)
+            self._sizes[self.root] = size
+            if size > self.max_bytes:
+                self._evict()
+
+    def _files(self) -> List[Tuple[float, int, str]]:
+        """:return: The (mtime, size, path) of every cached file, except any deleted meanwhile."""
+        files = []
+        for directory in os.scandir(self.root):
+            try:
+                for entry in os.scandir(directory.path):
+                    if entry.name.endswith(".pdf"):
+                        stat = entry.stat()
+                        files.append((stat.st_mtime, stat.st_size, entry.path))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+        return files
+
+    def _scan_size(self) -> int:
+        return sum(file_size for _, file_size, _ in self._files())
+
+    def _evict(self) -> None:
+        """Deletes the least recently used files until under 90% of the limit."""
+        files = sorted(self._files())
+        size = sum(file_size for _, file_size, _ in files)
+        target = self.max_bytes * 0.9
+        for _, file_size, path in files:
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= file_size
+            self.evictions += 1
+        self._sizes[self.root] = size
+        logger.debug(f"Evicted printed reports down to {size} bytes")
+
+    def invalidate(self, incident_ids: Iterable[int]) -> None:
+        """
+        Deletes every cached report of the given incidents, both straight away and once the
+        current transaction commits, so that none rendered from uncommitted data survives.
+        """
+        directories = [os.path.join(self.root, str(incident_id))
+                       for incident_id in set(incident_ids)]
+        if not directories:
+            return
+
+        def delete():
+            for directory in directories:
+                shutil.rmtree(directory, ignore_errors=True)
+
+        delete()
+        transaction.on_commit(delete)
+
+    def clear(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+        with self._lock:
+            self._sizes.pop(self.root, None)
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'size_bytes': self._sizes.get(self.root, 0), 'max_bytes': self.max_bytes}
+
+
+report_pdfs = ReportPDFCache()
@@ -0,0 +1,138 @@
+import json
+import logging
+import threading
+
+from collections import OrderedDict
+from typing import Any, Dict, List
+from django.core.cache import caches
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from cases.conditional import timestamp_token
+from cases.flat import flat_incident_serializer
+from cases.models import Incident
+
+logger = logging.getLogger('cases')
+
+# The columns a page of incidents needs to be assembled from the cache.
+VERSION_COLUMNS = ("id", "report_datetime", "updated_timestamp", "embedded_updated_timestamp")
+
+
+def representation_token(row: Dict[str, Any]) -> str:
+    """:return: The version of an incident's representation, from its VERSION_COLUMNS."""
+    return (f"{timestamp_token(row['updated_timestamp'])}-"
+            f"{timestamp_token(row['embedded_updated_timestamp'])}")
+
+
+class IncidentRepresentationCache:
+    """
+    Keeps every incident's full JSON representation, as rendered by JSONRenderer, in the
+    "representations" cache (see settings.REPRESENTATION_CACHE for the backends). Entries
+    are keyed by incident ID and only used while they were rendered at the incident's
+    current updated_timestamp and embedded_updated_timestamp, which the signal handlers in
+    cases/signals.py move forward when what it embeds (officers, users, location,
+    offenses) changes. An entry's token is read in the same query as the data it was
+    rendered from, so an entry stored by a request that raced an edit is merely outdated;
+    nothing ever needs deleting.
+    """
+    KEY = "cases:incident:{id}"
+
+    def __init__(self, alias: str = "representations") -> None:
+        self.alias = alias
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _key(self, incident_id: int) -> str:
+        return self.KEY.format(id=incident_id)
+
+    def fragments(self, rows: List[Dict[str, Any]]) -> List[bytes]:
+        """
+        :param rows: Incidents as dicts of (at least) VERSION_COLUMNS, e.g. a page of them.
+        :return: The rendered JSON of each incident, in order. Whatever is missing or out
+                 of date in the cache is rendered with the flat serializer and stored.
+        """
+        keys = {row["id"]: self._key(row["id"]) for row in rows}
+        cached = self.cache.get_many(keys.values())
+        found = {}
+        for row in rows:
+            entry = cached.get(keys[row["id"]])
+            if entry is not None and entry[0] == representation_token(row):
+                found[row["id"]] = entry[1]
+
+        missing = [row["id"] for row in rows if row["id"] not in found]
+        if missing:
+            renderer = JSONRenderer()
+            columns = list(flat_incident_serializer.lookups)
+            columns += [column for column in VERSION_COLUMNS if column not in columns]
+            fresh = list(Incident.objects.filter(id__in=missing).values(*columns))
+            entries = {}
+            for row, data in zip(fresh, flat_incident_serializer.to_representation(fresh)):
+                found[row["id"]] = renderer.render(data)
+                entries[keys[row["id"]]] = (representation_token(row), found[row["id"]])
+            self.cache.set_many(entries)
+
+        with self._lock:
+            self.hits += len(rows) - len(missing)
+            self.misses += len(missing)
+        # An incident deleted since the page was read is left out.
+        return [found[row["id"]] for row in rows if row["id"] in found]
+
+    def clear(self) -> None:
+        self.cache.clear()
+        with self._lock:
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+incident_representations = IncidentRepresentationCache()
+
+
+def render_page(envelope: "OrderedDict[str, Any]", fragments: List[bytes]) -> bytes:
+    """
+    Renders a paginated response whose results are already rendered.
+    :param envelope: The response without its results, which come last, e.g. next/previous.
+    :param fragments: The rendered results.
+    :return: What JSONRenderer would render for the envelope with the results.
+    """
+    head = JSONRenderer().render(OrderedDict(envelope, results=[]))
+    return head[:-len(b"[]}")] + b"[" + b",".join(fragments) + b"]}"
+
+
+class PrerenderedResponse(Response):
+    """
+    A Response whose JSON is already rendered. Requests for (compact) JSON get those bytes
+    as they are; any other renderer, e.g. the browsable API, gets the decoded data.
+    """
+
+    def __init__(self, content: bytes, **kwargs) -> None:
+        self.prerendered = content
+        self._decoded = None
+        super(PrerenderedResponse, self).__init__(**kwargs)
+
+    @property
+    def data(self) -> Any:
+        if self._decoded is None:
+            self._decoded = json.loads(self.prerendered.decode("utf-8"),
+                                       object_pairs_hook=OrderedDict)
+        return self._decoded
+
+    @data.setter
+    def data(self, value: Any) -> None:
+        self._decoded = value
+
+    @property
+    def rendered_content(self) -> bytes:
+        renderer = getattr(self, 'accepted_renderer', None)
+        if (type(renderer) is JSONRenderer and self.content_type is None
+                and renderer.get_indent(self.accepted_media_type, self.renderer_context) is None):
+            self['Content-Type'] = renderer.media_type
+            return self.prerendered
+        return super(PrerenderedResponse, self).rendered_content
@@ -0,0 +1,142 @@
+import logging
+import re
+
+from typing import List
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+from django.db import connection
+from django.db.models import F, FloatField, Func, QuerySet, TextField, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+
+logger = logging.getLogger('cases')
+
+SEARCH_CONFIG = "english"
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_STOP = "</mark>"
+
+# Postgres: an expression index over the narrative's tsvector. Being computed from the
+# column itself, it is kept in sync by every INSERT/UPDATE with no extra work.
+POSTGRES_INDEX = "incident_narrative_search_idx"
+POSTGRES_INDEX_SQL = (f"CREATE INDEX IF NOT EXISTS {POSTGRES_INDEX} ON incident USING GIN "
+                      f"(to_tsvector('{SEARCH_CONFIG}'::regconfig, COALESCE(narrative, '')))")
+
+# SQLite: an external content FTS5 table over incident.narrative, maintained by triggers.
+SQLITE_FTS_TABLE = "incident_narrative_fts"
+SQLITE_FTS_SQL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS_TABLE} USING fts5("
+    f"narrative, content='incident', content_rowid='id', tokenize='porter unicode61')",
+    f"DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_au",
+    f"CREATE TRIGGER {SQLITE_FTS_TABLE}_ai AFTER INSERT ON incident BEGIN "
+    f"INSERT INTO {SQLITE_FTS_TABLE}(rowid, narrative) VALUES (new.id, new.narrative); END",
+    f"CREATE TRIGGER {SQLITE_FTS_TABLE}_ad AFTER DELETE ON incident BEGIN "
+    f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, narrative) "
+    f"VALUES ('delete', old.id, old.narrative); END",
+    f"CREATE TRIGGER {SQLITE_FTS_TABLE}_au AFTER UPDATE OF narrative ON incident BEGIN "
+    f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, narrative) "
+    f"VALUES ('delete', old.id, old.narrative); "
+    f"INSERT INTO {SQLITE_FTS_TABLE}(rowid, narrative) VALUES (new.id, new.narrative); END",
+    f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('rebuild')",
+]
+
+
+class SearchUnavailable(Exception):
+    pass
+
+
+def install_search_index(schema_editor) -> None:
+    """
+    Creates the narrative search index for the current database. Idempotent.
+    On SQLite, any migration that makes Django rebuild the incident table drops the
+    triggers, so such migrations must call this again afterwards.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(POSTGRES_INDEX_SQL)
+    elif vendor == "sqlite":
+        for statement in SQLITE_FTS_SQL:
+            schema_editor.execute(statement)
+    else:
+        logger.warning(f"Narrative search is not supported on {vendor}")
+
+
+def remove_search_index(schema_editor) -> None:
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {POSTGRES_INDEX}")
+    elif vendor == "sqlite":
+        for suffix in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SQLITE_FTS_TABLE}")
+
+
+class NarrativeSearchVector(Func):
+    """
+    The tsvector of a narrative, spelled exactly as in POSTGRES_INDEX_SQL so that the
+    planner uses the index. (Django's SearchVector adds another COALESCE whenever it is
+    re-resolved, which no longer matches the index expression.)
+    """
+    function = "to_tsvector"
+    template = f"%(function)s('{SEARCH_CONFIG}'::regconfig, COALESCE(%(expressions)s, ''))"
+    output_field = SearchVectorField()
+
+
+class TSHeadline(Func):
+    function = "ts_headline"
+    template = (f"%(function)s('{SEARCH_CONFIG}'::regconfig, %(expressions)s, "
+                f"'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, "
+                f"MaxFragments=3, MaxWords=20, MinWords=5')")
+    output_field = TextField()
+
+
+def _search_terms(text: str) -> List[str]:
+    return re.findall(r"\w+", text)
+
+
+def _postgres_search(queryset: QuerySet, terms: List[str]) -> QuerySet:
+    query = SearchQuery(" ".join(terms), config=SEARCH_CONFIG)
+    return (queryset.annotate(search_vector=NarrativeSearchVector("narrative"))
+                    .filter(search_vector=query)
+                    .annotate(rank=SearchRank(NarrativeSearchVector("narrative"), query),
+                              headline=TSHeadline(Coalesce(F("narrative"), Value("")), query)))
+
+
+def _sqlite_search(queryset: QuerySet, terms: List[str]) -> QuerySet:
+    # Each term is quoted, so FTS5 treats them as plain words that must all appear.
+    match = " ".join('"{}"'.format(term.replace('"', '""')) for term in terms)
+    matching = f"SELECT rowid FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH %s"
+    per_row = (f"FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH %s "
+               f"AND {SQLITE_FTS_TABLE}.rowid = incident.id")
+    # bm25() is lower for better matches; negate it so that, as on Postgres, higher is better.
+    rank = RawSQL(f"SELECT -bm25({SQLITE_FTS_TABLE}) {per_row}", [match],
+                  output_field=FloatField())
+    headline = RawSQL(f"SELECT snippet({SQLITE_FTS_TABLE}, 0, '{HIGHLIGHT_START}', "
+                      f"'{HIGHLIGHT_STOP}', '...', 20) {per_row}", [match],
+                      output_field=TextField())
+    return (queryset.filter(id__in=RawSQL(matching, [match]))
+                    .annotate(rank=rank, headline=headline))
+
+
+def search_incidents(queryset: QuerySet, text: str) -> QuerySet:
+    """
+    Full text search over incident narratives, answered from the database's inverted index
+    (a GIN index on Postgres, FTS5 on SQLite) rather than by scanning the table.
+    :param queryset: The incidents to search within.
+    :param text: What the user typed. Every word must appear in the narrative; words are
+                 stemmed, so "robbery" also matches "robberies".
+    :return: The matching incidents annotated with `rank` (higher is better) and a
+             highlighted `headline`, best matches first.
+    :raises SearchUnavailable: If the text has no words, or the database has no search index.
+    """
+    terms = _search_terms(text)
+    if not terms:
+        raise SearchUnavailable("Enter at least one word to search for.")
+
+    if connection.vendor == "postgresql":
+        queryset = _postgres_search(queryset, terms)
+    elif connection.vendor == "sqlite":
+        queryset = _sqlite_search(queryset, terms)
+    else:
+        raise SearchUnavailable(f"Narrative search is not supported on {connection.vendor}.")
+    return queryset.order_by("-rank", "-report_datetime", "-id")
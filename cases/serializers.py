@@ -1,20 +1,76 @@
 import logging
-import pytz
 
-from typing import Dict, Union
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Union
 from datetime import datetime
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
 from django.utils import timezone
+from psycopg2 import errorcodes
 from rest_framework import serializers
+from rest_framework.exceptions import NotFound
 from rest_framework.settings import api_settings
 from cases.models import (Officer, Incident,
                           Offense, IncidentInvolvedParty,
                           IncidentFile, Address, State,
                           City)
-from cases.utils import convert_date_string_to_object
+from cases.caches import geography_cache, offense_catalog, officer_cache
+from cases.conditional import PreconditionFailed
+from cases.datetimes import local_datetimes
+from cases.incident_numbers import incident_number_allocator
+from cases.constants import OFFENSES_APPEND, OFFENSES_MODE_CHOICES
+from cases.utils import apply_offense_changes, get_or_create_address
 User = get_user_model()
 logger = logging.getLogger('cases')
 
+# How often an incident is retried with a new allocated number before giving up.
+INCIDENT_NUMBER_ATTEMPTS = 3
+# The name Postgres gives the unique constraint behind Incident.incident_number.
+INCIDENT_NUMBER_UNIQUE_CONSTRAINT = "incident_incident_number_key"
+# SQLite names neither the constraint nor an error code, only the column, in its message.
+INCIDENT_NUMBER_UNIQUE_MESSAGE = "UNIQUE constraint failed: incident.incident_number"
+
+
+class SparseFieldsetMixin:
+    """
+    Lets a serializer be instantiated with `fields` (a tree as built by
+    cases.utils.parse_field_tree) and `expand` (a set of relation names).
+    Unrequested fields are dropped before they are ever bound, and nested relations that
+    are not expanded collapse to their primary keys, so neither costs any work.
+    Without either argument the serializer behaves exactly as it otherwise would.
+    """
+
+    def __init__(self, *args, fields: Optional[Dict[str, Dict]] = None,
+                 expand: Optional[Set[str]] = None, **kwargs) -> None:
+        self.requested_fields = fields
+        self.expanded_fields = expand
+        super(SparseFieldsetMixin, self).__init__(*args, **kwargs)
+
+    def get_fields(self) -> Dict[str, serializers.Field]:
+        fields = super(SparseFieldsetMixin, self).get_fields()
+        requested = self.requested_fields
+
+        if requested:
+            fields = OrderedDict((name, field) for name, field in fields.items()
+                                 if name in requested)
+
+        for name, field in fields.items():
+            many = isinstance(field, serializers.ListSerializer)
+            nested = field.child if many else field
+            if not isinstance(nested, serializers.BaseSerializer):
+                continue
+
+            subfields = (requested or {}).get(name)
+            expanded = (self.expanded_fields is None or name in self.expanded_fields
+                        or bool(subfields))
+            if not expanded:
+                fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, many=many)
+            elif subfields and isinstance(nested, SparseFieldsetMixin):
+                fields[name] = nested.__class__(*nested._args, many=many, fields=subfields,
+                                                **nested._kwargs)
+
+        return fields
+
 
 class StateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -30,7 +86,7 @@ class CitySerializer(serializers.ModelSerializer):
         fields = ("name", "state")
 
 
-class AddressSerializer(serializers.ModelSerializer):
+class AddressSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
 
     city = serializers.SerializerMethodField()
     state = serializers.SerializerMethodField()
@@ -41,21 +97,9 @@ class AddressSerializer(serializers.ModelSerializer):
         :param data: A dict containing information received from the API client.
         :return: An Address object containing the specified data.
         """
-        state_abbr = data.pop("state")
-        state, created = State.objects.get_or_create(abbreviation=state_abbr)
-
-        if created:
-            logger.debug(f"Created a new state: {state}")
-
-        city_name = data.pop("city")
-        city, created = City.objects.get_or_create(name=city_name, state=state)
-
-        if created:
-            logger.debug(f"Created a new city: {city}")
-
-        address = Address(**data, city=city)
-        address.save()
-        return address
+        state = geography_cache.state(data.pop("state"))
+        city = geography_cache.city(data.pop("city"), state)
+        return get_or_create_address(city=city, **data)
 
     def get_city(self, obj: Union[Dict, Address]) -> str:
         """
@@ -74,7 +118,7 @@ class AddressSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Address
-        fields = "__all__"
+        exclude = ("address_key",)
 
 
 # WTF is this about?
@@ -84,15 +128,9 @@ class DateTimeSerializer(serializers.Field):
         """
         Given a datetime object, serialize it.
         :param value: The datetime object to be serialized.
-        :return: A dict representation of the datetime.
+        :return: A dict representation of the datetime, in settings.TIME_ZONE.
         """
-        local_datetime = timezone.localtime(value,
-                                            timezone=pytz.timezone("US/Eastern"))
-        date_string = local_datetime.date().strftime("%Y-%m-%d")
-        time_string = local_datetime.time().strftime("%H:%M")
-        date_repr = {'date': date_string,
-                     'time': time_string}
-        return date_repr
+        return local_datetimes.encode(value)
 
     def to_internal_value(self, data: Dict) -> datetime:
         """
@@ -102,18 +140,17 @@ class DateTimeSerializer(serializers.Field):
         """
         if isinstance(data, datetime):
             return data
-        internal = convert_date_string_to_object(f"{data['date']} {data['time']}")
-        return internal
+        return local_datetimes.decode(date_string=data['date'], time_string=data['time'])
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ("id", "first_name", "last_name", "email", "username")
         read_only_fields = ("id",)
 
 
-class OfficerSerializer(serializers.ModelSerializer):
+class OfficerSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user = UserSerializer()
 
     def to_internal_value(self, data: Union[int, str, Dict]) -> Officer:
@@ -125,9 +162,13 @@ class OfficerSerializer(serializers.ModelSerializer):
         :return: An officer object.
         """
         if isinstance(data, int) or (isinstance(data, str) and data.isdigit()):
+            # Bulk writes resolve every referenced officer up front and pass them in.
+            prefetched = self.context.get("officers")
             try:
+                if prefetched is not None:
+                    return prefetched[int(data)]
                 return Officer.objects.get(id=data)
-            except Officer.DoesNotExist:
+            except (KeyError, Officer.DoesNotExist):
                 logger.debug(f"Tried to find officer with ID: {data}")
                 message = self.error_messages['invalid'].format(
                     datatype=type(data).__name__
@@ -157,7 +198,7 @@ class OfficerSerializer(serializers.ModelSerializer):
         return officer
 
 
-class OffenseSerializer(serializers.ModelSerializer):
+class OffenseSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     def to_internal_value(self, data: Union[int, str, Dict]):
         """
         For some reason that has now been forgotten, the OffenseSerializer can
@@ -167,9 +208,13 @@ class OffenseSerializer(serializers.ModelSerializer):
         :return: An Offense object.
         """
         if isinstance(data, int) or (isinstance(data, str) and data.isdigit()):
+            # Bulk writes resolve every referenced offense up front and pass them in.
+            prefetched = self.context.get("offenses")
             try:
-                return Offense.objects.get(id=data)
-            except Offense.DoesNotExist:
+                if prefetched is not None:
+                    return prefetched[int(data)]
+                return offense_catalog.get(int(data))
+            except KeyError:
                 logger.debug(f"Tried to find offense with ID: {data}")
                 message = self.error_messages['invalid'].format(
                     datatype=type(data).__name__
@@ -186,7 +231,33 @@ class OffenseSerializer(serializers.ModelSerializer):
         read_only_fields = ("id", "created_timestamp", "updated_timestamp")
 
 
-class IncidentSerializer(serializers.ModelSerializer):
+def is_duplicate_incident_number(error: IntegrityError) -> bool:
+    """
+    :return: Whether error is a violation of the incident number's unique constraint, as
+             opposed to e.g. a NOT NULL violation on the same column.
+    """
+    cause = error.__cause__
+    if not hasattr(cause, "pgcode"):
+        return str(cause) == INCIDENT_NUMBER_UNIQUE_MESSAGE
+    return (cause.pgcode == errorcodes.UNIQUE_VIOLATION
+            and getattr(getattr(cause, "diag", None), "constraint_name", None)
+            == INCIDENT_NUMBER_UNIQUE_CONSTRAINT)
+
+
+def raise_for_duplicate_incident_number(error: IntegrityError) -> None:
+    """
+    Turns a violation of the incident number's unique constraint into a validation error.
+    :raises ValidationError: If error is one.
+    :raises IntegrityError: error itself, otherwise.
+    """
+    if is_duplicate_incident_number(error):
+        raise serializers.ValidationError({'incident_number': ["An Incident with that "
+                                                               "incident number already "
+                                                               "exists"]})
+    raise error
+
+
+class IncidentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     # Is there a reason I specified all these explicitly?
     offenses = OffenseSerializer(many=True)
     reporting_officer = OfficerSerializer()
@@ -200,67 +271,140 @@ class IncidentSerializer(serializers.ModelSerializer):
     reviewed_datetime = DateTimeSerializer(required=False, allow_null=True)
     earliest_occurrence_datetime = DateTimeSerializer()
     latest_occurrence_datetime = DateTimeSerializer()
+    offenses_mode = serializers.ChoiceField(choices=OFFENSES_MODE_CHOICES,
+                                            write_only=True, required=False)
 
     def create(self, validated_data: Dict) -> Incident:
         """
         Given validated data received from the API client, create the Incident object.
-        :param validated_data: A python dict which defines the Incident.
+        :param validated_data: A python dict which defines the Incident. Without an
+                               incident_number, one is allocated.
         :return: The Incident object.
+        :raises ValidationError: If the given incident number is already taken.
         """
         offenses = validated_data.pop("offenses")
-        incident = Incident.objects.create(**validated_data)
-        for offense in offenses:
-            incident.offenses.add(offense)
-        return incident
+        validated_data.pop("offenses_mode", None)
+        allocate = not validated_data.get("incident_number")
 
-    def update(self, instance: Incident, validated_data: Dict) -> Incident:
+        for attempt in range(INCIDENT_NUMBER_ATTEMPTS):
+            if allocate:
+                validated_data["incident_number"] = incident_number_allocator.allocate()[0]
+            try:
+                with transaction.atomic():
+                    incident = Incident.objects.create(**validated_data)
+                    apply_offense_changes(incident, offenses, current=set())
+                return incident
+            except IntegrityError as err:
+                # The unique constraint is the check; an allocated number can only clash
+                # with one a client chose by hand, so just take the next one.
+                if not (allocate and is_duplicate_incident_number(err)):
+                    raise_for_duplicate_incident_number(err)
+        raise serializers.ValidationError({'incident_number': ["Could not allocate an "
+                                                               "unused incident number"]})
+
+    def update(self, instance: Incident, validated_data: Dict,
+               expected_updated: Optional[datetime] = None) -> Incident:
         """
         After the input data has been validated, update the Incident object as appropriate.
+        Only the columns whose values change are written (and updated_timestamp), so
+        concurrent edits of other fields are not overwritten.
         :param instance: Instance object to be modified.
         :param validated_data: Python dict containing information to be updated on the Incident.
+                               Its offenses are added to the incident's, unless offenses_mode
+                               says to replace or remove them instead.
+        :param expected_updated: If given, the incident is only updated if its
+                                 updated_timestamp still has this value.
         :return: The updated Incident object.
+        :raises PreconditionFailed: If the incident changed since expected_updated.
+        :raises NotFound: If the incident was deleted and no expected_updated was given.
+        :raises ValidationError: If the incident number is changed to one already taken.
         """
-        offenses = validated_data.pop("offenses", [])
-
-        for offense in offenses:
-            if offense not in instance.offenses.all():
-                instance.offenses.add(offense)
-
-        for attr, value in validated_data.items():
-            logger.debug(f"Updating attr: {attr} to value:{value}")
+        offenses = validated_data.pop("offenses", None)
+        mode = validated_data.pop("offenses_mode", OFFENSES_APPEND)
+
+        changed = {attr: value for attr, value in validated_data.items()
+                   if getattr(instance, attr) != value}
+        logger.debug(f"Updating {instance}: {changed}")
+        changed["updated_timestamp"] = timezone.now()
+        rows = Incident.objects.filter(id=instance.id)
+        if expected_updated is not None:
+            rows = rows.filter(updated_timestamp=expected_updated)
+
+        try:
+            with transaction.atomic():
+                if not rows.update(**changed):
+                    # Without a precondition, no row can only mean the incident is gone.
+                    if expected_updated is not None:
+                        raise PreconditionFailed()
+                    raise NotFound()
+                if offenses is not None:
+                    apply_offense_changes(instance, offenses, mode=mode)
+        except IntegrityError as err:
+            raise_for_duplicate_incident_number(err)
+
+        for attr, value in changed.items():
             setattr(instance, attr, value)
-
-        instance.save()
-
         return instance
 
-    def validate_incident_number(self, value: str) -> str:
-        """
-        Ensures that when creating an incident an incident_number is not being duplicated,
-        and when updating an incident that the incident_number is not being changed to one
-        that already exists elsewhere.
-        :param value: The incident number to validate.
-        :return: The validated incident number.
-        """
-        existing = Incident.objects.filter(incident_number=value).first()
-        if existing is not None:
-            if not self.instance:
-                raise serializers.ValidationError("An Incident with that incident "
-                                                  "number already exists")
-            if value != self.instance.incident_number:
-                raise serializers.ValidationError("An Incident with that incident "
-                                                  "number already exists")
-        return value
-
     class Meta:
         model = Incident
-        fields = "__all__"
+        exclude = ("embedded_updated_timestamp",)
         read_only_fields = ("id", "created_timestamp", "updated_timestamp",)
+        # Uniqueness is left to the database's unique constraint, see create and update.
+        extra_kwargs = {'incident_number': {'validators': [], 'required': False}}
+
+
+class LocationDataSerializer(serializers.Serializer):
+    """
+    Validates the same address payload that AddressSerializer accepts, but hands it back
+    as a plain dict instead of saving it, so that many addresses can be created in bulk.
+    """
+    street_number = serializers.CharField(max_length=25, required=False,
+                                          allow_null=True, allow_blank=True)
+    route = serializers.CharField(max_length=255, required=False,
+                                  allow_null=True, allow_blank=True)
+    city = serializers.CharField(max_length=150)
+    state = serializers.CharField(max_length=5)
+    postal_code = serializers.CharField(max_length=10, required=False,
+                                        allow_null=True, allow_blank=True)
+
+
+class BulkIncidentSerializer(IncidentSerializer):
+    """
+    Validation-only variant of IncidentSerializer used by cases.bulk. It performs no
+    queries of its own: officers and offenses come from the serializer context, locations
+    are left as dicts, and incident number uniqueness is checked for the whole batch at once.
+    """
+    location = LocationDataSerializer()
+
+
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    A PrimaryKeyRelatedField that, when the serializer context holds a dict of already
+    loaded objects under `context_key`, resolves IDs from that dict instead of querying.
+    """
+
+    def __init__(self, context_key: str, **kwargs) -> None:
+        self.context_key = context_key
+        super(PrefetchedPrimaryKeyRelatedField, self).__init__(**kwargs)
+
+    def to_internal_value(self, data: Union[int, str]):
+        prefetched = self.context.get(self.context_key)
+        if prefetched is None:
+            return super(PrefetchedPrimaryKeyRelatedField, self).to_internal_value(data)
+        try:
+            return prefetched[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
 
 
 class IncidentInvolvedPartySerializer(serializers.ModelSerializer):
-    incident = serializers.PrimaryKeyRelatedField(queryset=Incident.objects.all())
-    officer_signed = serializers.PrimaryKeyRelatedField(queryset=Officer.objects.all())
+    incident = PrefetchedPrimaryKeyRelatedField(context_key="incidents",
+                                                queryset=Incident.objects.all())
+    officer_signed = PrefetchedPrimaryKeyRelatedField(context_key="officers",
+                                                      queryset=Officer.objects.all())
     home_address = AddressSerializer(required=False, allow_null=True)
     employer_address = AddressSerializer(required=False, allow_null=True)
 
@@ -283,6 +427,25 @@ class IncidentInvolvedPartySerializer(serializers.ModelSerializer):
                             "incident", "party_type")
 
 
+class BulkIncidentInvolvedPartySerializer(IncidentInvolvedPartySerializer):
+    """
+    Validation-only variant of IncidentInvolvedPartySerializer used by cases.bulk:
+    the incident and signing officer come from the context, and addresses are left as
+    dicts so that they can be created in bulk.
+    """
+    home_address = LocationDataSerializer(required=False, allow_null=True)
+    employer_address = LocationDataSerializer(required=False, allow_null=True)
+
+
+class IncidentSearchResultSerializer(serializers.Serializer):
+    """One row of cases.search.search_incidents, read from .values()."""
+    id = serializers.IntegerField()
+    incident_number = serializers.CharField()
+    report_datetime = serializers.DateTimeField()
+    rank = serializers.FloatField()
+    headline = serializers.CharField()
+
+
 class IncidentFileSerializer(serializers.ModelSerializer):
     file_name = serializers.SerializerMethodField()
 
@@ -305,14 +468,16 @@ class IncidentFileSerializer(serializers.ModelSerializer):
         read_only_fields = ("id", "created_timestamp", "updated_timestamp",)
 
 
-def jwt_response_payload_handler(token: str, user: User) -> Dict:
+def jwt_response_payload_handler(token: str, user: User, request=None) -> Dict:
     """
     Returns both the Officer's data, as well as the serialized authentication token.
+    The officer comes from the officer cache, so refreshing a token usually costs no query.
     :param token: JWT
     :param user: User object that corresponds with the Officer whose data we want.
+    :param request: The login or refresh request, which djangorestframework-jwt passes.
     :return:
     """
-    officer = user.officer_set.first()
+    officer = officer_cache.for_user(user.pk)
     officer_data = OfficerSerializer(officer).data
     return {
         'token': token,
@@ -1,7 +1,22 @@
 import logging
 
-from django.db.models.signals import pre_delete
-from cases.models import IncidentFile
+from typing import Iterable
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.utils import timezone
+from cases.authentication import verified_tokens
+from cases.caches import geography_cache, offense_catalog, officer_cache
+from cases.constants import INCIDENT_OFFICER_FIELDS
+from cases.models import (Address, City, Incident, IncidentFile, IncidentInvolvedParty, Offense,
+                          Officer, State)
+from cases.report_cache import report_pdfs
+
+User = get_user_model()
+# The user fields rendered as part of an incident's officers.
+RENDERED_USER_FIELDS = {"first_name", "last_name", "email", "username"}
+# The addresses of an incident's parties, which its printed report includes.
+PARTY_ADDRESS_FIELDS = ("home_address", "employer_address")
 
 logger = logging.getLogger('cases')
 
@@ -15,4 +30,132 @@ def delete_incident_file_from_disk(sender, **kwargs):
         instance.file.delete()
 
 
+def invalidate_offense_catalog(sender, **kwargs):
+    """Any change to an Offense means every process must reload the offense catalog."""
+    offense_catalog.invalidate()
+
+
+def evict_cached_officer(sender, **kwargs):
+    officer_cache.evict(kwargs['instance'])
+
+
+def forget_cached_user(sender, instance: User, created: bool = False, **kwargs):
+    """Revokes verified tokens and evicts the user's officers, unless they just logged in."""
+    update_fields = kwargs.get("update_fields")
+    if created or (update_fields is not None and set(update_fields) <= {"last_login"}):
+        return
+    verified_tokens.revoke()
+    officer_cache.evict_user(instance.pk)
+
+
+def forget_geography(sender, created: bool = False, **kwargs):
+    """Cached states and cities are keyed by name, so forget them all when one changes."""
+    if not created:
+        geography_cache.invalidate()
+
+
+def forget_incidents(incident_ids: Iterable[int]) -> None:
+    """
+    Moves the incidents' embedded_updated_timestamp forward, within the transaction that
+    changed what they embed, so that their cached representations and printed reports,
+    which are versioned by it, are no longer used once it commits. The printed reports
+    are deleted from disk too.
+    """
+    incident_ids = set(incident_ids)
+    if incident_ids:
+        Incident.objects.filter(id__in=incident_ids).update(
+            embedded_updated_timestamp=timezone.now()
+        )
+    report_pdfs.invalidate(incident_ids)
+
+
+def forget_incidents_where(query: Q) -> None:
+    """Forgets every incident matching the query, e.g. those at one address."""
+    forget_incidents(Incident.objects.filter(query).values_list("id", flat=True))
+
+
+def _officer_query(officer_id: int) -> Q:
+    query = Q()
+    for field in INCIDENT_OFFICER_FIELDS:
+        query |= Q(**{field: officer_id})
+    return query
+
+
+def _address_query(path: str, instance) -> Q:
+    """Incidents located at, or with a party living or employed at, the given address(es)."""
+    query = Q(**{f"location{path}": instance})
+    for field in PARTY_ADDRESS_FIELDS:
+        query |= Q(**{f"incidentinvolvedparty__{field}{path}": instance})
+    return query
+
+
+def forget_cached_incident(sender, instance: Incident, created: bool = False, **kwargs):
+    """Edits change updated_timestamp, which the caches check, so only clean up the disk."""
+    if not created:
+        report_pdfs.invalidate([instance.id])
+
+
+def forget_deleted_party(sender, instance: IncidentInvolvedParty, **kwargs):
+    """
+    A deleted party takes its updated_timestamp with it, so the report's version and
+    Last-Modified move forward through the incident instead.
+    """
+    forget_incidents([instance.incident_id])
+
+
+def forget_cached_incident_offenses(sender, instance, action: str, reverse: bool,
+                                    pk_set=None, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        forget_incidents([instance.id])
+    elif action == "pre_clear":
+        forget_incidents_where(Q(offenses=instance))
+    else:
+        forget_incidents(pk_set or [])
+
+
+def forget_incidents_embedding(sender, instance, created: bool = False, **kwargs):
+    """
+    Officers, their users, addresses, cities, states and offenses are rendered and printed
+    as part of incidents, so changing one forgets every incident that embeds it.
+    """
+    if created:
+        return
+    if sender is Officer:
+        forget_incidents_where(_officer_query(instance.id))
+    elif sender is User:
+        update_fields = kwargs.get("update_fields")
+        # Logging in saves last_login, which is not rendered.
+        if update_fields is None or RENDERED_USER_FIELDS & set(update_fields):
+            for officer_id in Officer.objects.filter(user=instance).values_list("id", flat=True):
+                forget_incidents_where(_officer_query(officer_id))
+    elif sender is Address:
+        forget_incidents_where(_address_query("", instance))
+    elif sender is City:
+        forget_incidents_where(_address_query("__city", instance))
+    elif sender is State:
+        forget_incidents_where(_address_query("__city__state", instance))
+    elif sender is Offense:
+        forget_incidents_where(Q(offenses=instance))
+
+
 pre_delete.connect(delete_incident_file_from_disk)
+post_save.connect(invalidate_offense_catalog, sender=Offense)
+post_delete.connect(invalidate_offense_catalog, sender=Offense)
+post_save.connect(evict_cached_officer, sender=Officer)
+post_delete.connect(evict_cached_officer, sender=Officer)
+post_save.connect(forget_cached_user, sender=User)
+post_delete.connect(forget_cached_user, sender=User)
+post_save.connect(forget_geography, sender=State)
+post_save.connect(forget_geography, sender=City)
+post_delete.connect(forget_geography, sender=State)
+post_delete.connect(forget_geography, sender=City)
+post_save.connect(forget_cached_incident, sender=Incident)
+post_delete.connect(forget_cached_incident, sender=Incident)
+post_delete.connect(forget_deleted_party, sender=IncidentInvolvedParty)
+m2m_changed.connect(forget_cached_incident_offenses, sender=Incident.offenses.through)
+for embedded in (Officer, User, Address, City, State, Offense):
+    post_save.connect(forget_incidents_embedding, sender=embedded)
+# Deleting an offense removes it from incidents without any m2m_changed signal.
+pre_delete.connect(forget_incidents_embedding, sender=Offense)
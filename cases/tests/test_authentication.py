@@ -0,0 +1,167 @@
+import base64
+from unittest import mock
+from django.contrib.auth import authenticate, get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_jwt.settings import api_settings
+from cases.authentication import verified_credentials, verified_tokens
+from cases.caches import offense_catalog, officer_cache
+from cases.models import CacheVersion
+from cases.serializers import jwt_response_payload_handler
+from cases.tests.factories import OfficerFactory
+from cases.tests.utils import QueryBudgetMixin, generate_jwt_for_tests
+
+User = get_user_model()
+
+
+class CachedBasicAuthenticationTestCase(APITestCase):
+
+    def setUp(self):
+        verified_credentials.clear()
+        self.user = OfficerFactory().user
+        self.user.set_password("correct horse")
+        self.user.save()
+        self.url = reverse("offense-list")
+
+    def _get(self, password: str, username: str = None):
+        credentials = f"{username or self.user.username}:{password}".encode("utf-8")
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Basic {base64.b64encode(credentials).decode('ascii')}"
+        )
+        return self.client.get(self.url)
+
+    @mock.patch("rest_framework.authentication.authenticate", wraps=authenticate)
+    def test_password_is_hashed_once(self, hashed):
+        for _ in range(3):
+            self.assertEqual(self._get("correct horse").status_code, status.HTTP_200_OK)
+        self.assertEqual(hashed.call_count, 1)
+        self.assertEqual(verified_credentials.stats()['hits'], 2)
+
+    @mock.patch("rest_framework.authentication.authenticate", wraps=authenticate)
+    def test_failures_are_not_cached(self, hashed):
+        for _ in range(2):
+            self.assertEqual(self._get("wrong").status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(hashed.call_count, 2)
+        self.assertEqual(self._get("correct horse").status_code, status.HTTP_200_OK)
+        # The same password for another username is a different entry.
+        other = OfficerFactory().user
+        response = self._get("correct horse", username=other.username)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_invalidates(self):
+        self.assertEqual(self._get("correct horse").status_code, status.HTTP_200_OK)
+        self.user.set_password("battery staple")
+        self.user.save()
+        self.assertEqual(self._get("correct horse").status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self._get("battery staple").status_code, status.HTTP_200_OK)
+
+    def test_deactivation_invalidates(self):
+        self.assertEqual(self._get("correct horse").status_code, status.HTTP_200_OK)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self._get("correct horse").status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @mock.patch("cases.caches.time.monotonic")
+    def test_entries_expire(self, monotonic):
+        monotonic.return_value = 100
+        self._get("correct horse")
+        monotonic.return_value = 100 + 24 * 60 * 60
+        with mock.patch("rest_framework.authentication.authenticate",
+                        wraps=authenticate) as hashed:
+            self.assertEqual(self._get("correct horse").status_code, status.HTTP_200_OK)
+        self.assertEqual(hashed.call_count, 1)
+
+
+class CachedJSONWebTokenAuthenticationTestCase(QueryBudgetMixin, APITestCase):
+
+    def setUp(self):
+        verified_tokens.clear()
+        officer_cache.clear()
+        self.officer = OfficerFactory()
+        self.user = self.officer.user
+        self.token = generate_jwt_for_tests(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        self.url = reverse("offense-list")
+        offense_catalog.data()
+
+    def test_verified_tokens_need_no_queries(self):
+        # Loading the user, and reading the users' shared version, once per interval.
+        with self.assertWithinQueryBudget(2):
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        with self.assertWithinQueryBudget(0):
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        self.assertEqual(verified_tokens.stats()['hits'], 1)
+
+    def test_deactivation_revokes_tokens(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivation_by_another_process_revokes_tokens(self):
+        self.client.get(self.url)
+        # Another process deactivates the user; this one notices at its next check.
+        User.objects.filter(id=self.user.id).update(is_active=False)
+        CacheVersion.objects.update_or_create(name="users", defaults={'value': "elsewhere"})
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        verified_tokens._shared_version.expire()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_saving_the_user_during_verification_voids_the_entry(self):
+        version = verified_tokens.version()
+        payload = api_settings.JWT_DECODE_HANDLER(self.token)
+        # The user is loaded as active, then deactivated before the entry is added.
+        self.user.is_active = False
+        self.user.save()
+        self.user.is_active = True
+        verified_tokens.add(self.token, payload, self.user, version)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logging_in_keeps_tokens(self):
+        self.client.get(self.url)
+        self.user.save(update_fields=["last_login"])
+        with self.assertWithinQueryBudget(0):
+            self.client.get(self.url)
+
+    def test_expired_tokens_are_verified_again(self):
+        self.client.get(self.url)
+        expires = api_settings.JWT_DECODE_HANDLER(self.token)['exp']
+        with mock.patch("cases.authentication.time.time", return_value=expires):
+            self.client.get(self.url)
+        self.assertEqual(verified_tokens.stats()['misses'], 2)
+
+    def test_login_payload_uses_the_officer_cache(self):
+        response = self.client.post("/api/auth/token-refresh/", data={'token': self.token},
+                                    format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['officer']['id'], self.officer.id)
+        with self.assertNumQueries(0):
+            payload = jwt_response_payload_handler(self.token, self.user)
+        self.assertEqual(payload['officer']['user']['username'], self.user.username)
+
+        self.user.first_name = "Renamed"
+        self.user.save()
+        payload = jwt_response_payload_handler(self.token, self.user)
+        self.assertEqual(payload['officer']['user']['first_name'], "Renamed")
+
+
+class CacheStatsTestCase(APITestCase):
+
+    def setUp(self):
+        verified_tokens.clear()
+        self.user = OfficerFactory().user
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {generate_jwt_for_tests(self.user)}")
+        self.url = reverse("cache-stats")
+
+    def test_staff_only(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_reports_hit_rates(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.client.get(self.url)
+        stats = self.client.get(self.url).json()
+        self.assertEqual(stats['jwt_tokens']['hit_rate'], 0.5)
+        self.assertIsNone(stats['basic_credentials']['hit_rate'])
+        self.assertIn('hit_rate', stats['officers']['by_user'])
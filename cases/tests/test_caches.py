@@ -0,0 +1,215 @@
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import timedelta
+from unittest import mock
+from django.conf import settings
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from cases import cache_backends
+from cases.caches import TTLCache, geography_cache, offense_catalog, officer_cache
+from cases.models import Address, CacheVersion, City, Incident, Offense
+from cases.representations import VERSION_COLUMNS, IncidentRepresentationCache
+from cases.serializers import AddressSerializer
+from cases.tests.factories import IncidentFactory, OfficerFactory, OffenseFactory
+from cases.utils import handle_incident_foreign_keys_for_creation
+
+
+class TTLCacheTestCase(TestCase):
+
+    @mock.patch("cases.caches.time.monotonic")
+    def test_entries_expire(self, monotonic):
+        monotonic.return_value = 100
+        cache = TTLCache(ttl=30)
+        cache.set("key", "value")
+        self.assertEqual(cache.get("key"), "value")
+
+        monotonic.return_value = 131
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = TTLCache(ttl=30, maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual((cache.get("a"), cache.get("b"), cache.get("c")), (1, None, 3))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+
+class OfficerCacheTestCase(TestCase):
+
+    def setUp(self):
+        officer_cache.clear()
+        self.officers = [OfficerFactory() for _ in range(3)]
+
+    def test_resolves_by_number_with_one_query(self):
+        fields = ("reporting_officer", "reviewed_by_officer", "investigating_officer",
+                  "officer_making_report", "supervisor")
+        data = {field: self.officers[num % 3].officer_number
+                for num, field in enumerate(fields)}
+        with self.assertNumQueries(1):
+            resolved = handle_incident_foreign_keys_for_creation(dict(data, beat=1))
+        self.assertEqual(resolved['supervisor'], self.officers[1])
+        self.assertEqual(resolved['beat'], 1)
+
+        with self.assertNumQueries(0):
+            officers = officer_cache.in_bulk(officer.id for officer in self.officers)
+        self.assertEqual(set(officers), {officer.id for officer in self.officers})
+
+
+class OffenseCatalogTestCase(TestCase):
+
+    def setUp(self):
+        self.offense = OffenseFactory(ucr_code="A1")
+        offense_catalog.clear()
+        offense_catalog.data()
+
+    def _change_elsewhere(self, **changes) -> None:
+        """Updates the offense as another process would: no signals, no local expiry."""
+        Offense.objects.filter(id=self.offense.id).update(**changes)
+        CacheVersion.objects.filter(name="offenses").update(value="changed-elsewhere")
+
+    @mock.patch("cases.caches.time.monotonic")
+    def test_changes_by_other_processes_are_seen_within_the_interval(self, monotonic):
+        monotonic.return_value = 1000.0
+        offense_catalog.clear()
+        offense_catalog.data()
+        self._change_elsewhere(ucr_code="B2")
+        with self.assertNumQueries(0):
+            self.assertEqual(offense_catalog.get(self.offense.id).ucr_code, "A1")
+
+        monotonic.return_value += settings.SHARED_VERSION_CHECK_INTERVAL
+        self.assertEqual(offense_catalog.get(self.offense.id).ucr_code, "B2")
+        with self.assertNumQueries(0):
+            offense_catalog.get(self.offense.id)
+
+    def test_unknown_offenses_are_checked_for_straight_away(self):
+        created_elsewhere = OffenseFactory()
+        offense_catalog._shared_version._checked = time.monotonic()
+        offense_catalog._version = offense_catalog._shared_version._value = "before"
+        self.assertEqual(offense_catalog.data(created_elsewhere.id)['id'], created_elsewhere.id)
+        self.assertEqual(set(offense_catalog.in_bulk([self.offense.id, 0])), {self.offense.id})
+
+    def test_own_changes_are_seen_straight_away(self):
+        self.offense.ucr_code = "C3"
+        self.offense.save()
+        self.assertEqual(offense_catalog.get(self.offense.id).ucr_code, "C3")
+
+
+class GeographyCacheTestCase(TransactionTestCase):
+    # Rows are only cached once committed, hence TransactionTestCase.
+    fixtures = ["states.json"]
+
+    def setUp(self):
+        geography_cache.clear()
+
+    def test_address_writes_skip_geography_queries_once_warm(self):
+        data = {'street_number': "100", 'route': "College Ave",
+                'city': "Athens", 'state': "GA", 'postal_code': "30601"}
+        AddressSerializer().to_internal_value(dict(data))
+
+        # One query to find the address by its key, one to insert it.
+        with self.assertNumQueries(2):
+            address = AddressSerializer().to_internal_value(dict(data, street_number="102"))
+        self.assertEqual(address.city.name, "Athens")
+        self.assertEqual(address.city.state.abbreviation, "GA")
+        self.assertEqual(City.objects.count(), 1)
+        self.assertEqual(Address.objects.count(), 2)
+
+    def test_unknown_states_are_named_from_the_constants(self):
+        geography_cache.state("GA").delete()
+        self.assertEqual(geography_cache.state("GA").name, "Georgia")
+        self.assertEqual(geography_cache.state("ZZ").name, "ZZ")
+
+    def test_renames_by_other_processes_are_seen_within_the_interval(self):
+        city = geography_cache.city("Athens", geography_cache.state("GA"))
+        # Another process renames the city: no signals, no local expiry.
+        City.objects.filter(id=city.id).update(name="Atlanta")
+        CacheVersion.objects.update_or_create(name="geography",
+                                              defaults={'value': "changed-elsewhere"})
+        state = geography_cache.state("GA")
+        with mock.patch("cases.caches.time.monotonic",
+                        return_value=time.monotonic() + settings.SHARED_VERSION_CHECK_INTERVAL):
+            self.assertNotEqual(geography_cache.city("Athens", state).id, city.id)
+            self.assertEqual(geography_cache.city("Atlanta", state).id, city.id)
+
+    def test_own_renames_are_seen_straight_away(self):
+        state = geography_cache.state("GA")
+        city = geography_cache.city("Athens", state)
+        city.name = "Atlanta"
+        city.save()
+        self.assertNotEqual(geography_cache.city("Athens", state).id, city.id)
+
+    def test_rolled_back_cities_are_not_cached(self):
+        state = geography_cache.state("GA")
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                geography_cache.city("Athens", state)
+                raise RuntimeError()
+
+        city = geography_cache.city("Athens", state)
+        self.assertTrue(City.objects.filter(id=city.id).exists())
+        with self.assertNumQueries(0):
+            self.assertEqual(geography_cache.city("Athens", state), city)
+
+
+def redis_is_reachable() -> bool:
+    if cache_backends.redis is None:
+        return False
+    location = settings.REPRESENTATION_CACHE_BACKENDS['redis']['LOCATION']
+    try:
+        return cache_backends.redis.Redis.from_url(location).ping()
+    except cache_backends.redis.RedisError:
+        return False
+
+
+class IncidentRepresentationBackendTestCase(TestCase):
+    """Every backend in settings.REPRESENTATION_CACHE_BACKENDS must serve the same bytes."""
+
+    def setUp(self):
+        offense_catalog.clear()
+        for _ in range(3):
+            IncidentFactory().offenses.add(OffenseFactory())
+
+    def _exercise(self, backend: dict) -> None:
+        with override_settings(CACHES=dict(settings.CACHES, representations=backend)):
+            representations = IncidentRepresentationCache()
+            representations.clear()
+            rows = list(Incident.objects.order_by("id").values(*VERSION_COLUMNS))
+            rendered = representations.fragments(rows)
+            self.assertEqual(len(rendered), 3)
+            with self.assertNumQueries(0):
+                self.assertEqual(representations.fragments(rows), rendered)
+
+            # As the signal handlers do when something the incident embeds changes. The
+            # entry is left in place, as one stored late by a racing request would be.
+            Incident.objects.filter(id=rows[0]["id"]).update(
+                embedded_updated_timestamp=timezone.now()
+            )
+            rows = list(Incident.objects.order_by("id").values(*VERSION_COLUMNS))
+            representations.fragments(rows)
+            self.assertEqual(representations.stats(), {'hits': 5, 'misses': 4})
+
+            # An entry rendered before the incident last changed is not used.
+            rows[1]["updated_timestamp"] += timedelta(seconds=1)
+            representations.fragments(rows)
+            self.assertEqual(representations.stats()['misses'], 5)
+            representations.clear()
+
+    def test_locmem_backend(self):
+        self._exercise(settings.REPRESENTATION_CACHE_BACKENDS['locmem'])
+
+    def test_file_backend(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self._exercise(dict(settings.REPRESENTATION_CACHE_BACKENDS['file'], LOCATION=directory))
+
+    @unittest.skipUnless(redis_is_reachable(), "needs the redis package and a local Redis server")
+    def test_redis_backend(self):
+        self._exercise(settings.REPRESENTATION_CACHE_BACKENDS['redis'])
@@ -0,0 +1,176 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from io import BytesIO, StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase, override_settings
+from pypdf import PdfReader
+from cases.export import EXPORT_COLUMNS
+from cases.models import Address, Incident
+from cases.printing import IncidentReportPDFGenerator
+from cases.tests.factories import (AddressFactory, CityFactory, IncidentFactory,
+                                   OffenseFactory, VictimFactory)
+
+
+class ExportIncidentsCommandTestCase(TestCase):
+
+    def setUp(self):
+        offense = OffenseFactory()
+        self.incidents = [IncidentFactory() for _ in range(5)]
+        for incident in self.incidents:
+            incident.offenses.add(offense)
+
+    def test_ndjson_across_several_chunks(self):
+        out = StringIO()
+        call_command("export_incidents", "--chunk-size=2", stdout=out)
+
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(sorted(row['id'] for row in rows),
+                         sorted(incident.id for incident in self.incidents))
+        self.assertTrue(all(len(row['offense_ids']) == 1 for row in rows))
+
+    def test_csv_has_header_and_one_line_per_incident(self):
+        out = StringIO()
+        call_command("export_incidents", "--format=csv", stdout=out)
+
+        reader = csv.reader(out.getvalue().splitlines())
+        self.assertEqual(next(reader), EXPORT_COLUMNS)
+        self.assertEqual(len(list(reader)), len(self.incidents))
+
+    def test_invalid_date(self):
+        with self.assertRaises(CommandError):
+            call_command("export_incidents", "--report-after=yesterday", stdout=StringIO())
+
+
+class IncidentFilterBenchmarkTestCase(TestCase):
+
+    def test_seed_then_every_filter_reads_through_its_own_index(self):
+        # Large enough, once analyzed, for the planner to prefer the indexes on its own.
+        call_command("seed_incidents", "--count=3000", "--batch-size=1000", "--officers=50",
+                     "--offenses=50", "--cities=20", "--seed=1", stdout=StringIO())
+        self.assertEqual(Incident.objects.count(), 3000)
+
+        out = StringIO()
+        # Raises naming the filters whose plan lacks their index.
+        call_command("benchmark_incident_filters", stdout=out)
+
+        lines = out.getvalue().splitlines()[1:]
+        self.assertEqual([line.strip().split("  ")[0] for line in lines],
+                         ["report range", "occurred range", "beat", "shift", "officer",
+                          "offense", "city"])
+        officer = next(line for line in lines if line.split()[0] == "officer")
+        self.assertIn("incident_sup_officer_idx", officer)
+
+
+class IncidentListBenchmarkTestCase(TestCase):
+
+    def test_both_paths_are_measured(self):
+        with self.assertRaises(CommandError):
+            call_command("benchmark_incident_list", stdout=StringIO())
+        call_command("seed_incidents", "--count=12", "--officers=3", "--offenses=4",
+                     "--cities=2", "--seed=1", "--no-analyze", stdout=StringIO())
+        out = StringIO()
+        call_command("benchmark_incident_list", "--page-size=5", "--pages=3", stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], "12 incidents in pages of 5")
+        self.assertEqual([line.split()[0] for line in lines[1:]], ["serializer", "flat"])
+
+
+class PrintingBenchmarkTestCase(TestCase):
+
+    def test_drawing_runs_no_queries(self):
+        with self.assertRaises(CommandError):
+            call_command("benchmark_printing", stdout=StringIO())
+        call_command("seed_incidents", "--count=4", "--officers=3", "--offenses=4",
+                     "--cities=2", "--seed=1", "--no-analyze", stdout=StringIO())
+        out = StringIO()
+        call_command("benchmark_printing", "--count=3", stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith("3 reports"), lines)
+        self.assertTrue(lines[1].split()[0] == "load" and lines[1].endswith("3.0 queries/report"),
+                        lines)
+        self.assertTrue(lines[2].split()[0] == "draw" and lines[2].endswith("0.0 queries/report"),
+                        lines)
+
+
+class PrintIncidentsCommandTestCase(TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.output = os.path.join(directory, "reports")
+        overridden = override_settings(REPORT_PDF_CACHE_DIR=os.path.join(directory, "cache"))
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        self.incidents = [IncidentFactory(beat=3) for _ in range(3)]
+        IncidentFactory(beat=4)
+
+    def test_zip_across_processes(self):
+        call_command("print_incidents", "--filter=beat=3", "--workers=2",
+                     f"--output={self.output}", stdout=StringIO())
+        with zipfile.ZipFile(self.output) as archive:
+            self.assertEqual(sorted(archive.namelist()),
+                             sorted(f"incident-{incident.incident_number}.pdf"
+                                    for incident in self.incidents))
+
+    def test_merged_pdf(self):
+        out = StringIO()
+        call_command("print_incidents", "--filter=beat=3", "--format=pdf",
+                     f"--output={self.output}", stdout=out)
+        self.assertIn("Printed 3 reports", out.getvalue())
+        reports = [IncidentReportPDFGenerator.for_incident(incident.id).render()
+                   for incident in self.incidents]
+        self.assertEqual(len(PdfReader(self.output).pages),
+                         sum(len(PdfReader(BytesIO(report)).pages) for report in reports))
+
+    def test_nothing_matches(self):
+        with self.assertRaises(CommandError):
+            call_command("print_incidents", "--filter=beat=5", f"--output={self.output}",
+                         stdout=StringIO())
+
+
+class DateTimeCodecBenchmarkTestCase(SimpleTestCase):
+
+    def test_reports_every_case(self):
+        out = StringIO()
+        call_command("benchmark_datetime_codec", "--count=50", "--repeat=1", "--seed=1",
+                     stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines], ["encode"] * 2 + ["decode"] * 3)
+        self.assertTrue(all(line.endswith("x") for line in lines), lines)
+
+
+class DedupeAddressesCommandTestCase(TestCase):
+
+    def test_merges_duplicates_and_rewrites_references(self):
+        city = CityFactory()
+        keyed = AddressFactory(street_number="10", route="Main Street", city=city,
+                               postal_code="30601")
+        # bulk_create skips save(), just like rows written before address_key existed.
+        legacy = Address.objects.bulk_create(
+            [Address(street_number="10", route="main st.", city=city, postal_code="30601"),
+             Address(street_number="12", route="Oak Ave", city=city, postal_code="30601"),
+             Address(street_number="12", route="OAK  AVENUE", city=city, postal_code="30601"),
+             Address(street_number="14", route="Oak Ave", city=city, postal_code="30601")]
+        )
+        incidents = [IncidentFactory(location=address) for address in legacy]
+        victim = VictimFactory(incident=incidents[0], home_address=legacy[2],
+                               employer_address=legacy[0])
+
+        call_command("dedupe_addresses", "--batch-size=2", stdout=StringIO())
+
+        self.assertFalse(Address.objects.filter(address_key__isnull=True).exists())
+        self.assertEqual(Address.objects.filter(city=city).count(), 3)
+        for incident in incidents:
+            incident.refresh_from_db()
+        self.assertEqual(incidents[0].location_id, keyed.id)
+        self.assertEqual(incidents[1].location_id, legacy[1].id)
+        self.assertEqual(incidents[2].location_id, legacy[1].id)
+        self.assertEqual(incidents[3].location_id, legacy[3].id)
+        victim.refresh_from_db()
+        self.assertEqual(victim.home_address_id, legacy[1].id)
+        self.assertEqual(victim.employer_address_id, keyed.id)
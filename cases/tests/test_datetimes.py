@@ -0,0 +1,69 @@
+import pytz
+from datetime import datetime, timedelta
+from django.test import SimpleTestCase
+from django.utils import timezone
+from cases.datetimes import DateTimeCodec
+
+EASTERN = pytz.timezone("US/Eastern")
+
+
+class DateTimeCodecTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.codec = DateTimeCodec("US/Eastern")
+
+    def reference_encode(self, value: datetime):
+        local = timezone.localtime(value, timezone=EASTERN)
+        return {'date': local.date().strftime("%Y-%m-%d"),
+                'time': local.time().strftime("%H:%M")}
+
+    def test_encode_matches_localtime_across_dst_changes(self):
+        # Every 7 minutes through both 2019 changes, which happen at 07:00 and 06:00 UTC.
+        values = []
+        for start in (datetime(2019, 3, 10, 5), datetime(2019, 11, 3, 4)):
+            values += [pytz.utc.localize(start + timedelta(minutes=7 * step))
+                       for step in range(60)]
+        expected = [self.reference_encode(value) for value in values]
+
+        self.assertEqual([self.codec.encode(value) for value in values], expected)
+        # Again, now from the cached offsets.
+        self.assertEqual([self.codec.encode(value) for value in values], expected)
+        self.assertEqual(self.codec.encode(values[0].astimezone(EASTERN)), expected[0])
+        self.assertIsNone(self.codec.encode(None))
+        with self.assertRaises(ValueError):
+            self.codec.encode(datetime(2019, 3, 1))
+
+    def test_encode_zone_with_half_hour_changes(self):
+        # Lord Howe Island moves its clocks by 30 minutes, at 15:30 UTC on this day.
+        codec = DateTimeCodec("Australia/Lord_Howe")
+        zone = pytz.timezone("Australia/Lord_Howe")
+        values = [pytz.utc.localize(datetime(2019, 10, 5, 14) + timedelta(minutes=10 * step))
+                  for step in range(24)]
+        self.assertEqual([codec.encode(value) for value in values],
+                         [{'date': value.astimezone(zone).strftime("%Y-%m-%d"),
+                           'time': value.astimezone(zone).strftime("%H:%M")}
+                          for value in values])
+
+    def test_decode_localizes(self):
+        decoded = self.codec.decode("2019-07-04", "13:30")
+        self.assertEqual(decoded, EASTERN.localize(datetime(2019, 7, 4, 13, 30)))
+        self.assertEqual(decoded.utcoffset(), timedelta(hours=-4))
+        self.assertEqual(self.codec.decode("1/15/2019", "9:05").utcoffset(), timedelta(hours=-5))
+        self.assertEqual(self.codec.decode("2019-7-4"), EASTERN.localize(datetime(2019, 7, 4)))
+        with self.assertRaises(ValueError):
+            self.codec.decode("20190704", "13:30")
+
+    def test_decode_round_trips_encode(self):
+        values = [pytz.utc.localize(datetime(2019, 1, 1) + timedelta(minutes=97 * step))
+                  for step in range(2000)]
+        for value in values:
+            encoded = self.codec.encode(value)
+            self.assertEqual(self.codec.decode(encoded['date'], encoded['time']), value)
+
+    def test_decode_many(self):
+        pairs = [("2019-03-10", "01:30"), ("2019-03-10", "03:30"), ("2019-03-10", "01:30"),
+                 ("not a date", "01:30"), (None, "01:30")]
+        decoded = self.codec.decode_many(pairs)
+        self.assertEqual(set(decoded), {("2019-03-10", "01:30"), ("2019-03-10", "03:30")})
+        self.assertEqual(decoded[("2019-03-10", "01:30")].utcoffset(), timedelta(hours=-5))
+        self.assertEqual(decoded[("2019-03-10", "03:30")].utcoffset(), timedelta(hours=-4))
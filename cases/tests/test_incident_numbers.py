@@ -0,0 +1,57 @@
+import re
+import threading
+from django.db import connection
+from django.test import TestCase
+from cases.incident_numbers import IncidentNumberAllocator, format_incident_number
+from cases.models import IncidentNumberCounter
+
+NUMBER = re.compile(r"^(\d{2})-(\d{7})$")
+
+
+def sequence_of(number: str) -> int:
+    return int(NUMBER.match(number).group(2))
+
+
+class IncidentNumberAllocatorTestCase(TestCase):
+    # Blocks reserved by other threads are committed, so they outlive each test's
+    # transaction; the assertions are therefore relative to where the counter stood.
+
+    def test_format(self):
+        self.assertEqual(format_incident_number(2019, 1234), "19-0001234")
+        self.assertEqual(format_incident_number(2000, 1), "00-0000001")
+
+    def test_numbers_come_from_reserved_blocks(self):
+        allocator = IncidentNumberAllocator(block_size=5)
+        first = allocator.allocate(count=3, year=2031)
+        second = allocator.allocate(count=4, year=2031)
+
+        sequences = [sequence_of(number) for number in first + second]
+        self.assertTrue(all(number.startswith("31-") for number in first + second))
+        self.assertEqual(sequences, list(range(sequences[0], sequences[0] + 7)))
+        # Two blocks of five were reserved from the counter.
+        counter = IncidentNumberCounter.objects.get(year=2031)
+        self.assertEqual(counter.next_value, sequences[0] + 10)
+
+        self.assertEqual(len(allocator.allocate(count=12, year=2031)), 12)
+
+    def test_concurrent_allocators_never_hand_out_the_same_number(self):
+        # Two allocators stand in for two processes, each with several threads.
+        allocators = [IncidentNumberAllocator(block_size=7) for _ in range(2)]
+        allocated = []
+
+        def allocate(allocator: IncidentNumberAllocator):
+            try:
+                for _ in range(25):
+                    allocated.extend(allocator.allocate(year=2032))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=allocate, args=(allocator,))
+                   for allocator in allocators for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(allocated), 200)
+        self.assertEqual(len(set(allocated)), 200)
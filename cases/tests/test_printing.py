@@ -0,0 +1,277 @@
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from pypdf import PdfReader
+from rest_framework import status
+from cases.printing import IncidentReportPDFGenerator, load_incident_report, load_incident_reports
+from cases.models import Incident, IncidentInvolvedParty
+from cases.report_cache import ReportPDFCache, report_pdfs, report_version
+from cases.tests.factories import (AddressFactory,
+                                   IncidentFactory,
+                                   OffenseFactory,
+                                   SuspectFactory,
+                                   VictimFactory)
+from cases.tests.test_views import JWTAuthAPIBaseTestCase
+
+
+class TemporaryReportCacheMixin:
+    """Points the report cache at a fresh temporary directory for each test."""
+
+    def setUp(self):
+        super(TemporaryReportCacheMixin, self).setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        overridden = override_settings(REPORT_PDF_CACHE_DIR=directory)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        report_pdfs.clear()
+
+
+class PrintReportTestCase(TemporaryReportCacheMixin, JWTAuthAPIBaseTestCase):
+
+    def setUp(self):
+        super(PrintReportTestCase, self).setUp()
+        self.incident = IncidentFactory(incident_number="18-000123")
+        self.incident.offenses.add(OffenseFactory(), OffenseFactory())
+        self.victim = VictimFactory(incident=self.incident)
+        SuspectFactory(incident=self.incident)
+        self.url = reverse("print-report", kwargs={'incident_id': self.incident.id})
+
+    def test_report_is_streamed_from_memory(self):
+        url = reverse("print-report", kwargs={'incident_id': self.incident.id})
+        files_before = set(os.listdir("."))
+        response = self.client.get(url)
+        self.assertEqual(set(os.listdir(".")), files_before)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertEqual(response["Content-Disposition"],
+                         'inline; filename="incident-18-000123.pdf"')
+        content = b"".join(response.streaming_content)
+        self.assertTrue(content.startswith(b"%PDF"))
+        self.assertEqual(int(response["Content-Length"]), len(content))
+
+    def test_unknown_incident_is_not_found(self):
+        url = reverse("print-report", kwargs={'incident_id': self.incident.id + 1})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_reprints_are_served_from_the_cache(self):
+        first = self.client.get(self.url)
+        with mock.patch.object(IncidentReportPDFGenerator, "render") as render:
+            with self.assertNumQueries(1):
+                second = self.client.get(self.url)
+        render.assert_not_called()
+        self.assertEqual(b"".join(second.streaming_content), b"".join(first.streaming_content))
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertEqual(report_pdfs.stats()['hits'], 1)
+
+    def test_conditional_get(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        tomorrow = timezone.now() + timedelta(days=1)
+        with mock.patch("cases.views.timezone.now", return_value=tomorrow):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_changes_are_printed(self):
+        etags = [self.client.get(self.url)["ETag"]]
+        self.victim.first_name = "Renamed"
+        self.victim.save()
+        etags.append(self.client.get(self.url)["ETag"])
+        self.victim.delete()
+        etags.append(self.client.get(self.url)["ETag"])
+        self.assertEqual(len(set(etags)), 3)
+
+        # Officers are printed too, so renaming one is a new version as well.
+        user = self.incident.supervisor.user
+        user.last_name = "Renamed"
+        user.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etags[-1])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn(response["ETag"], etags)
+        self.assertEqual(report_pdfs.stats(), dict(report_pdfs.stats(), hits=0, misses=4))
+
+    def test_deleting_the_latest_party_moves_last_modified_forward(self):
+        earlier = timezone.now() - timedelta(hours=2)
+        Incident.objects.filter(id=self.incident.id).update(updated_timestamp=earlier)
+        IncidentInvolvedParty.objects.filter(incident=self.incident).update(
+            updated_timestamp=earlier
+        )
+        IncidentInvolvedParty.objects.filter(id=self.victim.id).update(
+            updated_timestamp=earlier + timedelta(hours=1)
+        )
+        before = report_version(self.incident.id)
+        self.victim.delete()
+        after = report_version(self.incident.id)
+        self.assertGreater(after.updated, before.updated)
+        self.assertNotEqual(after.token, before.token)
+
+
+@override_settings(BATCH_PRINT_WORKERS=2)
+class BatchPrintTestCase(TemporaryReportCacheMixin, JWTAuthAPIBaseTestCase):
+
+    def setUp(self):
+        super(BatchPrintTestCase, self).setUp()
+        now = timezone.now()
+        self.incidents = [IncidentFactory(beat=7, report_datetime=now - timedelta(days=days))
+                          for days in range(3)]
+        VictimFactory(incident=self.incidents[0])
+        IncidentFactory(beat=8)
+        self.url = reverse("incident-print-reports")
+
+    def test_zip_holds_one_report_per_incident(self):
+        response = self.client.get(self.url, data={'beat': 7})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/zip")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="incidents.zip"')
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+        # Oldest first.
+        self.assertEqual(archive.namelist(), [f"incident-{incident.incident_number}.pdf"
+                                              for incident in reversed(self.incidents)])
+        for name in archive.namelist():
+            self.assertTrue(archive.read(name).startswith(b"%PDF"))
+        self.assertEqual(report_pdfs.stats()['misses'], 3)
+
+        # The single report endpoint serves what the batch rendered, and vice versa.
+        single = self.client.get(reverse("print-report",
+                                         kwargs={'incident_id': self.incidents[0].id}))
+        self.assertEqual(b"".join(single.streaming_content),
+                         archive.read(f"incident-{self.incidents[0].incident_number}.pdf"))
+        with mock.patch("cases.batch_printing._render") as render:
+            b"".join(self.client.get(self.url, data={'beat': 7}).streaming_content)
+        render.assert_not_called()
+        self.assertEqual(report_pdfs.stats()['hits'], 4)
+
+    def test_requests_share_one_pool(self):
+        with mock.patch("cases.batch_printing._pools", {}) as pools:
+            b"".join(self.client.get(self.url, data={'beat': 7}).streaming_content)
+            pool = pools[2]
+            report_pdfs.clear()
+            b"".join(self.client.get(self.url, data={'beat': 7}).streaming_content)
+            self.assertIs(pools[2], pool)
+            self.assertEqual(report_pdfs.stats()['misses'], 3)
+            pool.shutdown()
+
+    def test_merged_pdf_concatenates_the_cached_reports(self):
+        zipped = b"".join(self.client.get(self.url, data={'beat': 7}).streaming_content)
+        with mock.patch("cases.batch_printing._render") as render:
+            response = self.client.get(self.url, data={'beat': 7, 'output': "pdf"})
+            document = b"".join(response.streaming_content)
+        render.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="incidents.pdf"')
+
+        # Oldest first, each report on pages of its own.
+        archive = zipfile.ZipFile(io.BytesIO(zipped))
+        reports = [PdfReader(io.BytesIO(archive.read(name))) for name in archive.namelist()]
+        merged = PdfReader(io.BytesIO(document))
+        self.assertEqual(len(merged.pages), sum(len(report.pages) for report in reports))
+        self.assertEqual(merged.pages[0].extract_text(), reports[0].pages[0].extract_text())
+        self.assertEqual(merged.pages[-1].extract_text(), reports[-1].pages[-1].extract_text())
+
+    def test_invalid_output(self):
+        response = self.client.get(self.url, data={'output': "docx"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('output', response.json())
+
+    @override_settings(BATCH_PRINT_LIMIT=2)
+    def test_limit(self):
+        response = self.client.get(self.url, data={'beat': 7})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("3 match", response.json()['detail'])
+
+
+class IncidentReportTestCase(TestCase):
+
+    def setUp(self):
+        self.incident = IncidentFactory(reviewed_datetime=None)
+        self.offenses = [OffenseFactory(), OffenseFactory(gcic_code=None)]
+        self.incident.offenses.add(*self.offenses)
+        self.victims = [VictimFactory(incident=self.incident, home_address=AddressFactory())
+                        for _ in range(2)]
+        self.suspect = SuspectFactory(incident=self.incident, home_address=None)
+
+    def test_report_is_loaded_in_three_queries(self):
+        with self.assertNumQueries(3):
+            report = load_incident_report(self.incident.id)
+        self.assertEqual(report.supervisor, str(self.incident.supervisor))
+        self.assertEqual(report.location, str(self.incident.location))
+        self.assertEqual([offense.ucr_code for offense in report.offenses],
+                         [offense.ucr_code for offense in self.offenses])
+        self.assertEqual([victim.home_address for victim in report.victims],
+                         [str(victim.home_address) for victim in self.victims])
+        self.assertEqual(report.suspects[0].name, self.suspect.name)
+        self.assertIsNone(report.suspects[0].home_address)
+
+    def test_reports_are_loaded_in_three_queries_in_all(self):
+        other = IncidentFactory()
+        VictimFactory(incident=other)
+        with self.assertNumQueries(3):
+            reports = load_incident_reports([other.id, other.id + 1, self.incident.id])
+        self.assertEqual([report.incident_number for report in reports],
+                         [other.incident_number, self.incident.incident_number])
+        self.assertEqual([len(report.victims) for report in reports], [1, 2])
+        self.assertEqual(reports[1], load_incident_report(self.incident.id))
+
+    def test_drawing_runs_no_queries(self):
+        report = load_incident_report(self.incident.id)
+        with self.assertNumQueries(0):
+            document = IncidentReportPDFGenerator(report).render()
+        self.assertTrue(document.startswith(b"%PDF"))
+
+    def test_reports_render_concurrently(self):
+        incidents = [self.incident] + [IncidentFactory() for _ in range(3)]
+        reports = [load_incident_report(incident.id) for incident in incidents]
+        with ThreadPoolExecutor(max_workers=len(reports)) as executor:
+            documents = list(executor.map(
+                lambda report: IncidentReportPDFGenerator(report).render(), reports
+            ))
+        for document in documents:
+            self.assertTrue(document.startswith(b"%PDF"))
+            self.assertTrue(document.rstrip().endswith(b"%%EOF"))
+        self.assertEqual(len(set(documents)), len(incidents))
+
+
+class ReportPDFCacheTestCase(TemporaryReportCacheMixin, TestCase):
+
+    @override_settings(REPORT_PDF_CACHE_MAX_BYTES=3000)
+    def test_least_recently_used_reports_are_evicted(self):
+        cache = ReportPDFCache()
+        today = date.today()
+        for incident_id in (1, 2, 3):
+            cache.store(incident_id, "v1", today, b"x" * 1000)
+            path = cache._path(incident_id, "v1", today)
+            os.utime(path, (incident_id, incident_id))
+        # Serving the oldest makes it the most recently used.
+        cache.open(1, "v1", today).close()
+        cache.store(4, "v1", today, b"x" * 1000)
+
+        cached = [incident_id for incident_id in (1, 2, 3, 4)
+                  if os.path.exists(cache._path(incident_id, "v1", today))]
+        self.assertEqual(cached, [1, 4])
+        self.assertEqual(cache.stats()['evictions'], 2)
+        self.assertEqual(cache.stats()['size_bytes'], 2000)
+
+    def test_invalidate_forgets_every_version(self):
+        cache = ReportPDFCache()
+        today = date.today()
+        cache.store(1, "v1", today, b"old")
+        cache.store(1, "v2", today, b"new")
+        cache.store(2, "v1", today, b"other")
+        cache.invalidate([1])
+        self.assertIsNone(cache.open(1, "v2", today))
+        with cache.open(2, "v1", today) as document:
+            self.assertEqual(document.read(), b"other")
@@ -53,6 +53,8 @@ class UtilsTestCase(TestCase):
                             month=month,
                             day=day,
                             hour=hour,
-                            minute=minute,
-                            tzinfo=pytz.timezone(settings.TIME_ZONE))
+                            minute=minute)
+        # Localized, rather than given the zone's LMT offset by passing tzinfo.
+        expected = pytz.timezone(settings.TIME_ZONE).localize(expected)
         self.assertEqual(converted, expected)
+        self.assertEqual(converted.utcoffset(), expected.utcoffset())
@@ -1,31 +1,79 @@
+import csv
+import json
 import logging
 import shutil
+import sqlite3
+from collections import OrderedDict
+from datetime import datetime
+from io import StringIO
 from pathlib import Path
+from typing import Dict, List, Tuple
+from unittest import mock
 from django.urls import reverse
 from django.conf import settings
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
+from rest_framework_jwt.settings import api_settings
 from faker import Faker
-from cases.models import (Incident, IncidentInvolvedParty,
-                          IncidentFile)
+from cases.authentication import verified_tokens
+from cases.models import (Address, Incident, IncidentInvolvedParty,
+                          IncidentFile, Offense)
+from cases.caches import geography_cache, offense_catalog, officer_cache
+from cases.conditional import PreconditionFailed
+from cases.flat import flat_incident_serializer
+from cases.pagination import IncidentCursorPagination
+from cases.representations import incident_representations
+from cases.serializers import IncidentSerializer, is_duplicate_incident_number
+from cases.search import search_incidents
 from cases.tests.factories import (OfficerFactory,
                                    OffenseFactory,
                                    IncidentFactory,
                                    AddressFactory,
                                    VictimFactory,
-                                   SuspectFactory)
+                                   SuspectFactory,
+                                   this_timezone)
 from cases.tests.utils import (IncidentDataFaker,
+                               QueryBudgetMixin,
                                generate_jwt_for_tests,
                                generate_random_file_content)
 from cases.constants import (VICTIM, SUSPECT)
 logger = logging.getLogger('cases')
+jwt_decode_handler = api_settings.JWT_DECODE_HANDLER
+
+# Upper bound on queries per request. Clients' tokens are verified in setUp, as they would
+# be after a polling client's first request, so loading the user costs no query.
+# Detail views spend one extra query reading updated_timestamp for conditional GET.
+# A list page spends two more queries rendering incidents missing from the representation
+# cache than it does assembling one entirely from it.
+QUERY_BUDGETS = {"incident-list": 3,
+                 "incident-list-cached": 1,
+                 "incident-list-sparse": 1,
+                 "incident-detail": 3,
+                 "incident-detail-not-modified": 1,
+                 "incident-bulk-create": 15,
+                 "party-bulk-create": 12}
 
 
 class JWTAuthAPIBaseTestCase(APITestCase):
     def setUp(self):
+        # Offenses and officers created by earlier tests were rolled back with their transaction.
+        offense_catalog.clear()
+        officer_cache.clear()
+        geography_cache.clear()
+        # Read the geography cache's shared version, as any process has within the interval.
+        geography_cache.states_in_bulk([])
+        incident_representations.clear()
+        verified_tokens.clear()
         self.user = OfficerFactory().user
         token = generate_jwt_for_tests(self.user)
+        verified_tokens.add(token, jwt_decode_handler(token), self.user, verified_tokens.version())
         self.client = self.client_class(HTTP_AUTHORIZATION=f'Bearer {token}')
         self.faker = IncidentDataFaker(faker=Faker())
 
@@ -41,6 +89,76 @@ class IncidentsTestCase(JWTAuthAPIBaseTestCase):
         response = self.client.post(url, data=data, format="json")
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
+    def test_create_incident_allocates_incident_number(self):
+        url = reverse("incident-list")
+        data = self.faker.generate_entire_incident_data()
+        del data['incident_number']
+
+        numbers = []
+        for _ in range(2):
+            response = self.client.post(url, data=data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            numbers.append(response.data['incident_number'])
+
+        year = timezone.localtime(timezone.now()).year % 100
+        self.assertRegex(numbers[0], rf"^{year:02d}-\d{{7}}$")
+        self.assertEqual(int(numbers[1][3:]), int(numbers[0][3:]) + 1)
+
+    def test_duplicate_incident_number_is_rejected_by_the_constraint(self):
+        existing = IncidentFactory()
+        url = reverse("incident-list")
+        data = self.faker.generate_entire_incident_data()
+        data['incident_number'] = existing.incident_number
+
+        response = self.client.post(url, data=data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('incident_number', response.data)
+        self.assertEqual(Incident.objects.count(), 1)
+
+        url = reverse("incident-detail", kwargs={'pk': IncidentFactory().id})
+        response = self.client.patch(url, data={'incident_number': existing.incident_number},
+                                     format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('incident_number', response.data)
+
+    def test_only_unique_violations_count_as_duplicates(self):
+        existing, other = IncidentFactory(), IncidentFactory()
+        rows = Incident.objects.filter(id=other.id)
+        for value, duplicate in ((existing.incident_number, True), (None, False)):
+            with self.assertRaises(IntegrityError) as raised, transaction.atomic():
+                rows.update(incident_number=value)
+            self.assertEqual(is_duplicate_incident_number(raised.exception), duplicate)
+
+    def test_sqlite_unique_violations_count_as_duplicates(self):
+        database = sqlite3.connect(":memory:")
+        database.execute("CREATE TABLE incident (incident_number TEXT NOT NULL UNIQUE)")
+        database.execute("INSERT INTO incident VALUES ('19-0000001')")
+        for value, duplicate in (("19-0000001", True), (None, False)):
+            with self.assertRaises(IntegrityError) as raised:
+                try:
+                    database.execute("INSERT INTO incident VALUES (?)", [value])
+                except sqlite3.IntegrityError as err:
+                    # As django.db.utils.DatabaseErrorWrapper wraps it.
+                    raise IntegrityError(*err.args) from err
+            self.assertEqual(is_duplicate_incident_number(raised.exception), duplicate)
+
+    def test_create_incident_reuses_existing_address(self):
+        url = reverse("incident-list")
+        first = self.faker.generate_entire_incident_data()
+        first['location'].update(route="Prince Avenue", postal_code="30601")
+        second = self.faker.generate_entire_incident_data()
+        second['incident_number'] = f"{first['incident_number']}-2"
+        second['location'] = dict(first['location'], route=" prince ave. ")
+
+        responses = [self.client.post(url, data=data, format="json") for data in (first, second)]
+
+        self.assertEqual([response.status_code for response in responses],
+                         [status.HTTP_201_CREATED, status.HTTP_201_CREATED])
+        locations = Incident.objects.values_list("location_id", flat=True)
+        self.assertEqual(len(set(locations)), 1)
+        self.assertEqual(Address.objects.get().route, "Prince Avenue")
+
     def test_partial_update_incident(self):
         location = AddressFactory()
         offense = OffenseFactory()
@@ -57,6 +175,50 @@ class IncidentsTestCase(JWTAuthAPIBaseTestCase):
         incident.refresh_from_db()
         self.assertEqual(incident.location.city.state.abbreviation, "GA")
 
+    def test_partial_update_offenses_modes(self):
+        offenses = [OffenseFactory() for _ in range(4)]
+        incident = IncidentFactory()
+        incident.offenses.add(offenses[0], offenses[1])
+        url = reverse("incident-detail", kwargs={'pk': incident.id})
+
+        def patch(offense_ids: List[int], **data) -> List[int]:
+            response = self.client.patch(url, data=dict(data, offenses=offense_ids),
+                                         format="json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return sorted(offense['id'] for offense in response.data['offenses'])
+
+        ids = [offense.id for offense in offenses]
+        self.assertEqual(patch([ids[1], ids[2]]), ids[:3])
+        self.assertEqual(patch([ids[2], ids[3]], offenses_mode="replace"), ids[2:])
+        self.assertEqual(patch([ids[0], ids[3]], offenses_mode="remove"), [ids[2]])
+        self.assertEqual(patch([], offenses_mode="replace"), [])
+        self.assertFalse(incident.offenses.exists())
+
+        response = self.client.patch(url, data={'offenses': [ids[0]], 'offenses_mode': "swap"},
+                                     format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('offenses_mode', response.data)
+
+    def test_partial_update_offenses_query_count_is_independent_of_offense_count(self):
+        offenses = [OffenseFactory() for _ in range(8)]
+        incidents = [IncidentFactory() for _ in range(2)]
+        for incident in incidents:
+            incident.offenses.add(*offenses[:4])
+        offense_catalog.data()  # Load the new offenses before measuring.
+
+        queries = []
+        # Both replace some of the offenses, with one and with four new ones respectively.
+        for incident, replacements in zip(incidents, (offenses[3:5], offenses[2:8])):
+            url = reverse("incident-detail", kwargs={'pk': incident.id})
+            data = {'offenses': [offense.id for offense in replacements],
+                    'offenses_mode': "replace"}
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.patch(url, data=data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data['offenses']), len(replacements))
+            queries.append(len(context.captured_queries))
+        self.assertEqual(queries[0], queries[1])
+
     def test_put_update_incident_returns_not_allowed(self):
         location = AddressFactory()
         offense = OffenseFactory()
@@ -80,6 +242,704 @@ class IncidentsTestCase(JWTAuthAPIBaseTestCase):
         self.assertIsNone(inc)
 
 
+class BulkIncidentCreateTestCase(QueryBudgetMixin, JWTAuthAPIBaseTestCase):
+
+    fixtures = ["states.json"]
+
+    def _generate_batch(self, count: int) -> List[Dict]:
+        batch = []
+        for num in range(count):
+            data = self.faker.generate_entire_incident_data()
+            data['incident_number'] = f"bulk-{count}-{num}"
+            batch.append(data)
+        return batch
+
+    def test_bulk_create_reports_each_item(self):
+        batch = self._generate_batch(count=3)
+        batch[1]['reporting_officer'] = OfficerFactory().id + 1000
+        batch[2]['incident_number'] = IncidentFactory().incident_number
+        url = reverse("incident-bulk-create")
+
+        response = self.client.post(url, data=batch, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['failed'], 2)
+        statuses = [item['status'] for item in response.data['results']]
+        self.assertEqual(statuses, [status.HTTP_201_CREATED,
+                                    status.HTTP_400_BAD_REQUEST,
+                                    status.HTTP_400_BAD_REQUEST])
+        self.assertIn('reporting_officer', response.data['results'][1]['errors'])
+        self.assertIn('incident_number', response.data['results'][2]['errors'])
+
+        incident = Incident.objects.get(incident_number=batch[0]['incident_number'])
+        self.assertEqual(sorted(incident.offenses.values_list("id", flat=True)),
+                         sorted(batch[0]['offenses']))
+        self.assertEqual(incident.location.city.name, batch[0]['location']['city'])
+        self.assertEqual(response.data['results'][0]['data']['id'], incident.id)
+
+    def test_bulk_create_query_count_is_independent_of_batch_size(self):
+        url = reverse("incident-bulk-create")
+        small_batch = self._generate_batch(count=2)
+        large_batch = self._generate_batch(count=8)
+        offense_catalog.data()  # Load the offenses the batches created before measuring.
+
+        with self.assertWithinQueryBudget(QUERY_BUDGETS["incident-bulk-create"]) as small:
+            response = self.client.post(url, data=small_batch, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        with self.assertWithinQueryBudget(QUERY_BUDGETS["incident-bulk-create"]) as large:
+            response = self.client.post(url, data=large_batch, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+        self.assertEqual(Incident.objects.filter(incident_number__startswith="bulk-").count(), 10)
+
+    def test_bulk_create_rejects_non_list(self):
+        url = reverse("incident-bulk-create")
+        response = self.client.post(url, data=self.faker.generate_entire_incident_data(),
+                                    format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class IncidentExportTestCase(JWTAuthAPIBaseTestCase):
+
+    def setUp(self):
+        super(IncidentExportTestCase, self).setUp()
+        offense = OffenseFactory()
+        self.incidents = []
+        for day in (1, 2, 3):
+            incident = IncidentFactory(report_datetime=datetime(2019, 3, day, 12,
+                                                                tzinfo=this_timezone))
+            incident.offenses.add(offense)
+            self.incidents.append(incident)
+
+    def _streamed_lines(self, response) -> List[str]:
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode("utf-8").splitlines()
+
+    def test_export_ndjson_is_flattened(self):
+        response = self.client.get(reverse("incident-export"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in self._streamed_lines(response)]
+        self.assertEqual([row['id'] for row in rows],
+                         [incident.id for incident in self.incidents])
+        incident = self.incidents[0]
+        self.assertEqual(rows[0]['reporting_officer_number'],
+                         int(incident.reporting_officer.officer_number))
+        self.assertEqual(rows[0]['location_city'], incident.location.city.name)
+        self.assertEqual(rows[0]['offense_ids'], [incident.offenses.get().id])
+
+    def test_export_csv_with_report_range(self):
+        response = self.client.get(reverse("incident-export"),
+                                   data={'output': "csv",
+                                         'report_after': "2019-03-02",
+                                         'report_before': "2019-03-03"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = list(csv.DictReader(self._streamed_lines(response)))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['incident_number'], self.incidents[1].incident_number)
+
+    def test_export_rejects_unknown_output_and_bad_dates(self):
+        response = self.client.get(reverse("incident-export"), data={'output': "xml"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse("incident-export"), data={'report_after': "soon"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class IncidentFilterTestCase(JWTAuthAPIBaseTestCase):
+
+    def setUp(self):
+        super(IncidentFilterTestCase, self).setUp()
+        self.offense = OffenseFactory(ucr_code="1300", gcic_code="13-1-1")
+        self.march = IncidentFactory(report_datetime=datetime(2019, 3, 1, 12, tzinfo=this_timezone),
+                                     earliest_occurrence_datetime=datetime(2019, 2, 27,
+                                                                           tzinfo=this_timezone),
+                                     beat=7, shift="D")
+        self.march.offenses.add(self.offense)
+        self.april = IncidentFactory(report_datetime=datetime(2019, 4, 1, 12, tzinfo=this_timezone),
+                                     earliest_occurrence_datetime=datetime(2019, 3, 30,
+                                                                           tzinfo=this_timezone),
+                                     beat=8, shift="N",
+                                     supervisor=self.march.reporting_officer)
+
+    def _filtered_ids(self, **params) -> List[int]:
+        response = self.client.get(reverse("incident-list"), data=params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [incident['id'] for incident in response.data['results']]
+
+    def test_date_range_filters(self):
+        self.assertEqual(self._filtered_ids(report_after="2019-03-15"), [self.april.id])
+        self.assertEqual(self._filtered_ids(report_before="2019-03-15"), [self.march.id])
+        self.assertEqual(self._filtered_ids(occurred_after="2019-02-28",
+                                            occurred_before="2019-04-01"), [self.april.id])
+
+    def test_beat_and_shift_filters(self):
+        self.assertEqual(self._filtered_ids(beat=7), [self.march.id])
+        self.assertEqual(self._filtered_ids(shift="N"), [self.april.id])
+        self.assertEqual(self._filtered_ids(beat=7, shift="N"), [])
+
+    def test_officer_filter_matches_any_officer_role(self):
+        officer = self.march.reporting_officer
+        self.assertEqual(self._filtered_ids(officer=officer.id), [self.april.id, self.march.id])
+        self.assertEqual(self._filtered_ids(officer=self.april.investigating_officer.id),
+                         [self.april.id])
+
+    def test_offense_filter_matches_ucr_or_gcic_code(self):
+        self.march.offenses.add(OffenseFactory(ucr_code="1300"))
+        self.assertEqual(self._filtered_ids(offense="1300"), [self.march.id])
+        self.assertEqual(self._filtered_ids(offense="13-1-1"), [self.march.id])
+        self.assertEqual(self._filtered_ids(offense="9999"), [])
+
+    def test_city_filter(self):
+        self.assertEqual(self._filtered_ids(city=self.april.location.city.name), [self.april.id])
+
+    def test_invalid_filter_values(self):
+        response = self.client.get(reverse("incident-list"),
+                                   data={'beat': "seven", 'shift': "X", 'report_after': "soon"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data), {'beat', 'shift', 'report_after'})
+
+
+class IncidentSearchTestCase(JWTAuthAPIBaseTestCase):
+
+    def setUp(self):
+        super(IncidentSearchTestCase, self).setUp()
+        self.honda = IncidentFactory(narrative="Suspect fled in a red Honda. The red Honda "
+                                               "was later found abandoned.", beat=1)
+        self.robbery = IncidentFactory(narrative="Two robberies near the red barn.", beat=2)
+        self.other = IncidentFactory(narrative="Noise complaint, no action taken.", beat=1)
+
+    def _search(self, **params) -> Dict:
+        response = self.client.get(reverse("incident-search"), data=params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_results_are_ranked_and_highlighted(self):
+        results = self._search(q="red honda")['results']
+        self.assertEqual([result['id'] for result in results], [self.honda.id])
+        self.assertIn("<mark>Honda</mark>", results[0]['headline'])
+
+        results = self._search(q="red")['results']
+        self.assertEqual([result['id'] for result in results], [self.honda.id, self.robbery.id])
+        self.assertGreater(results[0]['rank'], results[1]['rank'])
+
+    def test_words_are_stemmed(self):
+        results = self._search(q="robbery")['results']
+        self.assertEqual([result['id'] for result in results], [self.robbery.id])
+
+    def test_index_follows_updates(self):
+        self.other.narrative = "Stolen Honda recovered."
+        self.other.save()
+        results = self._search(q="honda")['results']
+        self.assertEqual({result['id'] for result in results}, {self.honda.id, self.other.id})
+        self.assertEqual(self._search(q="noise")['results'], [])
+
+    def test_search_combines_with_filters_and_paginates(self):
+        data = self._search(q="red", beat=2)
+        self.assertEqual([result['id'] for result in data['results']], [self.robbery.id])
+
+        data = self._search(q="red", limit=1)
+        self.assertEqual(len(data['results']), 1)
+        self.assertIsNotNone(data['next'])
+        self.assertEqual(len(self.client.get(data['next']).data['results']), 1)
+
+    def test_search_uses_the_index(self):
+        queryset = search_incidents(Incident.objects.all(), "honda")
+        if connection.vendor == "postgresql":
+            # Enough (analyzed) rows for the planner to prefer the index on its own.
+            call_command("seed_incidents", "--count=3000", "--batch-size=1000",
+                         "--officers=20", "--offenses=20", "--cities=5", "--seed=1",
+                         stdout=StringIO())
+            self.assertIn("incident_narrative_search_idx", queryset.explain())
+        self.assertNotIn("LIKE", str(queryset.query))
+
+    def test_search_requires_words(self):
+        response = self.client.get(reverse("incident-search"), data={'q': " ?! "})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class OfficerResolutionTestCase(JWTAuthAPIBaseTestCase):
+
+    def _officer_queries(self, queries: CaptureQueriesContext) -> List[str]:
+        return [query['sql'] for query in queries.captured_queries
+                if 'FROM "officer" ' in query['sql'] and 'WHERE "officer"."' in query['sql']]
+
+    def test_incident_officers_are_resolved_with_one_query_then_cached(self):
+        data = self.faker.generate_entire_incident_data()
+        url = reverse("incident-list")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(self._officer_queries(queries)), 1)
+
+        data['incident_number'] = f"{data['incident_number']}-2"
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self._officer_queries(queries), [])
+
+    def test_patch_resolves_officers_and_rejects_unknown_ones(self):
+        incident = IncidentFactory()
+        url = reverse("incident-detail", kwargs={'pk': incident.id})
+        officer = OfficerFactory()
+
+        response = self.client.patch(url, data={'supervisor': officer.id}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        incident.refresh_from_db()
+        self.assertEqual(incident.supervisor_id, officer.id)
+
+        response = self.client.patch(url, data={'supervisor': officer.id + 1000}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_saved_officers_are_evicted(self):
+        officer = OfficerFactory()
+        self.assertIn(officer.id, officer_cache.in_bulk([officer.id]))
+        officer.delete()
+        self.assertEqual(officer_cache.in_bulk([officer.id]), {})
+
+
+class OffenseTestCase(QueryBudgetMixin, JWTAuthAPIBaseTestCase):
+
+    def setUp(self):
+        super(OffenseTestCase, self).setUp()
+        self.offenses = [OffenseFactory() for _ in range(3)]
+
+    def test_list_is_served_from_the_catalog(self):
+        url = reverse("offense-list")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([offense['id'] for offense in response.json()],
+                         [offense.id for offense in self.offenses])
+
+        # Nothing is loaded once the catalog is warm.
+        with self.assertWithinQueryBudget(0):
+            response = self.client.get(url)
+        self.assertEqual(len(response.json()), len(self.offenses))
+
+        with self.assertWithinQueryBudget(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_catalog_changes_are_visible_immediately(self):
+        url = reverse("offense-list")
+        etag = self.client.get(url)["ETag"]
+        offense = OffenseFactory()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(offense.id, [item['id'] for item in response.json()])
+
+        offense.delete()
+        response = self.client.get(reverse("offense-detail", kwargs={'pk': offense.id}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_retrieve(self):
+        offense = self.offenses[1]
+        response = self.client.get(reverse("offense-detail", kwargs={'pk': offense.id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['ucr_code'], offense.ucr_code)
+
+    def test_incident_offenses_are_resolved_without_queries(self):
+        data = self.faker.generate_entire_incident_data()
+        data['offenses'] = [offense.id for offense in self.offenses]
+        offense_catalog.data()  # Warm the catalog up.
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse("incident-list"), data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # The response still reads the incident's offenses back through the join table.
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'FROM "offense" WHERE' in query['sql']])
+
+        data['offenses'] = [max(offense.id for offense in self.offenses) + 1000]
+        data['incident_number'] = f"{data['incident_number']}-2"
+        response = self.client.post(reverse("incident-list"), data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class IncidentPaginationTestCase(JWTAuthAPIBaseTestCase):
+
+    def setUp(self):
+        super(IncidentPaginationTestCase, self).setUp()
+        # Several incidents share a report time so that ties have to be broken by id.
+        shared_datetime = self.faker.fake.date_time_this_month(tzinfo=this_timezone)
+        self.incidents = [IncidentFactory(report_datetime=shared_datetime) for _ in range(3)]
+        self.incidents += [IncidentFactory() for _ in range(4)]
+        self.expected_ids = [incident.id for incident in
+                             sorted(self.incidents,
+                                    key=lambda inc: (inc.report_datetime, inc.id),
+                                    reverse=True)]
+
+    def _walk(self, url: str, link: str) -> Tuple[List[int], List[str]]:
+        ids, urls = [], []
+        while url:
+            urls.append(url)
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(incident['id'] for incident in response.data['results'])
+            url = response.data[link]
+        return ids, urls
+
+    def test_forward_pages_cover_every_incident_once(self):
+        url = reverse("incident-list") + "?page_size=2"
+        ids, urls = self._walk(url, link="next")
+        self.assertEqual(ids, self.expected_ids)
+        self.assertEqual(len(urls), 4)
+
+    def test_previous_links_walk_back_to_first_page(self):
+        url = reverse("incident-list") + "?page_size=3"
+        _, urls = self._walk(url, link="next")
+        last_page = self.client.get(urls[-1]).data
+        previous_page = self.client.get(last_page['previous']).data
+        self.assertEqual([incident['id'] for incident in previous_page['results']],
+                         self.expected_ids[3:6])
+        first_page = self.client.get(previous_page['previous']).data
+        self.assertEqual([incident['id'] for incident in first_page['results']],
+                         self.expected_ids[:3])
+        self.assertIsNone(first_page['previous'])
+
+    def test_page_size_is_capped(self):
+        with mock.patch.object(IncidentCursorPagination, "max_page_size", 5):
+            response = self.client.get(reverse("incident-list") + "?page_size=1000")
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_invalid_cursor_returns_not_found(self):
+        response = self.client.get(reverse("incident-list") + "?cursor=garbage")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class IncidentQueryBudgetTestCase(QueryBudgetMixin, JWTAuthAPIBaseTestCase):
+
+    def _create_incidents(self, count: int) -> None:
+        for _ in range(count):
+            incident = IncidentFactory()
+            incident.offenses.add(OffenseFactory(), OffenseFactory())
+
+    def test_list_query_count_does_not_grow_with_results(self):
+        url = reverse("incident-list")
+        self._create_incidents(count=2)
+        with self.assertWithinQueryBudget(QUERY_BUDGETS["incident-list"]) as small:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self._create_incidents(count=8)
+        with self.assertWithinQueryBudget(QUERY_BUDGETS["incident-list"]) as large:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_detail_within_query_budget(self):
+        incident = IncidentFactory()
+        incident.offenses.add(OffenseFactory(), OffenseFactory())
+        url = reverse("incident-detail", kwargs={'pk': incident.id})
+        with self.assertWithinQueryBudget(QUERY_BUDGETS["incident-detail"]):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['location']['state'],
+                         incident.location.city.state.abbreviation)
+        self.assertEqual(len(response.data['offenses']), 2)
+
+
+class FlatIncidentListTestCase(QueryBudgetMixin, JWTAuthAPIBaseTestCase):
+    """The list's flat serializer must render exactly what IncidentSerializer does."""
+
+    def setUp(self):
+        super(FlatIncidentListTestCase, self).setUp()
+        supervisor = OfficerFactory()
+        sparse = IncidentFactory(approved_datetime=None, reviewed_datetime=None,
+                                 damaged_amount=None, stolen_amount=None, narrative=None,
+                                 shift="", reporting_officer=OfficerFactory(supervisor=supervisor),
+                                 location=AddressFactory(street_number=None, postal_code=None))
+        full = IncidentFactory(narrative="Caf\u00e9 \"window\" smashed\n\u2014 see <photos>",
+                               supervisor=supervisor)
+        offenses = [OffenseFactory(gcic_code=None), OffenseFactory(), OffenseFactory()]
+        full.offenses.add(*reversed(offenses))
+        sparse.offenses.add(offenses[1])
+        IncidentFactory()
+
+    def _golden(self, queryset) -> bytes:
+        incidents = queryset.with_related().order_by("-report_datetime", "-id")
+        return JSONRenderer().render(OrderedDict([
+            ('next', None),
+            ('previous', None),
+            ('results', IncidentSerializer(incidents, many=True).data),
+        ]))
+
+    def test_list_is_byte_for_byte_the_serializer_output(self):
+        url = reverse("incident-list")
+        with self.assertWithinQueryBudget(QUERY_BUDGETS["incident-list"]):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, self._golden(Incident.objects.all()))
+        # An empty fields parameter selects every field, through IncidentSerializer.
+        self.assertEqual(self.client.get(url + "?fields=").content, response.content)
+
+        response = self.client.get(url + "?shift=E")
+        self.assertEqual(response.content, self._golden(Incident.objects.filter(shift="E")))
+
+    def test_flat_serializer_matches_for_every_incident(self):
+        queryset = Incident.objects.order_by("-report_datetime", "-id")
+        flat = flat_incident_serializer.to_representation(
+            list(flat_incident_serializer.select(queryset))
+        )
+        expected = IncidentSerializer(queryset.with_related(), many=True).data
+        self.assertEqual(JSONRenderer().render(flat), JSONRenderer().render(expected))
+        self.assertEqual(flat_incident_serializer.to_representation([]), [])
+
+    def test_offenses_are_read_with_the_incidents(self):
+        # Offenses created or edited by another process, without this one's catalog knowing.
+        created_elsewhere = OffenseFactory()
+        Offense.objects.filter(id=created_elsewhere.id).update(ucr_code="Z9")
+        incident = Incident.objects.order_by("id").first()
+        incident.offenses.add(created_elsewhere)
+
+        rows = list(flat_incident_serializer.select(Incident.objects.filter(id=incident.id)))
+        offenses = flat_incident_serializer.to_representation(rows)[0]['offenses']
+        self.assertIn(("Z9", created_elsewhere.id),
+                      [(offense['ucr_code'], offense['id']) for offense in offenses])
+
+
+class IncidentRepresentationCacheTestCase(QueryBudgetMixin, JWTAuthAPIBaseTestCase):
+
+    def setUp(self):
+        super(IncidentRepresentationCacheTestCase, self).setUp()
+        self.offense = OffenseFactory()
+        self.incident = IncidentFactory()
+        self.incident.offenses.add(self.offense, OffenseFactory())
+        IncidentFactory()
+        self.url = reverse("incident-list")
+
+    def _listed(self) -> Dict:
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return next(item for item in response.json()['results']
+                    if item['id'] == self.incident.id)
+
+    def test_warm_list_is_assembled_from_the_cache(self):
+        cold = self.client.get(self.url)
+        with self.assertWithinQueryBudget(QUERY_BUDGETS["incident-list-cached"]):
+            warm = self.client.get(self.url)
+        self.assertEqual(warm.content, cold.content)
+        self.assertEqual(incident_representations.stats(), {'hits': 2, 'misses': 2})
+
+    def test_edits_are_never_served_stale(self):
+        self._listed()
+        detail = reverse("incident-detail", kwargs={'pk': self.incident.id})
+        self.client.patch(detail, data={'beat': 42}, format="json")
+        self.assertEqual(self._listed()['beat'], 42)
+
+        self.incident.offenses.remove(self.offense)
+        self.assertNotIn(self.offense.id, [item['id'] for item in self._listed()['offenses']])
+
+    def test_changes_to_embedded_rows_invalidate(self):
+        self._listed()
+        user = self.incident.reporting_officer.user
+        user.first_name = "Renamed"
+        user.save()
+        self.assertEqual(self._listed()['reporting_officer']['user']['first_name'], "Renamed")
+
+        location = self.incident.location
+        location.route = "Moved Street"
+        location.save()
+        self.assertEqual(self._listed()['location']['route'], "Moved Street")
+
+        self.offense.ucr_subclass_description = "Reclassified"
+        self.offense.save()
+        self.assertIn("Reclassified", [item['ucr_subclass_description']
+                                       for item in self._listed()['offenses']])
+
+    def test_logging_in_keeps_the_cache(self):
+        self._listed()
+        user = self.incident.reporting_officer.user
+        user.last_login = timezone.now()
+        user.save(update_fields=["last_login"])
+        self._listed()
+        self.assertEqual(incident_representations.stats()['misses'], 2)
+
+    def test_other_renderings_decode_the_cached_page(self):
+        compact = self.client.get(self.url)
+        indented = self.client.get(self.url, HTTP_ACCEPT="application/json; indent=2")
+        self.assertIn(b"\n  ", indented.content)
+        self.assertEqual(json.loads(indented.content), json.loads(compact.content))
+
+
+class IncidentSparseFieldsetTestCase(QueryBudgetMixin, JWTAuthAPIBaseTestCase):
+
+    def setUp(self):
+        super(IncidentSparseFieldsetTestCase, self).setUp()
+        self.incident = IncidentFactory()
+        self.offense = OffenseFactory()
+        self.incident.offenses.add(self.offense)
+
+    def test_fields_prunes_top_level_and_nested_fields(self):
+        url = (reverse("incident-list") +
+               "?fields=incident_number,report_datetime,beat,shift,"
+               "reporting_officer.officer_number")
+        with self.assertWithinQueryBudget(QUERY_BUDGETS["incident-list-sparse"]):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        incident_data = response.data['results'][0]
+        self.assertEqual(set(incident_data.keys()),
+                         {"incident_number", "report_datetime", "beat",
+                          "shift", "reporting_officer"})
+        self.assertEqual(dict(incident_data['reporting_officer']),
+                         {"officer_number": int(self.incident.reporting_officer.officer_number)})
+
+    def test_empty_expand_collapses_relations_to_ids(self):
+        url = reverse("incident-detail", kwargs={'pk': self.incident.id}) + "?expand="
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['reporting_officer'], self.incident.reporting_officer_id)
+        self.assertEqual(response.data['location'], self.incident.location_id)
+        self.assertEqual(response.data['offenses'], [self.offense.id])
+        self.assertEqual(response.data['narrative'], self.incident.narrative)
+
+    def test_expand_keeps_listed_relations_nested(self):
+        url = reverse("incident-detail", kwargs={'pk': self.incident.id}) + "?expand=location"
+        response = self.client.get(url)
+        self.assertEqual(response.data['location']['route'], self.incident.location.route)
+        self.assertEqual(response.data['supervisor'], self.incident.supervisor_id)
+
+    def test_fields_ignored_on_partial_update(self):
+        url = reverse("incident-detail", kwargs={'pk': self.incident.id}) + "?fields=beat"
+        response = self.client.patch(url, data={'beat': 12}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("narrative", response.data)
+
+
+class ConditionalGetTestCase(QueryBudgetMixin, JWTAuthAPIBaseTestCase):
+
+    def setUp(self):
+        super(ConditionalGetTestCase, self).setUp()
+        self.incident = IncidentFactory()
+        self.url = reverse("incident-detail", kwargs={'pk': self.incident.id})
+
+    def test_matching_etag_returns_not_modified_without_serializing(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+
+        with self.assertWithinQueryBudget(QUERY_BUDGETS["incident-detail-not-modified"]):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+    def test_etag_changes_after_update(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.patch(self.url, data={'beat': 42}, format="json")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_changes_after_an_embedded_row_changes(self):
+        etag = self.client.get(self.url)['ETag']
+        officer = self.incident.supervisor
+        officer.officer_number = 999999
+        officer.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        # Still good for writes, which only conflict with changes to the incident itself.
+        response = self.client.patch(self.url, data={'beat': 43}, format="json",
+                                     HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_sparse_fieldsets_have_their_own_etag(self):
+        full_etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url + "?fields=beat", HTTP_IF_NONE_MATCH=full_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], full_etag)
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_nested_list_etag_changes_when_party_added(self):
+        url = reverse("victim-list", kwargs={'incidents_pk': self.incident.id})
+        VictimFactory(incident=self.incident)
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        VictimFactory(incident=self.incident)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+
+    def test_missing_incident_still_returns_not_found(self):
+        url = reverse("incident-detail", kwargs={'pk': self.incident.id + 1000})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.patch(url, data={'beat': 1}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_if_match_rejects_stale_edits(self):
+        etag = self.client.get(self.url + "?fields=beat")['ETag']
+        response = self.client.patch(self.url, data={'beat': 41}, format="json",
+                                     HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        new_etag = response['ETag']
+        self.assertEqual(self.client.get(self.url)['ETag'], new_etag)
+
+        # A second client still holding the old ETag must not overwrite the first edit.
+        response = self.client.patch(self.url, data={'beat': 42}, format="json",
+                                     HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        response = self.client.patch(self.url, data={'beat': 42}, format="json",
+                                     HTTP_IF_MATCH=f"W/{new_etag}")
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.incident.refresh_from_db()
+        self.assertEqual(self.incident.beat, 41)
+
+        response = self.client.patch(self.url, data={'beat': 43}, format="json",
+                                     HTTP_IF_MATCH=f'"other", {new_etag}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.patch(self.url, data={'beat': 44}, format="json",
+                                     HTTP_IF_MATCH="*")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_update_is_conditional_and_writes_only_changed_columns(self):
+        etag = self.client.get(self.url)['ETag']
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(self.url, data={'beat': 41, 'shift': self.incident.shift},
+                                         format="json", HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        updates = [query['sql'] for query in context.captured_queries
+                   if query['sql'].startswith('UPDATE "incident"')]
+        self.assertEqual(len(updates), 1)
+        assignments, condition = updates[0].split(" WHERE ")
+        self.assertEqual(assignments.count(" = "), 2)
+        self.assertIn('"beat" = 41', assignments)
+        self.assertIn('"updated_timestamp"', condition)
+
+    def test_edit_between_read_and_write_fails(self):
+        incident = Incident.objects.get(id=self.incident.id)
+        read_at = incident.updated_timestamp
+        Incident.objects.filter(id=incident.id).update(beat=7, updated_timestamp=timezone.now())
+
+        serializer = IncidentSerializer(incident, data={'beat': 8}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        with self.assertRaises(PreconditionFailed):
+            serializer.update(incident, serializer.validated_data, expected_updated=read_at)
+        self.assertEqual(Incident.objects.get(id=incident.id).beat, 7)
+
+    def test_deleted_between_read_and_write_is_not_found(self):
+        incident = Incident.objects.get(id=self.incident.id)
+        Incident.objects.filter(id=incident.id).delete()
+
+        serializer = IncidentSerializer(incident, data={'beat': 8}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        with self.assertRaises(NotFound):
+            serializer.update(incident, serializer.validated_data)
+
+
 class VictimTestCase(JWTAuthAPIBaseTestCase):
 
     fixtures = ["states.json"]
@@ -99,6 +959,70 @@ class VictimTestCase(JWTAuthAPIBaseTestCase):
         self.assertEqual(victims.first().first_name, data['first_name'])
         self.assertEqual(victims.first().last_name, data['last_name'])
 
+    def test_create_victims_in_bulk(self):
+        incident = IncidentFactory()
+        officer = OfficerFactory()
+        batch = [self.faker.generate_involved_party(party_type=VICTIM,
+                                                    incident=incident,
+                                                    officer_signed=officer)
+                 for _ in range(4)]
+        batch[0]['home_address'] = self.faker.generate_address()
+        batch[0]['employer'] = self.faker.fake.company()
+        batch[0]['employer_address'] = self.faker.generate_address()
+        url = reverse("victim-list", kwargs={'incidents_pk': str(incident.pk)})
+
+        response = self.client.post(url, data=batch, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), len(batch))
+        victims = IncidentInvolvedParty.objects.filter(incident=incident,
+                                                       party_type=VICTIM).order_by("id")
+        self.assertEqual([victim.last_name for victim in victims],
+                         [data['last_name'] for data in batch])
+        self.assertEqual(victims[0].home_address.city.name, batch[0]['home_address']['city'])
+        self.assertEqual(victims[0].employer_address.route, batch[0]['employer_address']['route'])
+        self.assertEqual(response.data[0]['id'], victims[0].id)
+
+    def test_create_victims_in_bulk_shares_repeated_addresses(self):
+        incident = IncidentFactory()
+        officer = OfficerFactory()
+        existing = AddressFactory()
+        address = {'street_number': existing.street_number, 'route': existing.route.upper(),
+                   'city': existing.city.name, 'state': existing.city.state.abbreviation,
+                   'postal_code': existing.postal_code}
+        batch = [dict(self.faker.generate_involved_party(party_type=VICTIM,
+                                                         incident=incident,
+                                                         officer_signed=officer),
+                      home_address=address, employer_address=self.faker.generate_address())
+                 for _ in range(3)]
+        batch[2]['employer_address'] = batch[1]['employer_address']
+        url = reverse("victim-list", kwargs={'incidents_pk': str(incident.pk)})
+
+        response = self.client.post(url, data=batch, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        victims = IncidentInvolvedParty.objects.filter(incident=incident).order_by("id")
+        self.assertEqual({victim.home_address_id for victim in victims}, {existing.id})
+        self.assertEqual(victims[1].employer_address_id, victims[2].employer_address_id)
+        self.assertNotEqual(victims[0].employer_address_id, victims[1].employer_address_id)
+
+    def test_create_victims_in_bulk_is_all_or_nothing(self):
+        incident = IncidentFactory()
+        officer = OfficerFactory()
+        batch = [self.faker.generate_involved_party(party_type=VICTIM,
+                                                    incident=incident,
+                                                    officer_signed=officer)
+                 for _ in range(3)]
+        batch[2]['officer_signed'] = officer.id + 1000
+        url = reverse("victim-list", kwargs={'incidents_pk': str(incident.pk)})
+
+        response = self.client.post(url, data=batch, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('officer_signed', response.data[2])
+        self.assertFalse(IncidentInvolvedParty.objects.filter(incident=incident).exists())
+
     def test_partial_update_victim_basic_happy_path(self):
         victim = VictimFactory()
         data = {'first_name': self.faker.fake.first_name()}
@@ -131,7 +1055,7 @@ class VictimTestCase(JWTAuthAPIBaseTestCase):
         self.assertEqual(victims.count(), 0)
 
 
-class SuspectTestCase(JWTAuthAPIBaseTestCase):
+class SuspectTestCase(QueryBudgetMixin, JWTAuthAPIBaseTestCase):
 
     fixtures = ["states.json"]
 
@@ -150,6 +1074,33 @@ class SuspectTestCase(JWTAuthAPIBaseTestCase):
         self.assertEqual(suspects.first().first_name, data['first_name'])
         self.assertEqual(suspects.first().last_name, data['last_name'])
 
+    def test_create_suspects_in_bulk_query_count_is_independent_of_batch_size(self):
+        incident = IncidentFactory()
+        url = reverse("suspect-list", kwargs={'incidents_pk': str(incident.pk)})
+
+        def generate_batch(count: int) -> List[Dict]:
+            batch = []
+            for _ in range(count):
+                data = self.faker.generate_involved_party(party_type=SUSPECT,
+                                                          incident=incident,
+                                                          officer_signed=OfficerFactory())
+                data['home_address'] = self.faker.generate_address()
+                batch.append(data)
+            return batch
+
+        small_batch = generate_batch(count=2)
+        large_batch = generate_batch(count=8)
+        with self.assertWithinQueryBudget(QUERY_BUDGETS["party-bulk-create"]) as small:
+            response = self.client.post(url, data=small_batch, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        with self.assertWithinQueryBudget(QUERY_BUDGETS["party-bulk-create"]) as large:
+            response = self.client.post(url, data=large_batch, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+        suspects = IncidentInvolvedParty.objects.filter(incident=incident, party_type=SUSPECT)
+        self.assertEqual(suspects.count(), 10)
+
     def test_partial_update_victim_basic_happy_path(self):
         suspect = SuspectFactory()
         data = {'first_name': self.faker.fake.first_name()}
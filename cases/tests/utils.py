@@ -1,12 +1,15 @@
 import os
 import random
 import logging
+from contextlib import contextmanager
 from typing import (Dict,
                     List,
                     Any,
                     Tuple)
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework_jwt.settings import api_settings
 from faker import Faker
 from cases.models import Incident, Officer
@@ -35,6 +38,25 @@ def generate_jwt_for_tests(user: User):
     return jwt_encode_handler(payload)
 
 
+class QueryBudgetMixin:
+    """
+    Test case mixin for asserting that a block of code stays within a fixed number of
+    database queries. Budgets are upper bounds rather than exact counts, and a failure
+    lists every query that was executed so the offending N+1 is easy to spot.
+    """
+
+    @contextmanager
+    def assertWithinQueryBudget(self, budget: int):
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        executed = len(context.captured_queries)
+        if executed > budget:
+            queries = "\n".join(f"{num}. {query['sql']}"
+                                 for num, query in enumerate(context.captured_queries,
+                                                             start=1))
+            self.fail(f"{executed} queries executed, budget was {budget}:\n{queries}")
+
+
 class IncidentDataFaker:
     def __init__(self, faker: Faker) -> None:
         self.fake = faker
@@ -22,4 +22,5 @@ urlpatterns = [
     path('api/', include(router.urls)),
     path('api/', include(incidents_router.urls)),
     path('api/incidents/print/<int:incident_id>/', views.print_report, name="print-report"),
+    path('api/cache-stats/', views.cache_stats, name="cache-stats"),
 ]
@@ -1,71 +1,91 @@
 import re
 import logging
-import pytz
 
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, Iterable, Tuple, Set, List
 from datetime import datetime
-from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models.signals import m2m_changed
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework import status
 from rest_framework.request import Request
 from rest_framework.response import Response
 
-from cases.models import (Officer, Address,
-                          City, State)
+from cases.models import Officer, Address, City, Incident, Offense
+from cases.caches import geography_cache, officer_cache
+from cases.datetimes import local_datetimes
+from cases.constants import OFFENSES_APPEND, OFFENSES_REMOVE, OFFENSES_REPLACE
 
 date_format = re.compile(r"\d{4}-\d{2}-\d{2}")
 logger = logging.getLogger('cases')
 
 
-def _parse_date_portion(raw_date_str: str) -> Tuple[int, int, int]:
-    if "-" in raw_date_str:
-        date_parts = raw_date_str.split("-")
-        year = int(date_parts[0])
-        month = int(date_parts[1])
-        day = int(date_parts[2])
-    elif "/" in raw_date_str:
-        date_parts = raw_date_str.split("/")
-        year = int(date_parts[2])
-        month = int(date_parts[0])
-        day = int(date_parts[1])
-    else:
-        logger.error(f'Attempted to parse the raw date string {raw_date_str}, but no valid '
-                     f'delimiter was found.')
-        raise ValueError(f"{raw_date_str} does not contain a valid delimiter.")
-
-    return year, month, day
-
-
-def _parse_time_portion(raw_time_str: str) -> Tuple[int, int]:
-    hours = 0
-    minutes = 0
-    if ':' in raw_time_str:
-        time_parts = raw_time_str.split(':')
-        hours = int(time_parts[0])
-        minutes = int(time_parts[1])
-
-    return hours, minutes
-
-
 def convert_date_string_to_object(date_string: str) -> datetime:
     """
     Do our best to parse a string which (in theory) represents a date,
     and convert it to a python object.
-    :param date_string: The string to convert
-    :return: Python datetime object.
+    :param date_string: The string to convert, e.g. "2019-03-01 13:30" or "3/1/2019"
+    :return: Python datetime object, in settings.TIME_ZONE.
     """
 
     if date_string.strip():
         parts = date_string.split()
-        year, month, day = _parse_date_portion(raw_date_str=parts[0])
-        hours, minutes = _parse_time_portion(raw_time_str=parts[-1])
+        return local_datetimes.decode(date_string=parts[0],
+                                      time_string=parts[-1] if len(parts) > 1 else "")
+
 
-        date_object = datetime(year=year,
-                               month=month,
-                               day=day,
-                               hour=hours,
-                               minute=minutes,
-                               tzinfo=pytz.timezone(settings.TIME_ZONE))
-        return date_object
+def parse_field_tree(fields_param: str) -> Dict[str, Dict]:
+    """
+    Turns a comma separated list of (possibly dotted) field names into a nested dict,
+    e.g. "beat,reporting_officer.officer_number" becomes
+    {'beat': {}, 'reporting_officer': {'officer_number': {}}}.
+    An empty dict means "every field of this node".
+    :param fields_param: The raw value of the `fields` query parameter.
+    :return: The requested fields as a tree.
+    """
+    tree = {}
+    for path in fields_param.split(","):
+        node = tree
+        for name in path.strip().split("."):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+def parse_sparse_fieldset(query_params: Dict[str, str]) -> Tuple[Optional[Dict[str, Dict]],
+                                                                 Optional[Set[str]]]:
+    """
+    Reads the `fields` and `expand` query parameters.
+    :param query_params: The request's query parameters.
+    :return: A tuple of (field tree, expanded relation names). Either is None when the
+             corresponding parameter was not supplied.
+    """
+    fields = None
+    expand = None
+    if "fields" in query_params:
+        fields = parse_field_tree(query_params["fields"])
+    if "expand" in query_params:
+        expand = {name.strip() for name in query_params["expand"].split(",") if name.strip()}
+    return fields, expand
+
+
+def parse_datetime_param(value: str) -> datetime:
+    """
+    Parses an ISO 8601 date or date time received as a query or command line parameter.
+    A bare date means midnight, and naive values are taken to be in settings.TIME_ZONE.
+    :param value: e.g. "2019-03-01" or "2019-03-01T13:30:00-05:00"
+    :return: An aware datetime.
+    :raises ValueError: If the value is neither a date nor a date time.
+    """
+    parsed = parse_datetime(value)
+    if parsed is None:
+        parsed_date = parse_date(value)
+        if parsed_date is None:
+            raise ValueError(f"{value} is not an ISO 8601 date or date time.")
+        parsed = datetime(parsed_date.year, parsed_date.month, parsed_date.day)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
 
 
 def isincident_field(field_name: str) -> bool:
@@ -101,29 +121,144 @@ def create_incident_involved_party(request: Request, serializer_class,
                     data=resp_data)
 
 
+def get_or_create_address(city: City, street_number: Optional[str] = None,
+                          route: Optional[str] = None,
+                          postal_code: Optional[str] = None) -> Address:
+    """
+    Returns the existing Address that normalizes to the same key as the given parts, or
+    saves a new one. The unique address_key makes this safe against concurrent writers.
+    :param city: The address' city, with its state.
+    :return: The saved Address.
+    """
+    key = Address.make_key(street_number, route, city.name, city.state.abbreviation, postal_code)
+    address = Address.objects.filter(address_key=key).first()
+    if address is not None:
+        return address
+
+    address = Address(street_number=street_number, route=route,
+                      city=city, postal_code=postal_code)
+    try:
+        with transaction.atomic():
+            address.save()
+    except IntegrityError:
+        # Another request saved the same address since we looked.
+        return Address.objects.get(address_key=key)
+    logger.debug(f"Created a new address: {address}")
+    return address
+
+
 def parse_and_create_address(address_data: Dict[str, str]) -> Address:
     # TODO: Validation
-    abbr = address_data.pop("state")
+    state = geography_cache.state(address_data.pop("state"))
     address_data.pop("country", None)
-    state, created = State.objects.get_or_create(abbreviation=abbr,
-                                                 defaults={'name': address_data.get("state", ""),
-                                                           'abbreviation': abbr})
-    if created:
-        logger.debug(f"Created new state: {state}")
-    # state.save()
-    city = City(name=address_data.pop("city"),
-                state=state)
-    city.save()
-    address_data['city'] = city
-    address = Address(**address_data)
-    address.save()
+    city = geography_cache.city(address_data.pop("city"), state)
+    address = get_or_create_address(city=city, **address_data)
     logger.debug(f"Address object: {address}")
     return address
 
 
+def bulk_create_addresses(address_data: List[Dict[str, str]]) -> List[Address]:
+    """
+    Set based counterpart to parse_and_create_address: resolves the states and cities of
+    every address at once through the geography cache, looks the addresses up by their
+    address_key with one query, and bulk inserts whichever are new.
+    :param address_data: Dicts with street_number, route, city, state, and postal_code keys.
+    :return: Saved Address objects, in the same order as address_data. Repeated addresses
+             share the same object.
+    """
+    if not address_data:
+        return []
+
+    states = geography_cache.states_in_bulk(data["state"] for data in address_data)
+    cities = geography_cache.cities_in_bulk((data["city"], states[data["state"]])
+                                            for data in address_data)
+
+    keys = []
+    candidates = {}
+    for data in address_data:
+        city = cities[(data["city"], states[data["state"]].id)]
+        address = Address(street_number=data.get("street_number"),
+                          route=data.get("route"),
+                          city=city,
+                          postal_code=data.get("postal_code"))
+        address.address_key = address.compute_key()
+        keys.append(address.address_key)
+        candidates.setdefault(address.address_key, address)
+
+    saved = Address.objects.select_related("city__state")
+    addresses = {address.address_key: address
+                 for address in saved.filter(address_key__in=candidates.keys())}
+    new_addresses = [address for key, address in candidates.items() if key not in addresses]
+    if new_addresses:
+        # Rows inserted concurrently are skipped here and picked up by the query below.
+        Address.objects.bulk_create(new_addresses, ignore_conflicts=True)
+        new_keys = [address.address_key for address in new_addresses]
+        addresses.update((address.address_key, address)
+                         for address in saved.filter(address_key__in=new_keys))
+    return [addresses[key] for key in keys]
+
+
+def apply_offense_changes(incident: Incident, offenses: Iterable[Offense],
+                          mode: str = OFFENSES_APPEND,
+                          current: Optional[Set[int]] = None) -> Tuple[Set[int], Set[int]]:
+    """
+    Applies a list of offenses to an incident with a fixed number of queries, whatever the
+    number of offenses: one to read the current offense IDs (none if they were
+    prefetched), one bulk insert into the through table, and one delete. m2m_changed is
+    sent just as Incident.offenses.add and .remove would send it.
+    :param incident: The saved incident to change.
+    :param offenses: The offenses given by the API client.
+    :param mode: OFFENSES_APPEND adds the offenses, OFFENSES_REPLACE makes them the
+                 incident's only offenses, and OFFENSES_REMOVE removes them.
+    :param current: The incident's current offense IDs, if already known, e.g. the empty
+                    set for a new incident. Otherwise they are taken from the prefetched
+                    offenses, or read from the database.
+    :return: The IDs of the offenses that were added, and of those that were removed.
+    """
+    through = Incident.offenses.through
+    prefetched = getattr(incident, "_prefetched_objects_cache", {}).get("offenses")
+    if current is None and prefetched is not None:
+        current = {offense.id for offense in prefetched}
+    if current is None:
+        current = set(through.objects.filter(incident_id=incident.id)
+                                     .values_list("offense_id", flat=True))
+    given = {offense.id for offense in offenses}
+    if mode == OFFENSES_APPEND:
+        added, removed = given - current, set()
+    elif mode == OFFENSES_REPLACE:
+        added, removed = given - current, current - given
+    elif mode == OFFENSES_REMOVE:
+        added, removed = set(), given & current
+    else:
+        raise ValueError(f"Unknown offenses mode: {mode}")
+
+    def send(action: str, pk_set: Set[int]) -> None:
+        m2m_changed.send(sender=through, action=action, instance=incident, reverse=False,
+                         model=Offense, pk_set=pk_set, using=through.objects.db)
+
+    if removed:
+        send("pre_remove", removed)
+        through.objects.filter(incident_id=incident.id, offense_id__in=removed).delete()
+        send("post_remove", removed)
+    if added:
+        send("pre_add", added)
+        through.objects.bulk_create([through(incident_id=incident.id, offense_id=offense_id)
+                                     for offense_id in sorted(added)])
+        send("post_add", added)
+    if added or removed:
+        # As the related manager would, forget offenses prefetched before the change.
+        getattr(incident, "_prefetched_objects_cache", {}).pop("offenses", None)
+    return added, removed
+
+
 def handle_incident_foreign_keys_for_creation(validated_data):
-    for field in validated_data.keys():
-        if "officer" in field or "supervisor" in field:
-            validated_data[field] = Officer.objects.get(officer_number=validated_data[field])
+    fields = [field for field in validated_data.keys()
+              if "officer" in field or "supervisor" in field]
+    officers = officer_cache.in_bulk_by_number(int(validated_data[field]) for field in fields)
+    for field in fields:
+        try:
+            validated_data[field] = officers[int(validated_data[field])]
+        except KeyError:
+            raise Officer.DoesNotExist(f"No officer with number {validated_data[field]}")
 
     return validated_data
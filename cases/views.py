@@ -1,14 +1,24 @@
 import logging
 
-from typing import Any
-from collections import namedtuple
+from io import BytesIO
+from typing import Any, Dict, Optional, Tuple
+from datetime import datetime
+from collections import OrderedDict, namedtuple
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.http import HttpResponse
+from django.db import IntegrityError
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, action, permission_classes
+from rest_framework.permissions import IsAdminUser
 from rest_framework import viewsets
+from rest_framework.generics import get_object_or_404
 
 from cases.models import (Officer,
                           Offense,
@@ -20,11 +30,24 @@ from cases.serializers import (OfficerSerializer,
                                IncidentSerializer,
                                IncidentInvolvedPartySerializer,
                                IncidentFileSerializer,
+                               IncidentSearchResultSerializer,
                                UserSerializer)
 from cases.utils import (create_incident_involved_party,
-                         convert_date_string_to_object)
+                         convert_date_string_to_object,
+                         parse_sparse_fieldset)
 from cases.constants import VICTIM, SUSPECT
-from cases.printing import IncidentReportPDFGenerator
+from cases.printing import IncidentReportPDFGenerator, report_file_name
+from cases.pagination import IncidentCursorPagination, IncidentSearchPagination
+from cases.authentication import verified_credentials, verified_tokens
+from cases.caches import geography_cache, offense_catalog, officer_cache
+from cases.conditional import (ConditionalGetMixin, PreconditionFailed, if_match_satisfied,
+                               make_etag, timestamp_token)
+from cases.filters import IncidentFilterBackend
+from cases.report_cache import report_pdfs, report_version
+from cases.representations import (VERSION_COLUMNS, PrerenderedResponse,
+                                   incident_representations, render_page)
+from cases.search import SearchUnavailable, search_incidents
+from cases import batch_printing, bulk, export
 
 logger = logging.getLogger('cases')
 ContextFile = namedtuple("ContextFile", ["url", "display_name"])
@@ -42,16 +65,88 @@ class OfficerViewSet(viewsets.ModelViewSet):
 
 
 class OffenseViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Served from the in-memory offense catalog: the list is rendered once per catalog
+    version and both actions answer If-None-Match without touching the database, other
+    than the catalog's periodic version check.
+    """
     queryset = Offense.objects.all()
     serializer_class = OffenseSerializer
 
+    def _not_modified(self, request, etag: str):
+        return get_conditional_response(request, etag=etag)
 
-class IncidentViewSet(viewsets.ModelViewSet):
-    queryset = Incident.objects.all().order_by("-report_datetime")
+    def list(self, request, *args, **kwargs):
+        etag = make_etag("offenses", offense_catalog.version)
+        response = self._not_modified(request, etag)
+        if response is None:
+            if isinstance(request.accepted_renderer, JSONRenderer):
+                response = HttpResponse(offense_catalog.rendered(),
+                                        content_type="application/json")
+            else:
+                response = Response(offense_catalog.data())
+        response["ETag"] = etag
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            offense_id = int(kwargs[self.lookup_field])
+            data = offense_catalog.data(offense_id)
+        except (KeyError, ValueError):
+            raise Http404
+        etag = make_etag("offenses", offense_id, offense_catalog.version)
+        response = self._not_modified(request, etag) or Response(data)
+        response["ETag"] = etag
+        return response
+
+
+class IncidentViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Incident.objects.with_related().order_by("-report_datetime")
     serializer_class = IncidentSerializer
+    pagination_class = IncidentCursorPagination
+    filter_backends = (IncidentFilterBackend,)
+    conditional_list = False
+
+    def _get_sparse_fieldset(self):
+        """Sparse fieldsets only apply to reads; writes always use the full serializer."""
+        if self.request is None or self.request.method not in ("GET", "HEAD"):
+            return None, None
+        return parse_sparse_fieldset(self.request.query_params)
+
+    def get_queryset(self):
+        fields, expand = self._get_sparse_fieldset()
+        return (Incident.objects.with_related(fields=fields, expand=expand)
+                                .order_by("-report_datetime"))
+
+    def get_serializer_context(self):
+        context = super(IncidentViewSet, self).get_serializer_context()
+        writing = self.request is not None and self.request.method in ("POST", "PATCH")
+        if writing and isinstance(self.request.data, dict):
+            # Resolve all five officers (and the offenses) up front, rather than one by one.
+            context.update(bulk.resolve_incident_references([self.request.data]))
+        return context
+
+    def get_serializer(self, *args, **kwargs):
+        fields, expand = self._get_sparse_fieldset()
+        kwargs.setdefault("fields", fields)
+        kwargs.setdefault("expand", expand)
+        return super(IncidentViewSet, self).get_serializer(*args, **kwargs)
 
     def list(self, request, *args, **kwargs):
-        return super(IncidentViewSet, self).list(request, args, kwargs)
+        """
+        Without a sparse fieldset, pages are assembled from the incidents' cached JSON,
+        and only incidents missing from the cache are rendered, by the flat serializer
+        straight from `.values()` rows; the output is the same as IncidentSerializer's.
+        """
+        fields, expand = self._get_sparse_fieldset()
+        if fields is not None or expand is not None:
+            return super(IncidentViewSet, self).list(request, args, kwargs)
+
+        queryset = self.filter_queryset(Incident.objects.all())
+        page = self.paginate_queryset(queryset.values(*VERSION_COLUMNS))
+        envelope = OrderedDict([('next', self.paginator.get_next_link()),
+                                ('previous', self.paginator.get_previous_link())])
+        return PrerenderedResponse(render_page(envelope, incident_representations.fragments(page)))
 
     def create(self, request, *args, **kwargs):
         dirty_data = {key: value for key, value in request.data.items()}
@@ -66,6 +161,8 @@ class IncidentViewSet(viewsets.ModelViewSet):
         if serializer.is_valid():
             incident = serializer.create(validated_data=serializer.validated_data)
             resp_status = status.HTTP_201_CREATED
+            # Re-read with everything joined in rather than lazily loading each officer's user.
+            incident = self.get_queryset().get(id=incident.id)
             resp_data = self.get_serializer_class()(instance=incident).data
         else:
             resp_status = status.HTTP_400_BAD_REQUEST
@@ -75,8 +172,137 @@ class IncidentViewSet(viewsets.ModelViewSet):
         return Response(status=resp_status,
                         data=resp_data)
 
-    def _clean_dirty_field(self, field_key: str, dirty_value: Any) -> Any:
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request, *args, **kwargs):
+        """
+        Streams every incident matching the list filters, flattened, as NDJSON (the
+        default) or CSV, e.g. ?output=csv&report_after=2019-01-01&report_before=2019-02-01
+        """
+        export_format = request.query_params.get("output", export.NDJSON)
+        if export_format not in export.EXPORT_FORMATS:
+            return Response(status=status.HTTP_400_BAD_REQUEST,
+                            data={'output': [f"Must be one of: "
+                                             f"{', '.join(export.EXPORT_FORMATS)}."]})
+        queryset = self.filter_queryset(Incident.objects.all())
+        return export.streaming_export_response(queryset, export_format)
+
+    @action(detail=False, methods=["get"], url_path="print")
+    def print_reports(self, request, *args, **kwargs):
+        """
+        Prints the reports of every incident matching the list filters, oldest first, as a
+        ZIP of one PDF per incident (the default) or as one merged PDF, e.g.
+        ?output=pdf&beat=3&report_after=2019-05-01T06:00:00. Either way, reports missing
+        from the report cache are rendered across a pool of processes.
+        """
+        print_format = request.query_params.get("output", batch_printing.ZIP)
+        if print_format not in batch_printing.BATCH_PRINT_FORMATS:
+            return Response(status=status.HTTP_400_BAD_REQUEST,
+                            data={'output': [f"Must be one of: "
+                                             f"{', '.join(batch_printing.BATCH_PRINT_FORMATS)}."]})
+        versions = batch_printing.batch_versions(self.filter_queryset(Incident.objects.all()))
+        if len(versions) > settings.BATCH_PRINT_LIMIT:
+            return Response(status=status.HTTP_400_BAD_REQUEST,
+                            data={'detail': f"At most {settings.BATCH_PRINT_LIMIT} incidents "
+                                            f"may be printed per request; {len(versions)} match."})
+        return batch_printing.streaming_print_response(versions, print_format,
+                                                       timezone.now().date())
+
+    @action(detail=False, methods=["get"], url_path="search")
+    def search(self, request, *args, **kwargs):
+        """
+        Ranked full text search over narratives, e.g. ?q=red+honda. Accepts the list
+        filters too, so that a search can be limited to e.g. a date range or beat.
+        """
+        try:
+            queryset = search_incidents(self.filter_queryset(Incident.objects.all()),
+                                        request.query_params.get("q", ""))
+        except SearchUnavailable as err:
+            return Response(status=status.HTTP_400_BAD_REQUEST,
+                            data={'q': [str(err)]})
+
+        queryset = queryset.values("id", "incident_number", "report_datetime",
+                                   "rank", "headline")
+        paginator = IncidentSearchPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        data = IncidentSearchResultSerializer(page, many=True).data
+        return paginator.get_paginated_response(data)
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk_create(self, request, *args, **kwargs):
+        """
+        Creates a list of incidents in one request. Every item is validated, all valid items
+        are inserted together in one transaction, and the response reports the outcome of
+        each item by its position in the request.
+        """
+        if not isinstance(request.data, list):
+            return Response(status=status.HTTP_400_BAD_REQUEST,
+                            data={'detail': "Expected a list of incidents."})
+        if len(request.data) > settings.INCIDENT_BULK_CREATE_LIMIT:
+            return Response(status=status.HTTP_400_BAD_REQUEST,
+                            data={'detail': f"At most {settings.INCIDENT_BULK_CREATE_LIMIT} "
+                                            f"incidents may be created per request."})
+
+        payloads = []
+        malformed = {}
+        decoded = bulk.decode_incident_datetimes(request.data)
+        for index, item in enumerate(request.data):
+            try:
+                payload = {key: self._clean_dirty_field(field_key=key, dirty_value=value,
+                                                        decoded=decoded)
+                           for key, value in item.items() if key != 'id'}
+            except (AttributeError, KeyError, TypeError, ValueError) as err:
+                malformed[index] = {'detail': f"Malformed incident: {err}"}
+                payload = None
+            payloads.append(payload)
+
+        try:
+            results = bulk.create_incidents(payloads)
+        except IntegrityError:
+            logger.exception("Bulk incident creation collided with a concurrent write")
+            return Response(status=status.HTTP_409_CONFLICT,
+                            data={'detail': "A conflicting incident was created concurrently. "
+                                            "No incidents were created; please retry."})
+
+        created_ids = [result.instance.id for result in results if result.ok]
+        created = self.get_queryset().in_bulk(created_ids)
+        items = []
+        for result in results:
+            if result.index in malformed:
+                items.append({'index': result.index,
+                              'status': status.HTTP_400_BAD_REQUEST,
+                              'errors': malformed[result.index]})
+            elif result.ok:
+                incident = created[result.instance.id]
+                items.append({'index': result.index,
+                              'status': status.HTTP_201_CREATED,
+                              'data': self.get_serializer_class()(instance=incident).data})
+            else:
+                items.append({'index': result.index,
+                              'status': status.HTTP_400_BAD_REQUEST,
+                              'errors': result.errors})
+
+        if len(created_ids) == len(results):
+            resp_status = status.HTTP_201_CREATED
+        elif created_ids:
+            resp_status = status.HTTP_207_MULTI_STATUS
+        else:
+            resp_status = status.HTTP_400_BAD_REQUEST
+
+        return Response(status=resp_status,
+                        data={'created': len(created_ids),
+                              'failed': len(results) - len(created_ids),
+                              'results': items})
+
+    def _clean_dirty_field(self, field_key: str, dirty_value: Any,
+                           decoded: Optional[Dict[Tuple[str, str], datetime]] = None) -> Any:
+        """
+        :param decoded: Datetimes already decoded for the request, keyed by (date, time).
+        """
         if 'datetime' in field_key:
+            if decoded:
+                value = decoded.get((dirty_value.get('date'), dirty_value.get('time')))
+                if value is not None:
+                    return value
             return convert_date_string_to_object(dirty_value['date'] + " " + dirty_value['time'])
         elif '_amount' in field_key:
             return dirty_value or 0
@@ -84,7 +310,16 @@ class IncidentViewSet(viewsets.ModelViewSet):
             return dirty_value
 
     def partial_update(self, request, *args, **kwargs):
-        incident = Incident.objects.get(id=kwargs['pk'])
+        """
+        Updates the given fields of an incident. With an If-Match header carrying the ETag
+        the client read, the update only succeeds if nobody has changed the incident since;
+        otherwise it fails with a 412 and the client should fetch the incident again.
+        """
+        incident = get_object_or_404(self.get_queryset(), id=kwargs['pk'])
+        if_match = if_match_satisfied(request, incident.id,
+                                      timestamp_token(incident.updated_timestamp))
+        if if_match is False:
+            raise PreconditionFailed()
 
         dirty_data = {key: value for key, value in request.data.items()}
         for key, value in dirty_data.items():
@@ -94,23 +329,28 @@ class IncidentViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(incident, data=dirty_data, partial=True)
 
         if serializer.is_valid():
-            serializer.update(instance=incident, validated_data=serializer.validated_data)
-            resp_status = status.HTTP_200_OK
-            resp_data = serializer.data
-        else:
-            logger.error(f"Data: {dirty_data}")
-            resp_status = status.HTTP_400_BAD_REQUEST
-            resp_data = serializer.errors
-            logger.error(f"Errors: {resp_data}")
-
-        return Response(status=resp_status,
-                        data=resp_data)
+            expected_updated = incident.updated_timestamp if if_match else None
+            serializer.update(instance=incident, validated_data=serializer.validated_data,
+                              expected_updated=expected_updated)
+            response = Response(status=status.HTTP_200_OK, data=serializer.data)
+            # The new version, for the client's next If-Match, as GET would give it. Changing
+            # the offenses moves embedded_updated_timestamp on in the database alone.
+            incident.refresh_from_db(fields=["embedded_updated_timestamp"])
+            response["ETag"] = make_etag(incident.id,
+                                         timestamp_token(incident.updated_timestamp),
+                                         timestamp_token(incident.embedded_updated_timestamp))
+            return response
+
+        logger.error(f"Data: {dirty_data}")
+        logger.error(f"Errors: {serializer.errors}")
+        return Response(status=status.HTTP_400_BAD_REQUEST,
+                        data=serializer.errors)
 
     def update(self, request, *args, **kwargs):
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
 
-class VictimViewSet(viewsets.ModelViewSet):
+class VictimViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = IncidentInvolvedParty.objects.filter(party_type=VICTIM)
     serializer_class = IncidentInvolvedPartySerializer
 
@@ -121,6 +361,8 @@ class VictimViewSet(viewsets.ModelViewSet):
 
     def create(self, request, *args, **kwargs):
         kwargs['party_type'] = VICTIM
+        if isinstance(request.data, list):
+            return bulk.create_incident_involved_parties(request=request, kwargs=kwargs)
         return create_incident_involved_party(request=request,
                                               serializer_class=self.get_serializer_class(),
                                               kwargs=kwargs)
@@ -133,7 +375,7 @@ class VictimViewSet(viewsets.ModelViewSet):
                                                      *args, **kwargs)
 
 
-class SuspectViewSet(viewsets.ModelViewSet):
+class SuspectViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = IncidentInvolvedParty.objects.filter(party_type=SUSPECT)
     serializer_class = IncidentInvolvedPartySerializer
 
@@ -144,6 +386,8 @@ class SuspectViewSet(viewsets.ModelViewSet):
 
     def create(self, request, *args, **kwargs):
         kwargs['party_type'] = SUSPECT
+        if isinstance(request.data, list):
+            return bulk.create_incident_involved_parties(request=request, kwargs=kwargs)
         return create_incident_involved_party(request=request,
                                               serializer_class=self.get_serializer_class(),
                                               kwargs=kwargs)
@@ -156,7 +400,7 @@ class SuspectViewSet(viewsets.ModelViewSet):
                                                       *args, **kwargs)
 
 
-class IncidentFileViewSet(viewsets.ModelViewSet):
+class IncidentFileViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = IncidentFile.objects.all()
     serializer_class = IncidentFileSerializer
     parser_classes = (MultiPartParser, FormParser)
@@ -181,15 +425,70 @@ class IncidentFileViewSet(viewsets.ModelViewSet):
 
 @api_view(['GET'])
 def print_report(request, *args, **kwargs):
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'filename="somefilename.pdf"'
-
-    # TODO: Figure out how or why file name was being extracted from the response
-    pdf_generator = IncidentReportPDFGenerator('doo', kwargs.get('incident_id'))
-    pdf_generator.generate()
+    """
+    Serves the incident report as a PDF, inline. Reports are rendered in memory once per
+    version of the incident and print date and then served from the on-disk report cache;
+    requests with a matching If-None-Match or If-Modified-Since get a 304.
+    :return: The PDF, with its length and file name, or a 404 for unknown incidents.
+    """
+    incident_id = kwargs.get('incident_id')
+    version = report_version(incident_id)
+    if version is None:
+        raise Http404
+    # The print date is part of the document, so a new day is a new version of it.
+    print_date = timezone.now().date()
+    etag = make_etag(incident_id, version.token, variant=print_date.isoformat())
+    print_day_started = datetime.combine(print_date, datetime.min.time(), tzinfo=timezone.utc)
+    last_modified = int(max(version.updated, print_day_started).timestamp())
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    document = report_pdfs.open(incident_id, version.token, print_date)
+    if document is None:
+        try:
+            pdf_generator = IncidentReportPDFGenerator.for_incident(incident_id,
+                                                                    print_date=print_date)
+        except Incident.DoesNotExist:
+            raise Http404
+        pdf = pdf_generator.render()
+        report_pdfs.store(incident_id, version.token, print_date, pdf)
+        document = BytesIO(pdf)
+    response = FileResponse(document, content_type='application/pdf')
+    response['Content-Disposition'] = (f'inline; '
+                                       f'filename="{report_file_name(version.incident_number)}"')
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
     return response
 
 
+def _with_hit_rates(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Adds a hit_rate to every (nested) dict of stats that counts hits and misses."""
+    stats = {name: _with_hit_rates(value) if isinstance(value, dict) else value
+             for name, value in stats.items()}
+    if 'hits' in stats and 'misses' in stats:
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else None
+    return stats
+
+
+@api_view(['GET'])
+@permission_classes((IsAdminUser,))
+def cache_stats(request, *args, **kwargs):
+    """
+    Reports how effective this process' caches are, for staff users.
+    :return: Each cache's counters, with hit rates.
+    """
+    return Response(_with_hit_rates({
+        'jwt_tokens': verified_tokens.stats(),
+        'basic_credentials': verified_credentials.stats(),
+        'officers': officer_cache.stats(),
+        'geography': geography_cache.stats(),
+        'incident_representations': incident_representations.stats(),
+        'report_pdfs': report_pdfs.stats(),
+    }))
+
+
 def jwt_response_payload_handler(token, user=None):
     officer = Officer.objects.get(user=user)
     serialized = OfficerSerializer(officer)